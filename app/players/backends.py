@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from app.services.startup_profiler import profiler
+
+# Imported on a worker thread by load_mpv(); loading libmpv is the
+# slowest part of startup and the window doesn't need it to appear
+mpv = None
+
+
+def load_mpv():
+    global mpv
+    if mpv is not None:
+        return mpv
+
+    started = time.perf_counter()
+    # Get the absolute path to the DLL folder
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    dll_dir = os.path.join(base_dir, "assets", "libs")
+
+    # Add it to PATH so Python can find libmpv-2.dll
+    if dll_dir not in os.environ["PATH"].split(os.pathsep):
+        os.environ["PATH"] = dll_dir + os.pathsep + os.environ["PATH"]
+
+    import mpv as mpv_module
+    mpv = mpv_module
+    profiler.add("mpv_import", time.perf_counter() - started)
+    return mpv
+
+
+# Backends are what PlaybackCore drives. They report back by calling, from
+# any thread:
+#   core.on_property(name, value)   for time-pos / duration / pause / path
+#                                   (mpv also reports demuxer-cache-state
+#                                   and paused-for-cache)
+#   core.on_end_file(eof)           eof=True only for a natural end of file
+#   core.on_playback_restart()      playback (re)started after a load or seek
+
+
+# The real player: libmpv rendering into a window id.
+class MpvBackend:
+    def __init__(self, wid=None, gapless=True):
+        self.wid = wid
+        self.gapless = gapless
+        self.player = None
+
+    def start(self, core):
+        load_mpv()
+        options = {}
+        if self.wid is not None:
+            options["wid"] = self.wid
+        self.player = mpv.MPV(
+            # Open the queued next entry before the current one ends
+            prefetch_playlist="yes",
+            gapless_audio="yes" if self.gapless else "weak",
+            **options
+        )
+
+        # Playback state is pushed by mpv instead of being polled
+        for name in ("time-pos", "duration", "pause", "path", "demuxer-cache-state", "paused-for-cache"):
+            self.player.observe_property(name, core.on_property)
+
+        @self.player.event_callback("end-file")
+        def end_file(event):
+            reason = getattr(getattr(event, "data", None), "reason", None)
+            core.on_end_file(reason == mpv.MpvEventEndFile.EOF)
+
+        @self.player.event_callback("playback-restart")
+        def playback_restart(event):
+            core.on_playback_restart()
+
+    # Replace the current file; per-file options apply to this file only
+    def play(self, path, **options):
+        self.player.pause = False
+        self.player.loadfile(path, "replace", **options)
+
+    def append(self, path, **options):
+        self.player.loadfile(path, "append", **options)
+
+    def clear_queue(self):
+        self.player.playlist_clear()  # keeps the current entry
+
+    def set_option(self, name, value):
+        self.player[name] = value
+
+    def set_pause(self, paused):
+        self.player.pause = paused
+
+    def seek(self, seconds, precision="exact"):
+        self.player.seek(seconds, reference="absolute", precision=precision)
+
+    @property
+    def loaded(self):
+        return bool(self.player.filename)
+
+    def stop(self):
+        self.player.stop()
+
+    def terminate(self):
+        self.player.terminate()
+
+
+# In-process stand-in for mpv: no window, no decoding.
+#
+# Every file "plays" for duration_of(path) seconds (3 minutes by default).
+# With realtime=True a thread advances the clock like a real player
+# (`speed` times faster); otherwise time only moves on advance(), which
+# keeps tests and benchmarks deterministic. Events are reported the same
+# way MpvBackend reports them, including gapless moves to the queued file.
+class FakeBackend:
+    def __init__(self, duration_of=None, realtime=False, speed=1.0, tick=0.05):
+        self.duration_of = duration_of or (lambda path: 180.0)
+        self.realtime = realtime
+        self.speed = speed
+        self.tick = tick
+
+        self.core = None
+        self.path = None
+        self.position = 0.0
+        self.duration = None
+        self.paused = False
+        self.options = {}
+        self.file_options = {}
+        self.queue = []          # [(path, options)]
+        self.loads = 0           # files opened so far
+        self.seeks = 0
+
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, core):
+        self.core = core
+        if self.realtime:
+            self._thread = threading.Thread(target=self._run, name="FakeBackend", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.tick):
+            now = time.perf_counter()
+            self.advance((now - last) * self.speed)
+            last = now
+
+    # -------------------------------------------------------------
+    # Simulation
+    # -------------------------------------------------------------
+    def _open(self, path, options):
+        self.path = path
+        self.file_options = dict(options)
+        self.position = float(options.get("start", 0.0))
+        self.duration = self.duration_of(path)
+        self.loads += 1
+        self.core.on_property("path", path)
+        self.core.on_property("duration", self.duration)
+        self.core.on_property("time-pos", self.position)
+        self.core.on_playback_restart()
+
+    def advance(self, seconds):
+        with self._lock:
+            if self.path is None or self.paused:
+                return
+            self.position += seconds
+            if self.position < self.duration:
+                self.core.on_property("time-pos", self.position)
+                return
+
+            if self.options.get("loop-file") == "inf":
+                self.position = 0.0
+                self.core.on_property("time-pos", 0.0)
+                self.core.on_playback_restart()
+                return
+
+            if self.queue:
+                self.core.on_end_file(True)
+                self._open(*self.queue.pop(0))
+            else:
+                # Idle before reporting, the core may load the next file right away
+                self.path = self.duration = None
+                self.core.on_property("path", None)
+                self.core.on_end_file(True)
+
+    # -------------------------------------------------------------
+    # Backend interface
+    # -------------------------------------------------------------
+    def play(self, path, **options):
+        with self._lock:
+            self.queue = []
+            self.paused = False
+            self.core.on_property("pause", False)
+            self._open(path, options)
+
+    def append(self, path, **options):
+        with self._lock:
+            self.queue.append((path, options))
+
+    def clear_queue(self):
+        with self._lock:
+            self.queue = []
+
+    def set_option(self, name, value):
+        self.options[name] = value
+
+    def set_pause(self, paused):
+        with self._lock:
+            self.paused = paused
+            self.core.on_property("pause", paused)
+
+    def seek(self, seconds, precision="exact"):
+        with self._lock:
+            if self.path is None:
+                raise RuntimeError("nothing loaded")
+            self.seeks += 1
+            self.position = max(0.0, min(seconds, self.duration))
+            self.core.on_property("time-pos", self.position)
+            self.core.on_playback_restart()
+
+    @property
+    def loaded(self):
+        return self.path is not None
+
+    def stop(self):
+        with self._lock:
+            if self.path is not None:
+                self.path = self.duration = None
+                self.queue = []
+                self.core.on_end_file(False)
+                self.core.on_property("path", None)
+
+    def terminate(self):
+        self._stop.set()
+        self.stop()
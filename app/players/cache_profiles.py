@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+from app.services.app_data import data_dir
+
+logger = logging.getLogger(__name__)
+
+# mpv demuxer/cache options per kind of source. They are passed as per-file
+# options, so every entry gets the profile of its own source.
+#   local          SSD/HDD: no stream cache, small readahead
+#   network_mount  SMB/NFS/sshfs shares: cache generously, ride out hiccups
+#   http           streams and remote files: big forward and back buffer
+DEFAULT_PROFILES = {
+    "local": {
+        "cache": "no",
+        "demuxer-readahead-secs": 5,
+        "demuxer-max-bytes": "32MiB",
+        "demuxer-max-back-bytes": "8MiB",
+    },
+    "network_mount": {
+        "cache": "yes",
+        "cache-secs": 30,
+        "demuxer-readahead-secs": 30,
+        "demuxer-max-bytes": "150MiB",
+        "demuxer-max-back-bytes": "50MiB",
+        "cache-pause-wait": 2,
+    },
+    "http": {
+        "cache": "yes",
+        "cache-secs": 60,
+        "demuxer-readahead-secs": 60,
+        "demuxer-max-bytes": "300MiB",
+        "demuxer-max-back-bytes": "100MiB",
+        "cache-pause-initial": "yes",
+        "cache-pause-wait": 3,
+    },
+}
+
+NETWORK_FS = {
+    "nfs", "nfs4", "cifs", "smbfs", "smb3", "afpfs", "webdav", "davfs", "9p",
+    "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "fuse.gvfsd-fuse", "ncpfs", "afs",
+}
+
+MOUNTS_TTL = 60  # seconds before the mount table is read again
+DRIVE_REMOTE = 4
+
+_mounts = None
+_mounts_read_at = 0.0
+_drive_types = {}
+
+
+def profiles_path():
+    return os.path.join(data_dir(), "cache_profiles.json")
+
+
+def load_profiles(path=None):
+    # Defaults, with per-profile overrides from cache_profiles.json, e.g.
+    #   {"http": {"cache-secs": 120}, "local": {"demuxer-max-bytes": "64MiB"}}
+    profiles = {name: dict(options) for name, options in DEFAULT_PROFILES.items()}
+    path = path or profiles_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+    except FileNotFoundError:
+        return profiles
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring %s: %s", path, e)
+        return profiles
+
+    for name, options in overrides.items():
+        if isinstance(options, dict):
+            profiles.setdefault(name, {}).update(options)
+    return profiles
+
+
+# -------------------------------------------------------------
+# Source detection
+# -------------------------------------------------------------
+def _read_mounts():
+    # [(mount point, fs type)], longest mount point first
+    mounts = []
+    if os.path.exists("/proc/mounts"):
+        with open("/proc/mounts", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    # Spaces in mount points are escaped as \040
+                    mounts.append((fields[1].replace("\\040", " "), fields[2]))
+    else:
+        # macOS / BSD: "//user@server/share on /Volumes/share (smbfs, ...)"
+        try:
+            out = subprocess.run(["mount"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            out = ""
+        for match in re.finditer(r" on (.+?) \((\w+)", out):
+            mounts.append((match.group(1), match.group(2)))
+    mounts.sort(key=lambda m: len(m[0]), reverse=True)
+    return mounts
+
+
+def _fs_type(path):
+    global _mounts, _mounts_read_at
+    now = time.monotonic()
+    if _mounts is None or now - _mounts_read_at > MOUNTS_TTL:
+        _mounts = _read_mounts()
+        _mounts_read_at = now
+    for mount_point, fs_type in _mounts:
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+            return fs_type
+    return None
+
+
+def is_network_path(path):
+    if sys.platform == "win32":
+        if path.startswith(("\\\\", "//")):
+            return True  # UNC path
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        if not drive:
+            return False
+        if drive not in _drive_types:
+            import ctypes
+            _drive_types[drive] = ctypes.windll.kernel32.GetDriveTypeW(drive + "\\")
+        return _drive_types[drive] == DRIVE_REMOTE
+
+    fs_type = _fs_type(os.path.abspath(path))
+    return fs_type in NETWORK_FS
+
+
+def source_kind(path):
+    if "://" in path and not path.startswith("file://"):
+        return "http"
+    if is_network_path(path):
+        return "network_mount"
+    return "local"
+
+
+# -------------------------------------------------------------
+# Buffer statistics
+# -------------------------------------------------------------
+
+# Cache fill and rebuffering of the current entry, fed from mpv's
+# demuxer-cache-state and paused-for-cache properties. A rebuffer is a
+# stall after playback has started; waiting before the first frame is
+# counted separately as the startup wait.
+class BufferStats:
+    def __init__(self):
+        self.reset(None, None)
+
+    def reset(self, path, profile):
+        self.path = path
+        self.profile = profile
+        self.started = False        # playback position moved at least once
+        self.buffering = False
+        self.rebuffers = 0
+        self.stalled = 0.0          # seconds spent rebuffering
+        self.startup_wait = 0.0     # seconds buffering before playback started
+        self.cache_duration = None  # seconds of media buffered ahead
+        self.forward_bytes = None
+        self.input_rate = None      # bytes/s coming in
+        self.underruns = 0
+        self._stall_started = None
+        self._underrun = False
+
+    def playback_moved(self):
+        self.started = True
+
+    def update_cache_state(self, state):
+        if not isinstance(state, dict):
+            return
+        self.cache_duration = state.get("cache-duration")
+        self.forward_bytes = state.get("fw-bytes")
+        self.input_rate = state.get("raw-input-rate")
+        underrun = bool(state.get("underrun"))
+        if underrun and not self._underrun:
+            self.underruns += 1
+        self._underrun = underrun
+
+    # Returns True when a rebuffer just started
+    def set_buffering(self, buffering):
+        buffering = bool(buffering)
+        if buffering == self.buffering:
+            return False
+        self.buffering = buffering
+        now = time.perf_counter()
+        if buffering:
+            self._stall_started = now
+            if self.started:
+                self.rebuffers += 1
+                return True
+            return False
+
+        if self._stall_started is not None:
+            if self.started:
+                self.stalled += now - self._stall_started
+            else:
+                self.startup_wait += now - self._stall_started
+            self._stall_started = None
+        return False
+
+    def as_dict(self):
+        return {
+            "path": self.path,
+            "profile": self.profile,
+            "rebuffers": self.rebuffers,
+            "stalled_s": round(self.stalled, 2),
+            "startup_wait_s": round(self.startup_wait, 2),
+            "cache_duration_s": self.cache_duration,
+            "forward_bytes": self.forward_bytes,
+            "input_rate": self.input_rate,
+            "underruns": self.underruns,
+        }
+
+    def summary(self):
+        if self.profile is None:
+            return "Buffer: idle"
+        parts = [f"Buffer ({self.profile.replace('_', ' ')})"]
+        if self.cache_duration is not None:
+            parts.append(f"{self.cache_duration:.1f} s ahead")
+        if self.input_rate:
+            parts.append(f"{self.input_rate / 1e6:.2f} MB/s")
+        if self.buffering:
+            parts.append("buffering...")
+        parts.append(f"{self.rebuffers} rebuffers ({self.stalled:.1f} s)")
+        return " · ".join(parts)
@@ -1,121 +1,126 @@
-import os
-from tkinter import ttk, messagebox
-# Get the absolute path to the DLL folder
-base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-dll_dir = os.path.join(base_dir, "assets", "libs")
-
-# Add it to PATH so Python can find libmpv-2.dll
-os.environ["PATH"] = dll_dir + os.pathsep + os.environ["PATH"]
-
-import mpv
 import customtkinter as ctk
-
+from app.players.backends import MpvBackend, load_mpv
+from app.players.playback_core import PlaybackCore
+from app.services.background import BackgroundTask
+from app.services.resume_store import ResumeStore
+from app.services.startup_profiler import profiler
+from app.ui.ui_scheduler import NORMAL
+
+
+# The video area. Playback logic lives in PlaybackCore; this frame only
+# provides the window mpv renders into, runs the core's callbacks on the
+# Tk thread (through the app's UiScheduler, which mpv's threads can post
+# to safely) and turns its errors into message boxes.
 class MediaPlayer(ctk.CTkFrame):
-    def __init__(self, parent, state):
+    def __init__(self, parent, state, scheduler, loudness=None):
         super().__init__(parent)
         self.state = state
-        self.player = None
-        self.after(100, self._init_players)
+        self.scheduler = scheduler
+        self.core = PlaybackCore(state, scheduler=scheduler, resume=ResumeStore(), loudness=loudness)
+        self.core.on_error = lambda e: scheduler.show_message("error", "Error loading media:", str(e))
 
-    def _init_players(self):
-        # Create mpv player instance
-        self.player = mpv.MPV(
-            wid=str(self.winfo_id()),
-            #background="#333333"
-        )
+        self._mpv_task = BackgroundTask(load_mpv).start()
+        self.scheduler.after(50, self._poll_mpv, priority=NORMAL)
 
-    def play_next(self):
-        self.stop()
+    def _poll_mpv(self):
+        if self.core.closing:
+            return
+        if not self._mpv_task.done:
+            self.scheduler.after(50, self._poll_mpv, priority=NORMAL)
+            return
+        if self._mpv_task.error:
+            self.scheduler.show_message("error", "Error", f"Failed to load mpv:\n{self._mpv_task.error}")
+            return
 
-        if self.state.shuffle or ((self.state.loop != 0) and (not self.state.is_stopped)):
-            self.state.current_index = self.state.next_index()
-            if self.state.current_index != -1:
-                self.state.path = self.state.current_song_list[self.state.current_index]
-                self.load_media()
-                self.play()
+        with profiler.phase("mpv_init"):
+            self.core.attach(MpvBackend(wid=str(self.winfo_id()), gapless=self.state.gapless))
 
+    # -------------------------------------------------------------
+    # Playback state
+    # -------------------------------------------------------------
+    @property
+    def player(self):
+        return self.core.backend
 
-    def load_media(self):
-        path = self.state.path
-        if not path:
-            return
+    @property
+    def time_pos(self):
+        return self.core.time_pos
+
+    @property
+    def duration(self):
+        return self.core.duration
+
+    @property
+    def paused(self):
+        return self.core.paused
+
+    @property
+    def last_gap(self):
+        return self.core.last_gap
+
+    @property
+    def buffer_stats(self):
+        return self.core.buffer
 
-        try:
-            ext = os.path.splitext(path)[1].lower()
+    def add_listener(self, listener):
+        self.core.add_listener(listener)
 
-            audio_exts = [".mp3", ".wav", ".flac", ".aac", ".m4a", ".ogg", ".opus"]
+    def set_ui_active(self, active):
+        self.core.set_active(active)
 
-            # 🎵 If audio → disable video output
-            if ext in audio_exts:
-                self.player["vid"] = "no"
-            else:
-                self.player["vid"] = "yes"  # video mode
+    def get_position(self):
+        return self.core.get_position()
+
+    def get_time(self):
+        return self.core.get_time()
 
-            # Reset states
-            self.player.stop()
-            self.player.pause = False
-            self.state.is_paused = False
-            self.state.is_stopped = False
+    # -------------------------------------------------------------
+    # Commands
+    # -------------------------------------------------------------
+    def load_media(self):
+        self.core.load_media()
 
-            # Play media
-            self.player.play(path)
+    def queue_next(self):
+        self.core.queue_next()
+
+    def queued_gain_changed(self):
+        return self.core.queued_gain_changed()
+
+    def play_next(self):
+        self.core.play_next()
 
-        except Exception as e:
-            messagebox.showerror("Error loading media:", e)
+    def skip_next(self):
+        self.core.skip_next()
+
+    def play_previous(self):
+        self.core.play_previous()
 
     def play(self):
-        self.player.pause = False
+        self.core.play()
 
     def pause(self):
-        self.player.pause = True
+        self.core.pause()
 
     def stop(self):
-        if self.player and self.player.filename:
-            self.player.stop()  # Properly stop the video playback
-            self.state.is_stopped = True
-            self.state.is_paused = True
-
-
-    def seek(self, percent):
-        if self.player.duration:
-            target = percent * self.player.duration
-            self.player.seek(target, reference="absolute")
-        else:
-            # Retry after 50 ms
-            self.after(50, lambda: self.seek(percent))
+        self.core.stop()
 
-    def get_position(self):
-        if self.player and self.player.time_pos is not None and self.player.duration:
-            return self.player.time_pos / self.player.duration
-        return 0.0
+    def seek(self, percent, final=False):
+        self.core.seek(percent, final)
 
-    def get_time(self):
-        if self.player and self.player.time_pos is not None and self.player.duration:
-            return int(self.player.time_pos), int(self.player.duration)
-        return 0, 0
+    # Write recorded resume positions now instead of on the next timer
+    def save_positions(self):
+        self.core.flush_resume()
 
     def forward(self, seconds=5):
-        if self.player and self.player.duration and self.player.time_pos is not None:
-            new_time = self.player.time_pos + seconds
-            if new_time >= self.player.duration:
-                # Clamp to the end
-                self.player.seek(self.player.duration, reference="absolute", precision="exact")
-                self.player.pause = True
-                self.state.is_stopped = True
-            else:
-                self.player.seek(new_time, reference="absolute", precision="exact")
-        else:
-            messagebox.showerror("Error", "Unable to retrieve video duration or time position.")
+        if not self.core.forward(seconds):
+            self.scheduler.show_message("error", "Error", "Unable to retrieve video duration or time position.")
 
     def backward(self, seconds=5):
-        if self.player and self.player.duration and self.player.time_pos is not None:
-            new_time = max(self.player.time_pos - seconds, 0)
-            self.player.seek(new_time, reference="absolute", precision="exact")
-        else:
-            messagebox.showerror("Error", "Unable to retrieve video duration or time position.")
+        if not self.core.backward(seconds):
+            self.scheduler.show_message("error", "Error", "Unable to retrieve video duration or time position.")
 
     def destroy(self):
-        if self.player:
-            self.player.terminate()
+        self.core.close()
+        if self.core.resume is not None:
+            self.core.resume.close()
         super().destroy()
-
@@ -0,0 +1,464 @@
+import logging
+import os
+import threading
+import time
+from app.players.cache_profiles import BufferStats, load_profiles, source_kind
+from app.players.seek_scheduler import SeekScheduler
+from app.services.media_types import AUDIO_EXTS
+from app.services.startup_profiler import profiler
+
+# time-pos changes smaller than this are not pushed to the UI
+TIME_RESOLUTION = 0.2
+
+# Recorded playback positions are written to disk at most this often
+RESUME_FLUSH_MS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+# Runs callbacks without a GUI main loop: after(0) calls right away,
+# delayed ones go through threading.Timer. Used when PlaybackCore is driven
+# headless (tests, benchmarks); the Tk player passes itself instead.
+class InlineScheduler:
+    def __init__(self):
+        self._timers = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def after(self, ms, func, *args):
+        if ms <= 0:
+            func(*args)
+            return None
+        with self._lock:
+            self._next_id += 1
+            job = self._next_id
+            timer = threading.Timer(ms / 1000, self._fire, (job, func, args))
+            timer.daemon = True
+            self._timers[job] = timer
+        timer.start()
+        return job
+
+    def _fire(self, job, func, args):
+        with self._lock:
+            if self._timers.pop(job, None) is None:
+                return
+        func(*args)
+
+    def after_cancel(self, job):
+        with self._lock:
+            timer = self._timers.pop(job, None)
+        if timer is not None:
+            timer.cancel()
+
+
+# Playback logic without any UI: track changes, gapless queueing, seeking
+# and the state reported by the backend.
+#
+# Backend callbacks may arrive on any thread. Their values are collected
+# and handed to the owner's thread in one batch through
+# scheduler.after(0, ...) (Tk's after() for the app, InlineScheduler when
+# headless); listeners then get a dict of what changed.
+class PlaybackCore:
+    def __init__(self, state, scheduler=None, resume=None, loudness=None):
+        self.state = state
+        self.scheduler = scheduler or InlineScheduler()
+        self.backend = None
+        self.on_error = None  # called with the exception when a file fails to load
+
+        # Optional ResumeStore: positions are recorded as they come in and
+        # written in batches (timer, track change, close)
+        self.resume = resume
+        self._resume_job = None
+        self._playing_path = None
+
+        # Optional LoudnessScanner: measured per-track gains, applied while
+        # state.normalize_loudness is on
+        self.loudness = loudness
+
+        # Last values seen by the owner thread
+        self.time_pos = None
+        self.duration = None
+        self.paused = False
+
+        # Values reported by the backend, waiting to be flushed
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flush_scheduled = False
+        self._active = True
+        self._missed = {}  # changes the listeners didn't see while inactive
+        self._closing = False
+
+        # Gapless playback: the entry queued inside the backend after the current one
+        self._queued_index = None
+        self._queued_path = None
+        self._queued_gain = None  # loudness gain the queued entry was appended with
+        self._eof_at = None
+        self.last_gap = None  # seconds between the end of a track and the next one starting
+
+        self.seeker = SeekScheduler(self)
+
+        # Demuxer cache options per source kind, and how the current entry buffers
+        self.cache_profiles = load_profiles()
+        self.buffer = BufferStats()
+
+        # A track picked before the backend is ready is started once it is
+        self._load_when_ready = False
+
+    @property
+    def closing(self):
+        return self._closing
+
+    @property
+    def ready(self):
+        return self.backend is not None
+
+    def attach(self, backend):
+        backend.start(self)
+        self.backend = backend
+        if self._load_when_ready:
+            self._load_when_ready = False
+            self.load_media()
+
+    def after(self, ms, func, *args):
+        return self.scheduler.after(ms, func, *args)
+
+    def after_cancel(self, job):
+        self.scheduler.after_cancel(job)
+
+    # -------------------------------------------------------------
+    # Backend events (any thread)
+    # -------------------------------------------------------------
+    def on_property(self, name, value):
+        if name == "time-pos" and value is not None:
+            # Coalesce: the UI only needs a few updates per second
+            last = self._pending.get("time_pos", self.time_pos)
+            if last is not None and abs(value - last) < TIME_RESOLUTION:
+                return
+        self._push(name.replace("-", "_"), value)
+
+    def on_end_file(self, eof):
+        # Only a natural end of file moves on; stop/replace/errors do not
+        if eof:
+            self._eof_at = time.perf_counter()
+            self._push("eof", True)
+
+    def on_playback_restart(self):
+        profiler.mark("first_frame")
+        # Also ends a seek: let the scheduler send the next one
+        self._push("seek_done", True)
+        if self._eof_at is not None:
+            self.last_gap = time.perf_counter() - self._eof_at
+            self._eof_at = None
+            logger.info("Track transition gap: %.2f ms", self.last_gap * 1000)
+
+    def _push(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            if self._flush_scheduled or self._closing:
+                return
+            self._flush_scheduled = True
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            self.scheduler.after(0, self._flush)
+        except RuntimeError:
+            # Main loop not running (yet/anymore)
+            with self._lock:
+                self._flush_scheduled = False
+
+    # -------------------------------------------------------------
+    # Owner thread
+    # -------------------------------------------------------------
+    def _flush(self):
+        with self._lock:
+            changes, self._pending = self._pending, {}
+            self._flush_scheduled = False
+            active = self._active
+        if self._closing:
+            return
+        if active and self._missed:
+            # Back from hidden: first what the listeners missed meanwhile
+            missed, self._missed = self._missed, {}
+            self._notify(missed)
+        if not changes:
+            return
+
+        eof = changes.pop("eof", False)
+        seek_done = changes.pop("seek_done", False)
+        path = changes.pop("path", None)
+        if "time_pos" in changes:
+            self.time_pos = changes["time_pos"]
+        if "duration" in changes:
+            self.duration = changes["duration"]
+        if "pause" in changes:
+            self.paused = bool(changes["pause"])
+        if seek_done:
+            self.seeker.seek_done()
+        if changes.get("time_pos"):
+            self.buffer.playback_moved()
+        if "demuxer_cache_state" in changes:
+            self.buffer.update_cache_state(changes["demuxer_cache_state"])
+        if "paused_for_cache" in changes and self.buffer.set_buffering(changes["paused_for_cache"]):
+            logger.info("Rebuffering (%s profile): %s", self.buffer.profile, self.buffer.path)
+        if eof and self.resume is not None and self._playing_path:
+            self.resume.forget(self._playing_path)  # finished: next time starts from the top
+
+        # The backend moved on to the queued entry by itself
+        if path is not None and self._queued_path is not None and path == self._queued_path:
+            self.state.set_current(self._queued_index)
+            self._queued_index = self._queued_path = None
+            self._track_started(path)
+            changes["track"] = self.state.current_index
+            self.queue_next()
+        elif "time_pos" in changes:
+            self._record_position()
+
+        if active:
+            self._notify(changes)
+        else:
+            self._missed.update(changes)
+
+        # Track transitions happen exactly once, when the file ended.
+        # With an entry queued, the backend has already started it gaplessly.
+        if eof and "track" not in changes and self._queued_path is None:
+            self.play_next()
+
+    def _notify(self, changes):
+        for listener in self.listeners:
+            listener(changes)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def set_active(self, active):
+        # While inactive (window hidden), playback goes on (track changes,
+        # resume positions) but the listeners aren't called; the first
+        # flush afterwards brings them up to date
+        with self._lock:
+            self._active = active
+            schedule = active and (self._pending or self._missed) and not self._flush_scheduled
+            if schedule:
+                self._flush_scheduled = True
+        if schedule:
+            self._schedule_flush()
+
+    # -------------------------------------------------------------
+    # Track changes
+    # -------------------------------------------------------------
+    def play_next(self):
+        self.stop()
+
+        if self.state.shuffle or ((self.state.loop != 0) and (not self.state.is_stopped)):
+            next_index = self.state.next_index()
+            if next_index != -1:
+                self.state.set_current(next_index)
+                self.load_media()
+                self.play()
+            else:
+                self.state.current_index = -1
+
+    def skip_next(self):
+        # User-requested next track: ignores loop-one, wraps like loop-all
+        if not self.state.current_song_list:
+            return
+        if self.state.shuffle:
+            next_index = self.state.next_index()
+        else:
+            next_index = (self.state.current_index + 1) % len(self.state.current_song_list)
+        self.state.set_current(next_index)
+        self.load_media()
+
+    def play_previous(self):
+        previous_index = self.state.previous_index()
+        if previous_index == -1:
+            # Nothing before this one: restart the current track
+            previous_index = self.state.current_index
+        if previous_index == -1:
+            return
+        self.state.set_current(previous_index)
+        self.load_media()
+
+    # -------------------------------------------------------------
+    # Gapless playback
+    # -------------------------------------------------------------
+    def queue_next(self):
+        # (Re)build the backend's playlist: current entry + the next one.
+        # Called after loading a track and whenever loop/shuffle change.
+        if not self.backend or self.state.is_stopped or self.state.current_index == -1:
+            return
+
+        self.backend.clear_queue()
+        self._queued_index = self._queued_path = None
+        self.backend.set_option("gapless-audio", "yes" if self.state.gapless else "weak")
+        self.backend.set_option("loop-file", "no")
+
+        if not self.state.gapless:
+            return
+
+        # Loop one: let the backend repeat the file without reloading it
+        if self.state.loop == 2 and not self.state.shuffle:
+            self.backend.set_option("loop-file", "inf")
+            return
+
+        if not (self.state.shuffle or self.state.loop != 0):
+            return
+
+        next_index = self.state.next_index()
+        if next_index == -1:
+            return
+
+        path = self.state.current_song_list[next_index]
+        self.backend.append(path, **self.file_options(path))
+        self._queued_index = next_index
+        self._queued_path = path
+        self._queued_gain = self.gain(path)
+
+    def queued_gain_changed(self):
+        # The queued entry was appended before its gain was measured (or
+        # with normalization switched the other way): queue it again
+        return self._queued_path is not None and self.gain(self._queued_path) != self._queued_gain
+
+    def video_mode(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        # 🎵 If audio → disable video output
+        return "no" if ext in AUDIO_EXTS else "yes"
+
+    # Per-file options for the backend: video on/off, the cache profile and
+    # the loudness gain (a lookup: tracks are measured ahead by the scanner)
+    def file_options(self, path):
+        options = {"vid": self.video_mode(path)}
+        options.update(self.cache_profiles.get(source_kind(path), {}))
+        gain = self.gain(path)
+        if gain:
+            options["af"] = f"lavfi=[volume={gain:.2f}dB]"
+        return options
+
+    def gain(self, path):
+        # dB applied to this file, None without normalization or a measurement
+        if self.state.normalize_loudness and self.loudness is not None:
+            return self.loudness.gain(path)
+        return None
+
+    def _track_started(self, path):
+        # Log how the previous entry buffered, then start counting for this one
+        if self.buffer.profile is not None and (self.buffer.rebuffers or self.buffer.startup_wait):
+            logger.info("Buffer stats: %s", self.buffer.as_dict())
+        self.buffer.reset(path, source_kind(path))
+        self._playing_path = path
+        self.flush_resume()
+
+    # -------------------------------------------------------------
+    # Resume positions
+    # -------------------------------------------------------------
+    def _record_position(self):
+        if self.resume is None or not self._playing_path or self.time_pos is None:
+            return
+        self.resume.record(self._playing_path, self.time_pos, self.duration)
+        if self._resume_job is None and not self._closing:
+            try:
+                self._resume_job = self.after(RESUME_FLUSH_MS, self._resume_timer)
+            except RuntimeError:
+                pass
+
+    def _resume_timer(self):
+        self._resume_job = None
+        self.flush_resume()
+
+    def flush_resume(self):
+        if self._resume_job is not None:
+            self.after_cancel(self._resume_job)
+            self._resume_job = None
+        if self.resume is not None and self.resume.pending:
+            self.resume.flush()
+
+    def load_media(self):
+        path = self.state.path
+        if not path:
+            return
+        if not self.backend:
+            self._load_when_ready = True
+            return
+
+        self.seeker.cancel()
+        try:
+            # Reset states
+            self.state.is_paused = False
+            self.state.is_stopped = False
+
+            # Play media, from the saved position if there is one (a start
+            # option instead of a seek once the file is open)
+            self._track_started(path)
+            options = self.file_options(path)
+            start = self.resume.lookup(path) if self.resume is not None else None
+            if start:
+                options["start"] = f"{start:.2f}"
+            self.backend.play(path, **options)
+            self.queue_next()
+
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+
+    def play(self):
+        if self.backend:
+            self.backend.set_pause(False)
+
+    def pause(self):
+        if self.backend:
+            self.backend.set_pause(True)
+
+    def stop(self):
+        self._queued_index = self._queued_path = None
+        self.seeker.cancel()
+        if self.backend and self.backend.loaded:
+            self.backend.stop()  # Properly stop the video playback
+            self.state.is_stopped = True
+            self.state.is_paused = True
+
+    # -------------------------------------------------------------
+    # Position
+    # -------------------------------------------------------------
+    def seek(self, percent, final=False):
+        # Slider drags: keyframe seeks while moving, exact on release (final)
+        self.seeker.seek_fraction(percent, final)
+
+    def get_position(self):
+        if self.time_pos is not None and self.duration:
+            return self.time_pos / self.duration
+        return 0.0
+
+    def get_time(self):
+        if self.time_pos is not None and self.duration:
+            return int(self.time_pos), int(self.duration)
+        return 0, 0
+
+    # Both return False when nothing seekable is playing
+    def forward(self, seconds=5):
+        if not (self.backend and self.duration and self.time_pos is not None):
+            return False
+        base = self.seeker.target if self.seeker.target is not None else self.time_pos
+        if base + seconds >= self.duration:
+            # Clamp to the end
+            self.seeker.cancel()
+            self.backend.seek(self.duration, precision="exact")
+            self.backend.set_pause(True)
+            self.state.is_stopped = True
+        else:
+            self.seeker.seek_by(seconds)
+        return True
+
+    def backward(self, seconds=5):
+        if not (self.backend and self.duration and self.time_pos is not None):
+            return False
+        self.seeker.seek_by(-seconds)
+        return True
+
+    def close(self):
+        self._closing = True
+        self.seeker.cancel()
+        self.flush_resume()
+        if self.backend:
+            self.backend.terminate()
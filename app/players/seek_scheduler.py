@@ -0,0 +1,152 @@
+import time
+
+# Give up on a seek whose file never reports a duration (~2 s)
+MAX_RETRIES = 40
+RETRY_MS = 50
+# A seek mpv hasn't confirmed after this long no longer blocks the next one
+SEEK_TIMEOUT = 0.5
+# Quiet time after the last j/l press before the exact seek is made
+SETTLE_MS = 250
+
+
+# Turns bursts of seek requests into a few seeks mpv can keep up with.
+#
+# Only the latest target is kept and at most one seek is in flight: the
+# next one is sent when mpv reports the previous one done (playback
+# restart), so scrubbing follows the cursor instead of queueing every
+# motion event. While scrubbing or holding j/l, fast keyframe seeks are
+# used; one exact seek lands on the final target (slider release, or once
+# the keys go quiet). Relative steps add up on top of the pending target.
+# Runs on the thread that owns the PlaybackCore (the Tk thread in the app).
+class SeekScheduler:
+    def __init__(self, core):
+        self.core = core
+
+        self.target = None       # seconds, latest requested position
+        self.exact = False       # next dispatch is the final, exact seek
+        self.in_flight_at = None # perf_counter() of the seek mpv is working on
+        self.sent = None         # (target, exact) of the last seek sent
+        self.dispatched = 0      # seeks actually sent to mpv
+        self.requested = 0       # seek requests received
+
+        self._fraction = None    # slider position waiting for a duration
+        self._retries = 0
+        self._retry_job = None
+        self._settle_job = None
+        self._timeout_job = None
+
+    @property
+    def backend(self):
+        return self.core.backend
+
+    # -------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------
+    def seek_fraction(self, fraction, final=False):
+        self.requested += 1
+        self._fraction = (fraction, final)
+        self._retries = 0
+        self._try_fraction()
+
+    def _try_fraction(self):
+        self._retry_job = None
+        if self._fraction is None:
+            return
+        duration = self.core.duration
+        if not self.backend or not duration:
+            # Duration not known yet (file still opening): retry, but not forever
+            self._retries += 1
+            if self._retries <= MAX_RETRIES:
+                self._retry_job = self.core.after(RETRY_MS, self._try_fraction)
+            else:
+                self._fraction = None
+            return
+
+        fraction, final = self._fraction
+        self._fraction = None
+        self.seek_to(fraction * duration, final)
+
+    def seek_by(self, seconds):
+        # Relative to the position still being sought to, so repeats add up
+        self.requested += 1
+        base = self.target if self.target is not None else self.core.time_pos
+        if base is None:
+            return
+        self.seek_to(base + seconds, final=False)
+
+        # The exact seek happens once the key is released (no repeat for a while)
+        if self._settle_job is not None:
+            self.core.after_cancel(self._settle_job)
+        self._settle_job = self.core.after(SETTLE_MS, self._settle)
+
+    def _settle(self):
+        self._settle_job = None
+        if self.target is not None:
+            self.exact = True
+            self._dispatch()
+
+    def seek_to(self, seconds, final=False):
+        duration = self.core.duration
+        if duration:
+            seconds = min(seconds, duration)
+        self.target = max(0.0, seconds)
+        self.exact = self.exact or final
+        self._dispatch()
+
+    def cancel(self):
+        self.target = None
+        self.exact = False
+        self.in_flight_at = None
+        self.sent = None
+        self._fraction = None
+        for job in (self._retry_job, self._settle_job, self._timeout_job):
+            if job is not None:
+                self.core.after_cancel(job)
+        self._retry_job = self._settle_job = self._timeout_job = None
+
+    # -------------------------------------------------------------
+    # Talking to the backend
+    # -------------------------------------------------------------
+    def _dispatch(self):
+        if self.target is None or not self.backend:
+            return
+        if (self.target, self.exact) == self.sent:
+            return
+        if self.in_flight_at is not None:
+            waited = time.perf_counter() - self.in_flight_at
+            if waited < SEEK_TIMEOUT:
+                # seek_done() sends the latest target; don't wait forever for it
+                if self._timeout_job is None:
+                    delay = int((SEEK_TIMEOUT - waited) * 1000) + 1
+                    self._timeout_job = self.core.after(delay, self._on_timeout)
+                return
+
+        exact = self.exact
+        target = self.target
+        # Mark it sent first: the backend may report it done before seek() returns
+        self.in_flight_at = time.perf_counter()
+        self.sent = (target, exact)
+        if exact:
+            # Final position sent; later relative steps start from playback again.
+            # Keyframe targets are kept so repeated j/l presses add up.
+            self.target = None
+            self.exact = False
+        try:
+            self.backend.seek(target, precision="exact" if exact else "keyframes")
+        except Exception:
+            # Nothing loaded any more
+            self.cancel()
+            return
+        self.dispatched += 1
+
+    def _on_timeout(self):
+        self._timeout_job = None
+        self._dispatch()
+
+    # Called (on the owner thread) when the backend finished a seek
+    def seek_done(self):
+        self.in_flight_at = None
+        if self._timeout_job is not None:
+            self.core.after_cancel(self._timeout_job)
+            self._timeout_job = None
+        self._dispatch()
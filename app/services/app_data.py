@@ -0,0 +1,32 @@
+import os
+import sys
+
+APP_DIR_NAME = "AuroraX"
+
+
+# Per-user folder for persistent data (library index, settings, ...)
+def data_dir():
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return _ensure(os.path.join(base, APP_DIR_NAME))
+
+
+# Per-user folder for data that can be thrown away and regenerated
+def cache_dir():
+    if os.name == "nt":
+        base = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), APP_DIR_NAME)
+        return _ensure(os.path.join(base, "Cache"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return _ensure(os.path.join(base, APP_DIR_NAME))
+
+
+def _ensure(path):
+    os.makedirs(path, exist_ok=True)
+    return path
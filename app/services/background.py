@@ -0,0 +1,41 @@
+import threading
+
+
+# Runs a function on a daemon thread and keeps its outcome around so the UI
+# can poll for it from after() callbacks. Cancelling tells the caller to
+# ignore the result; targets that take a `cancel` Event keyword get it set too.
+class BackgroundTask:
+    def __init__(self, target, *args, **kwargs):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+
+        self.result = None
+        self.error = None
+        self.cancel_event = kwargs.get("cancel") or threading.Event()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="BackgroundTask", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.target(*self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
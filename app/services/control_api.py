@@ -0,0 +1,287 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import queue
+import secrets
+import socket
+import tempfile
+import threading
+from app.services.app_data import data_dir
+
+DEFAULT_TCP_PORT = 47800
+REPLY_TIMEOUT = 5.0  # seconds to wait for the UI thread to run a command
+TOKEN_FILE = "control.token"
+
+logger = logging.getLogger(__name__)
+
+
+def control_address(value=None):
+    # From AURORAX_CONTROL: "1" for the default socket, "tcp:PORT" for
+    # localhost TCP, anything else is a socket path. None when unset.
+    value = value if value is not None else os.environ.get("AURORAX_CONTROL")
+    if not value:
+        return None
+    if value.lower().startswith("tcp:"):
+        return ("127.0.0.1", int(value[4:]))
+    if value == "1":
+        if not hasattr(socket, "AF_UNIX"):
+            return ("127.0.0.1", DEFAULT_TCP_PORT)
+        base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+        return os.path.join(base, f"aurorax-{user}-control.sock")
+    return value
+
+
+# Where TCP clients find the token: the per-user data folder
+def token_path():
+    return os.path.join(data_dir(), TOKEN_FILE)
+
+
+def write_token(path):
+    # A fresh random token in a file only the user can read
+    token = secrets.token_hex(16)
+    temp = path + ".tmp"
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    os.replace(temp, path)
+    return token
+
+
+class _Subscriber:
+    def __init__(self, writer):
+        self.writer = writer
+        self.wake = asyncio.Event()
+        self.sent = 0  # version of the last status written
+        self.task = None
+
+    async def run(self, server):
+        # Always writes the newest status; while a slow client drains,
+        # the states in between are skipped instead of queued
+        try:
+            while True:
+                await self.wake.wait()
+                self.wake.clear()
+                version, line = server.latest
+                if version == self.sent or line is None:
+                    continue
+                self.sent = version
+                self.writer.write(line)
+                await self.writer.drain()
+        except ConnectionError:
+            pass  # the client's reader notices too
+
+
+# Local control and status API: JSON lines over a Unix socket or localhost TCP.
+#
+# Requests are {"id": 1, "cmd": "pause"} (plus arguments); every request gets
+# {"id": 1, "ok": true, "status": {...}} or {"id": 1, "ok": false, "error": "..."}.
+# After {"cmd": "subscribe"} the connection also receives
+# {"event": "status", ...} lines whenever the player state changes.
+#
+# Any local process can reach a TCP port, so TCP connections must first
+# prove they can read the user's token file: the first line carries
+# {"token": "..."} (alone or along with a command). On both transports a
+# connection whose first line isn't a JSON object (an HTTP request sent by
+# a browser, say) is closed without running anything.
+#
+# The asyncio loop runs on its own thread. Commands are queued for the UI
+# thread, which runs them from its own timer (pending() / reply()) and
+# never waits on a client. publish() only stores the newest status and
+# wakes the loop once; the loop encodes it once and every subscriber
+# writes the same bytes, so a burst of updates or a slow client costs the
+# UI thread nothing extra.
+class ControlServer:
+    def __init__(self, address, token=None):
+        self.address = address  # socket path or (host, port)
+        self.token = token      # required from TCP clients; written to token_path() by start()
+        self.loop = None
+        self.error = None
+        self.latest = (0, None)  # (version, encoded status line)
+
+        self._commands = queue.Queue()
+        self._subscribers = set()
+        self._status = None
+        self._wake_pending = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = None
+        self._thread = None
+
+    def start(self, timeout=5.0):
+        # Returns self once listening, or None (see .error)
+        if isinstance(self.address, tuple) and self.token is None:
+            try:
+                self.token = write_token(token_path())
+            except OSError as e:
+                logger.warning("Control API not started: cannot write the token file: %s", e)
+                return None
+        self._thread = threading.Thread(target=self._run, name="ControlServer", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self.loop is None or self.error is not None:
+            logger.warning("Control API not started on %s: %s", self.address, self.error or "timed out")
+            return None
+        logger.info("Control API listening on %s", self.address)
+        return self
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        if isinstance(self.address, tuple):
+            server = await asyncio.start_server(self._client, *self.address)
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # left behind by an earlier run
+            old_umask = os.umask(0o177)  # owner only
+            try:
+                server = await asyncio.start_unix_server(self._client, self.address)
+            finally:
+                os.umask(old_umask)
+        self.loop = asyncio.get_running_loop()
+        self._ready.set()
+
+        async with server:
+            await self._stop.wait()
+        for subscriber in list(self._subscribers):
+            subscriber.task.cancel()
+        if not isinstance(self.address, tuple):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def close(self):
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._stop.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    # -------------------------------------------------------------
+    # Clients (loop thread)
+    # -------------------------------------------------------------
+    async def _client(self, reader, writer):
+        subscriber = None
+        first = True
+        authenticated = not isinstance(self.address, tuple)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    self._write(writer, {"ok": False, "error": "expected a JSON object with \"cmd\""})
+                    if first:
+                        break  # not one of our clients
+                    continue
+                first = False
+
+                if not authenticated:
+                    token = str(request.get("token", "")).encode("utf-8", "replace")
+                    if not hmac.compare_digest(token, self.token.encode("ascii")):
+                        self._write(writer, {"id": request.get("id"), "ok": False, "error": "invalid token"})
+                        break
+                    authenticated = True
+                    if "cmd" not in request:
+                        self._write(writer, {"id": request.get("id"), "ok": True})
+                        continue
+                command = request.get("cmd")
+                if not isinstance(command, str):
+                    self._write(writer, {"ok": False, "error": "expected a JSON object with \"cmd\""})
+                    continue
+
+                if command == "subscribe":
+                    if subscriber is None:
+                        subscriber = _Subscriber(writer)
+                        subscriber.task = asyncio.create_task(subscriber.run(self))
+                        self._subscribers.add(subscriber)
+                        subscriber.wake.set()  # the current status right away
+                    self._write(writer, {"id": request.get("id"), "ok": True})
+                    continue
+
+                future = self.loop.create_future()
+                self._commands.put((request, future))
+                try:
+                    status = await asyncio.wait_for(future, REPLY_TIMEOUT)
+                    reply = {"id": request.get("id"), "ok": True, "status": status}
+                except asyncio.TimeoutError:
+                    reply = {"id": request.get("id"), "ok": False, "error": "player did not respond"}
+                except Exception as e:
+                    reply = {"id": request.get("id"), "ok": False, "error": str(e)}
+                self._write(writer, reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # the server is closing
+        finally:
+            if subscriber is not None:
+                self._subscribers.discard(subscriber)
+                subscriber.task.cancel()
+            writer.close()
+
+    @staticmethod
+    def _write(writer, message):
+        writer.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    def _fan_out(self):
+        with self._lock:
+            self._wake_pending = False
+            status = self._status
+        self.latest = (self.latest[0] + 1, json.dumps({"event": "status", **status}).encode("utf-8") + b"\n")
+        for subscriber in self._subscribers:
+            subscriber.wake.set()
+
+    # -------------------------------------------------------------
+    # UI thread
+    # -------------------------------------------------------------
+    def publish(self, status):
+        # Newest status wins; the loop is woken at most once until it ran
+        with self._lock:
+            self._status = status
+            if self._wake_pending or self.loop is None:
+                return
+            self._wake_pending = True
+        try:
+            self.loop.call_soon_threadsafe(self._fan_out)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def pending(self):
+        # Commands waiting for the UI thread: [(request, reply token)]
+        commands = []
+        while True:
+            try:
+                commands.append(self._commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def reply(self, token, status=None, error=None):
+        def settle():
+            if token.done():
+                return  # the client timed out or went away
+            if error is not None:
+                token.set_exception(error)
+            else:
+                token.set_result(status)
+        try:
+            self.loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass
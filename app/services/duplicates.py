@@ -0,0 +1,244 @@
+import hashlib
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.services.library_index import normalize
+
+CHUNK = 64 * 1024           # bytes read at each sample point
+SAMPLES = 3                 # head, middle and tail
+FULL_READ = 1024 * 1024     # read size while hashing a whole file
+MIN_SIZE = 1                # empty files are never reported
+BATCH_PER_WORKER = 4        # files handed to each worker between cancel checks
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------
+# Worker processes
+# -------------------------------------------------------------
+def sample_hash(path):
+    # -> (path, size, mtime_ns, digest, complete) or None if unreadable.
+    # `complete`: the samples covered the whole file, so the digest is
+    # also its full hash
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+            if size <= CHUNK * SAMPLES:
+                digest.update(f.read())
+                return path, size, st.st_mtime_ns, digest.digest(), True
+            for offset in (0, size // 2 - CHUNK // 2, size - CHUNK):
+                f.seek(offset)
+                digest.update(f.read(CHUNK))
+            return path, size, st.st_mtime_ns, digest.digest(), False
+    except OSError:
+        return None
+
+
+def full_hash(path):
+    # -> (path, size, mtime_ns, digest) or None if unreadable
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            digest = hashlib.blake2b(str(st.st_size).encode(), digest_size=16)
+            while True:
+                data = f.read(FULL_READ)
+                if not data:
+                    break
+                digest.update(data)
+            return path, st.st_size, st.st_mtime_ns, digest.digest()
+    except OSError:
+        return None
+
+
+def _groups(keyed):
+    # {key: [paths]} -> only keys shared by two or more paths
+    return {key: paths for key, paths in keyed.items() if len(paths) > 1}
+
+
+# Finds files with identical contents on a worker thread.
+#
+# Candidates are the indexed files sharing their size with another one
+# (one SQL query) plus the paths of any extra lists (e.g. snapshots of the
+# loaded folder and playlist, expanded on the worker thread). Each stage
+# only looks at what the previous one left grouped together:
+#   1. size
+#   2. a hash of three 64 KB samples (head, middle, tail)
+#   3. a full hash, only for files still colliding after the samples
+# Hashing runs in a process pool. Both hashes are cached in the library
+# index per (path, size, mtime), so a second run only reads changed files.
+#
+# Progress counters are written by the worker and read by the UI; the
+# result is `groups`: [(size, [paths])], largest waste first.
+class DuplicateFinder:
+    def __init__(self, library, extra_lists=(), min_size=MIN_SIZE, max_workers=None):
+        self.library = library
+        self.extra_lists = list(extra_lists)  # sequences of paths, read by the worker
+        self.min_size = min_size
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+
+        # Progress (written by the worker, read by the UI)
+        self.stage = "sizes"     # "sizes", "samples", "full", "done"
+        self.candidates = 0      # files sharing their size with another
+        self.hashed = 0          # files hashed in the current stage
+        self.to_hash = 0         # files to hash in the current stage
+        self.cache_hits = 0
+        self.bytes_total = 0     # what hashing every candidate in full would read
+        self.bytes_read = 0
+        self.groups = []
+        self.error = None
+
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._pool = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="DuplicateFinder", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    @property
+    def wasted(self):
+        # Bytes taken by the copies beyond the first of each group
+        return sum(size * (len(paths) - 1) for size, paths in self.groups)
+
+    def _run(self):
+        try:
+            self.groups = self._find()
+        except Exception as e:
+            logger.exception("Duplicate search failed")
+            self.error = e
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self.stage = "done"
+            self._finished.set()
+
+    def _find(self):
+        by_size = self._sizes()
+        self.candidates = sum(len(files) for files in by_size.values())
+        self.bytes_total = sum(size * len(files) for size, files in by_size.items())
+
+        # Stage 2: sampled hash
+        by_sample = {}
+        complete = set()  # sample keys whose digest covers the whole file
+        self._start_stage("samples", self.candidates)
+        todo = []
+        for files in by_size.values():
+            for path, size, mtime in files:
+                sample, full = self.library.lookup_hashes(path, size, mtime)
+                if sample is None:
+                    todo.append(path)
+                    continue
+                self._hashed_one(cached=True)
+                by_sample.setdefault((size, sample), []).append(path)
+                if size <= CHUNK * SAMPLES:
+                    complete.add((size, sample))
+        for results in self._hash(sample_hash, todo):
+            rows = []
+            for path, size, mtime, sample, whole in results:
+                self.bytes_read += min(size, CHUNK * SAMPLES)
+                rows.append((path, size, mtime, sample))
+                by_sample.setdefault((size, sample), []).append(path)
+                if whole:
+                    complete.add((size, sample))
+            self.library.store_sample_hashes(rows)
+        if self.cancelled:
+            return []
+
+        # Stage 3: full hash of what still collides
+        by_full = {}
+        colliding = _groups(by_sample)
+        for key in complete.intersection(colliding):
+            by_full[key] = colliding.pop(key)
+        self._start_stage("full", sum(len(paths) for paths in colliding.values()))
+        todo = []
+        for (size, _), paths in colliding.items():
+            for path in paths:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    self._hashed_one()  # gone since the samples
+                    continue
+                _, full = self.library.lookup_hashes(path, size, mtime)
+                if full is None:
+                    todo.append(path)
+                    continue
+                self._hashed_one(cached=True)
+                by_full.setdefault((size, full), []).append(path)
+        for results in self._hash(full_hash, todo):
+            for path, size, mtime, full in results:
+                self.bytes_read += size
+                by_full.setdefault((size, full), []).append(path)
+            self.library.store_full_hashes(results)
+        if self.cancelled:
+            return []
+
+        groups = [(size, sorted(paths)) for (size, _), paths in _groups(by_full).items()]
+        groups.sort(key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+        return groups
+
+    # Stage 1: {size: [(path, size, mtime)]} for sizes shared by two or more files
+    def _sizes(self):
+        by_size = {}
+        seen = set()
+        for path, size, mtime in self.library.same_size_files(self.min_size):
+            seen.add(path)
+            by_size.setdefault(size, []).append((path, size, mtime))
+        for path in itertools.chain.from_iterable(self.extra_lists):
+            if "://" in path:
+                continue
+            path = normalize(path)
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size >= self.min_size:
+                by_size.setdefault(st.st_size, []).append((path, st.st_size, st.st_mtime_ns))
+            if self.cancelled:
+                return {}
+        return _groups(by_size)
+
+    def _start_stage(self, stage, count):
+        self.stage = stage
+        self.hashed = 0
+        self.to_hash = count
+
+    def _hashed_one(self, cached=False):
+        self.hashed += 1
+        if cached:
+            self.cache_hits += 1
+
+    def _hash(self, func, paths):
+        # Runs func over paths in the pool; yields the readable results in
+        # batches (stops early when cancelled)
+        batch = self.max_workers * BATCH_PER_WORKER
+        for start in range(0, len(paths), batch):
+            if self.cancelled:
+                return
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            results = []
+            for result in self._pool.map(func, paths[start:start + batch]):
+                self.hashed += 1
+                if result is not None:
+                    results.append(result)
+            yield results
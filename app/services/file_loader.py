@@ -1,10 +1,18 @@
 import os
 from tkinter import filedialog
+from app.services.folder_scanner import FolderScanner
 
 class FileLoader:
-    def load(self, allowed_exts):
+    def select_folder(self):
         folder = filedialog.askdirectory(title="Select Video Folder", initialdir=os.getcwd())
+        return folder or None
+
+    def scan(self, folder, allowed_exts):
+        # Listing happens on a worker thread; poll the scanner for results
+        return FolderScanner(folder, allowed_exts).start()
+
+    def load(self, allowed_exts):
+        folder = self.select_folder()
         if not folder:
-            return [], None
-        files = [f for f in os.listdir(folder) if f.lower().endswith(tuple(allowed_exts))]
-        return files, folder
\ No newline at end of file
+            return None, None
+        return self.scan(folder, allowed_exts), folder
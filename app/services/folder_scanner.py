@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+import time
+
+
+# Scans a folder for media files on a worker thread. Matching names are
+# handed over in chunks through a queue so the UI can insert them as they
+# arrive instead of waiting for the whole listing.
+class FolderScanner:
+    def __init__(self, folder, allowed_exts, chunk_size=256, flush_interval=0.05):
+        self.folder = folder
+        self.allowed_exts = tuple(ext.lower() for ext in allowed_exts)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+
+        # Progress counters (written by the worker, read by the UI)
+        self.scanned = 0   # directory entries looked at
+        self.matched = 0   # media files found
+        self.error = None
+
+        self._chunks = queue.Queue()
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FolderScanner", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def _run(self):
+        chunk = []
+        last_flush = time.monotonic()
+
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if self._cancel.is_set():
+                        return
+
+                    self.scanned += 1
+                    name = entry.name
+                    if not name.lower().endswith(self.allowed_exts):
+                        continue
+
+                    # is_file() reuses the d_type from the directory listing,
+                    # so no extra stat is needed on most filesystems
+                    try:
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    chunk.append(name)
+                    self.matched += 1
+
+                    # Flush the first row right away, then by size or time
+                    now = time.monotonic()
+                    if (
+                        self.matched == 1
+                        or len(chunk) >= self.chunk_size
+                        or now - last_flush >= self.flush_interval
+                    ):
+                        self._chunks.put(chunk)
+                        chunk = []
+                        last_flush = now
+
+        except OSError as e:
+            self.error = e
+
+        finally:
+            if chunk and not self._cancel.is_set():
+                self._chunks.put(chunk)
+            self._finished.set()
+
+    # Return the names found since the last call (non-blocking). At most
+    # ~max_items names are returned so a single UI tick never inserts the
+    # whole folder at once; `done` is True once everything was handed out.
+    def drain(self, max_items=2000):
+        names = []
+        while len(names) < max_items:
+            try:
+                names.extend(self._chunks.get_nowait())
+            except queue.Empty:
+                break
+
+        done = self._finished.is_set() and self._chunks.empty()
+        return names, done
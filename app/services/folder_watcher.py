@@ -0,0 +1,280 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+_libc = None
+
+
+def _inotify_libc():
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                libc.inotify_init1  # older libcs don't have it
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc
+
+
+# Watches one folder for media files appearing, disappearing or being renamed.
+#
+# Linux uses inotify on a worker thread; elsewhere (or when no inotify
+# watch can be added) the folder's mtime is polled and only a changed
+# folder is listed again. Events are debounced: a batch is published once
+# the folder has been quiet for `debounce` seconds, or after `max_delay`
+# under a steady stream, with repeated events for a name collapsed to the
+# last one. drain() hands out the batched changes in order as
+#   ("add", name, None), ("remove", name, None), ("rename", new, old)
+# or ("resync", set of names, None) when events were lost and the full
+# listing has to be compared instead.
+class FolderWatcher:
+    def __init__(self, folder, allowed_exts, debounce=0.5, max_delay=2.0, poll_interval=2.0):
+        self.folder = folder
+        self.allowed_exts = tuple(ext.lower() for ext in allowed_exts)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+        self.mode = None    # "inotify" or "polling" once started
+        self.events = 0     # raw filesystem events seen
+        self.batches = 0    # batches published
+
+        self._batch = {}    # name -> (op, old name), in event order
+        self._moves = {}    # inotify cookie -> name moved away
+        self._first_event = None
+        self._last_event = None
+        self._ready = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FolderWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # Changes published since the last call (non-blocking)
+    def drain(self):
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return ready
+
+    # -------------------------------------------------------------
+    # Batching (worker thread)
+    # -------------------------------------------------------------
+    def _is_media(self, name):
+        return name.lower().endswith(self.allowed_exts)
+
+    def _note(self):
+        now = time.monotonic()
+        self.events += 1
+        self._last_event = now
+        if self._first_event is None:
+            self._first_event = now
+
+    def _added(self, name):
+        if self._is_media(name):
+            self._batch.pop(name, None)
+            self._batch[name] = ("add", None)
+
+    def _removed(self, name):
+        if not self._is_media(name):
+            return
+        previous = self._batch.pop(name, None)
+        if previous is not None and previous[0] == "rename":
+            # Renamed and then deleted: the original name is gone too
+            self._batch.pop(previous[1], None)
+            self._batch[previous[1]] = ("remove", None)
+        self._batch[name] = ("remove", None)
+
+    def _renamed(self, old, new):
+        if not self._is_media(old):
+            self._added(new)  # e.g. a finished "movie.mkv.part"
+            return
+        if not self._is_media(new):
+            self._removed(old)
+            return
+        previous = self._batch.pop(old, None)
+        if previous is not None and previous[0] == "add":
+            self._added(new)  # never seen under the old name
+            return
+        if previous is not None and previous[0] == "rename":
+            old = previous[1]
+        self._batch.pop(new, None)
+        self._batch[new] = ("rename", old)
+
+    def _resync(self):
+        names = set()
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    try:
+                        if self._is_media(entry.name) and entry.is_file():
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        self._batch.clear()
+        self._moves.clear()
+        self._batch[None] = ("resync", names)
+        return names
+
+    def _due(self, now):
+        if self._first_event is None:
+            return False
+        return now - self._last_event >= self.debounce or now - self._first_event >= self.max_delay
+
+    def _publish(self):
+        # Moves whose other half never arrived left the folder
+        for name in self._moves.values():
+            self._removed(name)
+        self._moves.clear()
+        self._first_event = self._last_event = None
+        if not self._batch:
+            return
+
+        changes = []
+        for name, (op, other) in self._batch.items():
+            changes.append((op, other, None) if op == "resync" else (op, name, other))
+        self._batch = {}
+        self.batches += 1
+        with self._lock:
+            self._ready.extend(changes)
+
+    def _run(self):
+        try:
+            if not self._run_inotify():
+                self._run_polling()
+        except Exception:
+            # A watcher must never take the app down; fall back to polling
+            if not self._cancel.is_set() and self.mode != "polling":
+                self._run_polling()
+
+    # -------------------------------------------------------------
+    # inotify
+    # -------------------------------------------------------------
+    def _run_inotify(self):
+        libc = _inotify_libc()
+        if not libc:
+            return False
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        try:
+            if libc.inotify_add_watch(fd, os.fsencode(self.folder), WATCH_MASK) < 0:
+                return False  # e.g. out of watches (ENOSPC)
+            self.mode = "inotify"
+
+            while not self._cancel.is_set():
+                timeout = 0.25
+                if self._last_event is not None:
+                    timeout = min(timeout, max(0.0, self._last_event + self.debounce - time.monotonic()))
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if readable:
+                    try:
+                        data = os.read(fd, 64 * 1024)
+                    except BlockingIOError:
+                        data = b""
+                    if not self._handle(data):
+                        break
+                if self._due(time.monotonic()):
+                    self._publish()
+            self._publish()
+            return True
+        finally:
+            os.close(fd)
+
+    def _handle(self, data):
+        # Returns False once the folder itself is gone
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(sys.getfilesystemencoding(), "surrogateescape")
+            offset += length
+            self._note()
+
+            if mask & IN_Q_OVERFLOW:
+                self._resync()
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                return False
+            elif mask & IN_ISDIR:
+                continue
+            elif mask & IN_MOVED_FROM:
+                self._moves[cookie] = name
+            elif mask & IN_MOVED_TO:
+                old = self._moves.pop(cookie, None)
+                if old is None:
+                    self._added(name)
+                else:
+                    self._renamed(old, name)
+            elif mask & IN_CLOSE_WRITE:
+                self._added(name)
+            elif mask & IN_DELETE:
+                self._removed(name)
+        return True
+
+    # -------------------------------------------------------------
+    # Polling fallback
+    # -------------------------------------------------------------
+    def _run_polling(self):
+        self.mode = "polling"
+        try:
+            last_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return
+        known = self._resync()
+        self._batch.clear()  # the starting point, not a change
+
+        while not self._cancel.wait(self.poll_interval):
+            try:
+                mtime = os.stat(self.folder).st_mtime_ns
+            except OSError:
+                return
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+
+            names = self._resync()
+            self._batch.clear()
+            for name in sorted(known - names):
+                self._removed(name)
+            for name in sorted(names - known):
+                self._added(name)
+            known = names
+            self.events += 1
+            self._publish()
@@ -0,0 +1,205 @@
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from app.services.app_data import cache_dir
+
+USER_AGENT = "AuroraX-Player"
+MAX_REDIRECTS = 5
+
+
+class HttpError(Exception):
+    def __init__(self, url, status, reason=""):
+        super().__init__(f"HTTP {status} {reason}".strip() + f" for {url}")
+        self.url = url
+        self.status = status
+
+
+# Minimal HTTP/1.1 client with per-host keep-alive connections.
+#
+# Idle connections are kept in a small pool per (scheme, host, port) and
+# reused, so fetching a playlist and then probing entries on the same
+# server doesn't pay a TCP/TLS handshake each time. A connection the
+# server already closed is replaced and the request retried once.
+class HttpClient:
+    def __init__(self, timeout=10, max_idle_per_host=4):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}  # (scheme, host, port) -> [connections]
+        self._lock = threading.Lock()
+
+    def _key(self, url):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        return scheme, parts.hostname, port
+
+    def _connect(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(key), False
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, headers=None):
+        # Returns (status, headers dict with lower-case names, body bytes, final url)
+        for _ in range(MAX_REDIRECTS + 1):
+            status, resp_headers, body = self._request_once(method, url, headers)
+            location = resp_headers.get("location")
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                if status == 303:
+                    method = "GET"
+                continue
+            return status, resp_headers, body, url
+        raise HttpError(url, 310, "Too many redirects")
+
+    def _request_once(self, method, url, headers):
+        key = self._key(url)
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        all_headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "identity"}
+        all_headers.update(headers or {})
+
+        conn, reused = self._connect(key)
+        try:
+            conn.request(method, target, headers=all_headers)
+            resp = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+            # Stale keep-alive connection: try once more on a fresh one
+            conn = self._new_connection(key)
+            try:
+                conn.request(method, target, headers=all_headers)
+                resp = conn.getresponse()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        try:
+            body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return resp.status, resp_headers, body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+# Downloads with an on-disk cache that honours ETag / Last-Modified.
+#
+# A cached copy is revalidated with If-None-Match / If-Modified-Since, so an
+# unchanged remote playlist costs a 304 and no transfer. If the server
+# can't be reached, the cached copy is used.
+class CachedFetcher:
+    def __init__(self, client=None, folder=None):
+        self.client = client or HttpClient()
+        self.folder = folder or os.path.join(cache_dir(), "http")
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _paths(self, url):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.folder, name)
+        return base + ".body", base + ".json"
+
+    def cached(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    # Returns (body bytes, final url after redirects, source) with source
+    # "network", "revalidated" or "offline"
+    def fetch(self, url):
+        meta, body = self.cached(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            status, resp_headers, data, final_url = self.client.request("GET", url, headers)
+            if status == 304 and body is None:
+                # Nothing here to revalidate (a cache on the way answered):
+                # ask again without conditions
+                headers = {"Cache-Control": "no-cache"}
+                status, resp_headers, data, final_url = self.client.request("GET", url, headers)
+        except (OSError, http.client.HTTPException):
+            if body is not None:
+                return body, meta.get("final_url", url), "offline"
+            raise
+
+        if status == 304 and body is not None:
+            meta["checked_at"] = time.time()
+            self._write_meta(url, meta)
+            return body, meta.get("final_url", url), "revalidated"
+        if status != 200:
+            raise HttpError(url, status)
+
+        self._store(url, data, {
+            "url": url,
+            "final_url": final_url,
+            "etag": resp_headers.get("etag"),
+            "last_modified": resp_headers.get("last-modified"),
+            "checked_at": time.time(),
+        })
+        return data, final_url, "network"
+
+    def _store(self, url, data, meta):
+        body_path, _ = self._paths(url)
+        tmp = body_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, body_path)
+        self._write_meta(url, meta)
+
+    def _write_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
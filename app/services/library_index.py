@@ -0,0 +1,357 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.services.app_data import data_dir
+from app.services.media_types import MEDIA_EXTS, media_kind
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path       TEXT PRIMARY KEY,
+    parent     TEXT,
+    mtime      INTEGER NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    dir      TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime    INTEGER NOT NULL,
+    kind     TEXT,
+    duration REAL,
+    meta     TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir, name);
+CREATE INDEX IF NOT EXISTS files_size ON files(size);
+
+CREATE TABLE IF NOT EXISTS hashes (
+    path   TEXT PRIMARY KEY,
+    size   INTEGER NOT NULL,
+    mtime  INTEGER NOT NULL,
+    sample BLOB,
+    full   BLOB
+);
+
+CREATE TABLE IF NOT EXISTS loudness (
+    path  TEXT PRIMARY KEY,
+    size  INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    lufs  REAL,
+    peak  REAL
+);
+"""
+
+
+def normalize(path):
+    return os.path.normpath(os.path.abspath(path))
+
+
+# Persistent index of media files backed by SQLite.
+#
+# Each scanned directory is stored with its mtime. On a rescan only the
+# directories whose mtime changed are listed again; unchanged directories
+# cost a single stat (their subfolders are taken from the index), so
+# reopening a large library is a couple of indexed queries instead of a
+# full filesystem walk.
+class LibraryIndex:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(data_dir(), "library.db")
+        self._local = threading.local()
+
+    # One connection per thread: scans run on workers, queries on the UI thread
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------
+    def knows_folder(self, folder):
+        row = self.connection().execute(
+            "SELECT 1 FROM dirs WHERE path = ?", (normalize(folder),)
+        ).fetchone()
+        return row is not None
+
+    def contains(self, path):
+        row = self.connection().execute(
+            "SELECT 1 FROM files WHERE path = ?", (normalize(path),)
+        ).fetchone()
+        return row is not None
+
+    def files_in(self, folder, recursive=False):
+        folder = normalize(folder)
+        conn = self.connection()
+        if not recursive:
+            cur = conn.execute(
+                "SELECT path, name, size, mtime, kind, duration FROM files "
+                "WHERE dir = ? ORDER BY name", (folder,)
+            )
+        else:
+            prefix = folder.rstrip(os.sep) + os.sep
+            cur = conn.execute(
+                "SELECT path, name, size, mtime, kind, duration FROM files "
+                "WHERE dir = ? OR (dir >= ? AND dir < ?) ORDER BY dir, name",
+                (folder, prefix, prefix + "\uffff")
+            )
+        return [
+            {"path": r[0], "name": r[1], "size": r[2], "mtime": r[3], "kind": r[4], "duration": r[5]}
+            for r in cur
+        ]
+
+    def get(self, path):
+        row = self.connection().execute(
+            "SELECT path, name, size, mtime, kind, duration, meta FROM files WHERE path = ?",
+            (normalize(path),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "path": row[0], "name": row[1], "size": row[2], "mtime": row[3],
+            "kind": row[4], "duration": row[5],
+            "meta": json.loads(row[6]) if row[6] else None,
+        }
+
+    # Probed metadata for this exact file version, or None
+    def lookup_meta(self, path, size, mtime):
+        row = self.connection().execute(
+            "SELECT meta FROM files WHERE path = ? AND size = ? AND mtime = ?",
+            (normalize(path), size, mtime)
+        ).fetchone()
+        if row is None or not row[0]:
+            return None
+        return json.loads(row[0])
+
+    # Record probed metadata; also indexes files that were never scanned
+    # (e.g. playlist entries outside any loaded folder)
+    def store_meta(self, path, size, mtime, meta):
+        path = normalize(path)
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO files (path, dir, name, size, mtime, kind, duration, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "duration = excluded.duration, meta = excluded.meta",
+                (path, os.path.dirname(path), os.path.basename(path), size, mtime,
+                 media_kind(path), meta.get("duration"), json.dumps(meta))
+            )
+
+    def set_meta(self, path, meta):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "UPDATE files SET duration = ?, meta = ? WHERE path = ?",
+                (meta.get("duration"), json.dumps(meta), normalize(path))
+            )
+
+    # -------------------------------------------------------------
+    # Content hashes (duplicate finder)
+    # -------------------------------------------------------------
+    # Indexed files sharing their size with another one: [(path, size, mtime)]
+    def same_size_files(self, min_size=1):
+        cur = self.connection().execute(
+            "SELECT path, size, mtime FROM files WHERE size IN "
+            "(SELECT size FROM files WHERE size >= ? GROUP BY size HAVING COUNT(*) > 1) "
+            "ORDER BY size", (min_size,)
+        )
+        return cur.fetchall()
+
+    # Hashes recorded for this exact file version: (sample, full), either may be None
+    def lookup_hashes(self, path, size, mtime):
+        row = self.connection().execute(
+            "SELECT sample, full FROM hashes WHERE path = ? AND size = ? AND mtime = ?",
+            (normalize(path), size, mtime)
+        ).fetchone()
+        return (row[0], row[1]) if row is not None else (None, None)
+
+    # rows: (path, size, mtime, sample); a new version loses its full hash
+    def store_sample_hashes(self, rows):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO hashes (path, size, mtime, sample) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "sample = excluded.sample, full = NULL",
+                [(normalize(path), size, mtime, sample) for path, size, mtime, sample in rows]
+            )
+
+    # rows: (path, size, mtime, full); stored along with the sample hash
+    def store_full_hashes(self, rows):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "UPDATE hashes SET full = ? WHERE path = ? AND size = ? AND mtime = ?",
+                [(full, normalize(path), size, mtime) for path, size, mtime, full in rows]
+            )
+
+    # -------------------------------------------------------------
+    # Loudness (normalization)
+    # -------------------------------------------------------------
+    # (lufs, peak) measured for this exact file version, or None when it
+    # wasn't measured. lufs is None for silent or undecodable files
+    def lookup_loudness(self, path, size, mtime):
+        row = self.connection().execute(
+            "SELECT lufs, peak FROM loudness WHERE path = ? AND size = ? AND mtime = ?",
+            (normalize(path), size, mtime)
+        ).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    # rows: (path, size, mtime, lufs, peak)
+    def store_loudness(self, rows):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO loudness (path, size, mtime, lufs, peak) VALUES (?, ?, ?, ?, ?)",
+                [(normalize(path), size, mtime, lufs, peak) for path, size, mtime, lufs, peak in rows]
+            )
+
+    # -------------------------------------------------------------
+    # Incremental scan
+    # -------------------------------------------------------------
+    # `changes`, if given, is a list that receives ("add", path) for every
+    # added or updated file and ("remove", path) for every removed one
+    def refresh(self, root, allowed_exts=MEDIA_EXTS, recursive=False, cancel=None, changes=None):
+        root = normalize(root)
+        exts = tuple(ext.lower() for ext in allowed_exts)
+        conn = self.connection()
+        stats = {"dirs_checked": 0, "dirs_scanned": 0, "added": 0, "updated": 0, "removed": 0}
+
+        pending = [(root, os.path.dirname(root))]
+        while pending:
+            if cancel is not None and cancel.is_set():
+                break
+
+            folder, parent = pending.pop()
+            stats["dirs_checked"] += 1
+
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                self._forget_dir(conn, folder, stats, changes)
+                continue
+
+            row = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (folder,)).fetchone()
+            if row is not None and row[0] == mtime:
+                # Unchanged listing: reuse the known subfolders
+                if recursive:
+                    subdirs = conn.execute(
+                        "SELECT path FROM dirs WHERE parent = ?", (folder,)
+                    ).fetchall()
+                    pending.extend((d[0], folder) for d in subdirs)
+                continue
+
+            stats["dirs_scanned"] += 1
+            subdirs = self._scan_dir(conn, folder, parent, mtime, exts, stats, changes)
+            if recursive:
+                pending.extend((d, folder) for d in subdirs)
+
+        return stats
+
+    def _scan_dir(self, conn, folder, parent, mtime, exts, stats, changes):
+        known = {
+            r[0]: (r[1], r[2])
+            for r in conn.execute("SELECT name, size, mtime FROM files WHERE dir = ?", (folder,))
+        }
+        known_dirs = {
+            r[0] for r in conn.execute("SELECT path FROM dirs WHERE parent = ?", (folder,))
+        }
+
+        upserts = []
+        seen = set()
+        subdirs = []
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(os.path.join(folder, entry.name))
+                            continue
+                        if not entry.name.lower().endswith(exts) or not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+
+                    name = entry.name
+                    seen.add(name)
+                    old = known.get(name)
+                    if old == (st.st_size, st.st_mtime_ns):
+                        continue
+
+                    stats["updated" if old else "added"] += 1
+                    upserts.append((
+                        os.path.join(folder, name), folder, name,
+                        st.st_size, st.st_mtime_ns, media_kind(name)
+                    ))
+        except OSError:
+            return []
+
+        removed = [(os.path.join(folder, name),) for name in known if name not in seen]
+        stats["removed"] += len(removed)
+        if changes is not None:
+            changes.extend(("add", row[0]) for row in upserts)
+            changes.extend(("remove", row[0]) for row in removed)
+
+        with conn:
+            # Changed files lose their probed metadata; it will be probed again
+            conn.executemany(
+                "INSERT INTO files (path, dir, name, size, mtime, kind) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "kind = excluded.kind, duration = NULL, meta = NULL",
+                upserts
+            )
+            conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            conn.executemany("DELETE FROM hashes WHERE path = ?", removed)
+            conn.executemany("DELETE FROM loudness WHERE path = ?", removed)
+            conn.execute(
+                "INSERT OR REPLACE INTO dirs (path, parent, mtime, scanned_at) VALUES (?, ?, ?, ?)",
+                (folder, parent, mtime, time.time())
+            )
+
+        for gone in known_dirs.difference(subdirs):
+            self._forget_dir(conn, gone, stats, changes)
+
+        return subdirs
+
+    def _forget_dir(self, conn, folder, stats, changes=None):
+        prefix = folder.rstrip(os.sep) + os.sep
+        if changes is not None:
+            changes.extend(("remove", row[0]) for row in conn.execute(
+                "SELECT path FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                (folder, prefix, prefix + "\uffff")
+            ))
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                (folder, prefix, prefix + "\uffff")
+            )
+            stats["removed"] += cur.rowcount
+            conn.execute(
+                "DELETE FROM hashes WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\uffff")
+            )
+            conn.execute(
+                "DELETE FROM loudness WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\uffff")
+            )
+            conn.execute(
+                "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (folder, prefix, prefix + "\uffff")
+            )
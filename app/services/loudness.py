@@ -0,0 +1,396 @@
+import logging
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # loudness normalization is unavailable without it
+    np = None
+
+FFMPEG = shutil.which("ffmpeg")
+
+RATE = 48000                # the K-weighting coefficients below are for 48 kHz
+HOP = RATE // 10            # 100 ms: gating blocks overlap by 75 %
+BLOCK_HOPS = 4              # 400 ms gating blocks
+READ_HOPS = 100             # 10 s of audio per read
+
+ABSOLUTE_GATE = -70.0       # LUFS
+RELATIVE_GATE = -10.0       # LU below the absolutely gated loudness
+TARGET_LUFS = -18.0         # ReplayGain 2.0 reference level
+MAX_BOOST = 12.0            # dB; quiet tracks are not raised further than this
+
+# ITU-R BS.1770 K-weighting at 48 kHz: high shelf, then the RLB high-pass
+K_WEIGHTING = (
+    "biquad=b0=1.53512485958697:b1=-2.69169618940638:b2=1.19839281085285"
+    ":a0=1:a1=-1.69065929318241:a2=0.73248077421585,"
+    "biquad=b0=1.0:b1=-2.0:b2=1.0:a0=1:a1=-1.99004745483398:a2=0.99007225036621"
+)
+
+# First audio stream as 48 kHz float in its own channel layout, split into
+# a K-weighted copy (loudness) and the untouched signal (peak) and merged
+# into one interleaved stream: N weighted channels, then the N raw ones.
+# amerge needs the layout spelled out, hence audio_layout() first.
+GRAPH = (
+    "[0:a:0]aresample=48000,aformat=sample_fmts=flt:channel_layouts={layout},asplit[k][raw];"
+    "[k]" + K_WEIGHTING + "[kw];[kw][raw]amerge=inputs=2[out]"
+)
+
+# Channel mask bits (WAV / FFmpeg order) weighted differently by BS.1770
+LFE = 0x8                               # left out
+SURROUND = 0x10 | 0x20 | 0x200 | 0x400  # back and side left/right: 1.41
+DEFAULT_MASKS = {1: 0x4, 2: 0x3}        # plain WAV headers carry no mask
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------
+# Measurement (worker processes)
+# -------------------------------------------------------------
+def _wav_format(data):
+    # (channels, channel mask or 0) from a WAV header, or None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    position = 12
+    while position + 8 <= len(data):
+        chunk, size = struct.unpack_from("<4sI", data, position)
+        if chunk == b"fmt " and position + 12 <= len(data):
+            tag, channels = struct.unpack_from("<HH", data, position + 8)
+            mask = 0
+            if tag == 0xFFFE and size >= 24 and position + 32 <= len(data):
+                mask = struct.unpack_from("<I", data, position + 28)[0]
+            return channels, mask
+        position += 8 + size + size % 2
+    return None
+
+
+def audio_layout(path):
+    # (layout for aformat, BS.1770 weight per channel) of the first audio
+    # stream, from the header of a one-frame WAV decode; None without audio
+    try:
+        header = subprocess.run(
+            [FFMPEG or "ffmpeg", "-v", "error", "-nostdin", "-i", path, "-map", "0:a:0",
+             "-frames:a", "1", "-c:a", "pcm_f32le", "-f", "wav", "-"],
+            stdin=subprocess.DEVNULL, capture_output=True, timeout=30
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    found = _wav_format(header)
+    if not found or not found[0]:
+        return None
+    channels, mask = found
+    mask = mask or DEFAULT_MASKS.get(channels, 0)
+    bits = [1 << bit for bit in range(32) if mask >> bit & 1]
+    if len(bits) != channels:
+        return f"{channels}c", [1.0] * channels
+    return f"0x{mask:x}", [0.0 if bit == LFE else 1.41 if bit & SURROUND else 1.0 for bit in bits]
+
+
+def integrated_loudness(hops):
+    # BS.1770 gated loudness (LUFS) from the mean weighted K-filtered power
+    # of each 100 ms hop; None when everything is gated out
+    if len(hops) < BLOCK_HOPS:
+        return None
+    sums = np.concatenate(([0.0], np.cumsum(hops)))
+    blocks = (sums[BLOCK_HOPS:] - sums[:-BLOCK_HOPS]) / BLOCK_HOPS
+    with np.errstate(divide="ignore"):
+        levels = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[levels > ABSOLUTE_GATE]
+    if not gated.size:
+        return None
+    relative = -0.691 + 10 * math.log10(gated.mean()) + RELATIVE_GATE
+    gated = blocks[levels > max(ABSOLUTE_GATE, relative)]
+    return -0.691 + 10 * math.log10(gated.mean())
+
+
+# Accumulates the merged PCM of GRAPH in 100 ms hops. Each chunk is reduced
+# to one power value per hop and its peak with whole-array operations;
+# only those per-hop values are kept, so memory stays small for long files.
+class LoudnessMeter:
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.channels = len(weights)
+        self.frame_bytes = 4 * 2 * self.channels  # float32, weighted + raw
+        self.hop_bytes = HOP * self.frame_bytes
+        self.frames = 0
+        self.peak = 0.0
+        self._hops = []
+        self._rest = b""
+
+    @property
+    def read_size(self):
+        return READ_HOPS * self.hop_bytes
+
+    def feed(self, data):
+        if self._rest:
+            data = self._rest + data
+        usable = len(data) - len(data) % self.hop_bytes
+        self._rest = data[usable:]
+        if usable:
+            pcm = np.frombuffer(data, dtype="<f4", count=usable // 4)
+            self._add(pcm.reshape(-1, HOP, 2 * self.channels))
+
+    def _add(self, pcm):
+        self.frames += pcm.shape[0] * pcm.shape[1]
+        # Sum of squares per hop and channel; float32 is plenty for 4800 samples
+        weighted = pcm[:, :, :self.channels]
+        power = np.einsum("hfc,hfc->hc", weighted, weighted).astype(np.float64) @ self.weights
+        self._hops.append(power / HOP)
+        self._add_peak(pcm[:, :, self.channels:])
+
+    def _add_peak(self, raw):
+        if raw.size:
+            self.peak = max(self.peak, float(np.abs(raw).max()))
+
+    def result(self):
+        # (lufs, peak) or None when nothing was decoded. A last partial hop
+        # only counts for the peak, like an incomplete gating block
+        tail = self._rest[:len(self._rest) - len(self._rest) % self.frame_bytes]
+        if tail:
+            pcm = np.frombuffer(tail, dtype="<f4").reshape(-1, 2 * self.channels)
+            self._add_peak(pcm[:, self.channels:])
+        if not self.frames and not tail:
+            return None
+        hops = np.concatenate(self._hops) if self._hops else np.empty(0)
+        return integrated_loudness(hops), self.peak
+
+
+def measure_file(path):
+    # -> (lufs, peak) of the first audio stream: integrated loudness (None
+    # when silent) and sample peak (1.0 = full scale); None when there is
+    # no audio to decode
+    found = audio_layout(path)
+    if found is None:
+        return None
+    layout, weights = found
+    meter = LoudnessMeter(weights)
+    try:
+        proc = subprocess.Popen(
+            [FFMPEG or "ffmpeg", "-v", "error", "-nostdin", "-i", path,
+             "-filter_complex", GRAPH.format(layout=layout), "-map", "[out]",
+             "-f", "f32le", "-c:a", "pcm_f32le", "-"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    try:
+        while True:
+            data = proc.stdout.read(meter.read_size)
+            if not data:
+                break
+            meter.feed(data)
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    if proc.returncode != 0 and not meter.frames:
+        return None
+    return meter.result()
+
+
+def _lower_priority():
+    # Pool initializer: scans (and the ffmpeg they start) yield to playback
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def track_gain(lufs, peak, target=TARGET_LUFS):
+    # dB that bring a track to `target`, limited so its peak stays at or
+    # below full scale; 0 for silent or unmeasured tracks
+    if lufs is None:
+        return 0.0
+    gain = min(target - lufs, MAX_BOOST)
+    if peak:
+        gain = min(gain, -20 * math.log10(peak))
+    return round(gain, 2)
+
+
+# Background loudness scanner.
+#
+# Works like MetadataProbe: a feeder thread answers paths whose (path,
+# size, mtime) was measured before from the library index and sends the
+# rest to a process pool, one worker per core, with a bounded number of
+# files in flight. Every measurement is written to the index as soon as it
+# is done, so a scan that was cancelled or cut short by closing the app
+# resumes where it stopped the next time the same files are requested.
+#
+# Gains end up in `gains` (path -> dB), which PlaybackCore reads when it
+# loads a file: a dict lookup, nothing is measured at play time. drain()
+# returns the paths that got a gain since the last call.
+class LoudnessScanner:
+    def __init__(self, library, max_workers=None, target=TARGET_LUFS):
+        self.library = library
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.target = target
+        self.gains = {}
+
+        self.measured = 0    # files actually decoded
+        self.cache_hits = 0
+
+        self._requests = queue.Queue()
+        self._urgent = queue.Queue()
+        self._results = queue.Queue()
+        self._generation = 0
+        self._outstanding = 0  # requested paths not answered yet
+        self._submitted = set()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        self._pool = None
+        self._thread = None
+        self._closed = False
+
+    @property
+    def available(self):
+        return FFMPEG is not None and np is not None
+
+    def gain(self, path):
+        # dB for this path, or None when it hasn't been measured (yet)
+        return self.gains.get(path)
+
+    def request(self, paths, urgent=False):
+        # Paths are measured in the given order, urgent ones (about to be
+        # played) ahead of everything queued before; known ones are skipped.
+        # A long list is only walked by the feeder thread: pass a sequence
+        # it may read there, e.g. PlaylistModel.snapshot()
+        if urgent:
+            paths = [p for p in paths if p not in self.gains]
+        if not len(paths):
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._feed, name="LoudnessScanner", daemon=True)
+            self._thread.start()
+        with self._lock:
+            self._outstanding += len(paths)
+        if urgent:
+            self._urgent.put(paths)
+            self._requests.put((self._generation, []))  # wakes the feeder up
+        else:
+            self._requests.put((self._generation, paths))
+
+    # Stop scanning what was requested so far (measurements in flight still land)
+    def cancel_pending(self):
+        self._generation += 1
+
+    @property
+    def busy(self):
+        return self._outstanding > 0 or not self._results.empty()
+
+    @property
+    def queued(self):
+        return self._outstanding
+
+    def _answered(self, count=1):
+        with self._lock:
+            self._outstanding = max(0, self._outstanding - count)
+
+    def drain(self, max_items=1000):
+        paths = []
+        while len(paths) < max_items:
+            try:
+                paths.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_pending()
+        self._requests.put(None)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _set_gain(self, path, measured):
+        lufs, peak = measured if measured is not None else (None, None)
+        self.gains[path] = track_gain(lufs, peak, self.target)
+        self._results.put(path)
+
+    def _feed(self):
+        while True:
+            job = self._requests.get()
+            if job is None or self._closed:
+                break
+            generation, paths = job
+
+            for done, path in enumerate(paths):
+                if generation != self._generation or self._closed:
+                    self._answered(len(paths) - done)
+                    break
+                if not self._feed_urgent() or not self._scan(path):
+                    return
+            if not self._feed_urgent():
+                return
+
+    def _feed_urgent(self):
+        while True:
+            try:
+                paths = self._urgent.get_nowait()
+            except queue.Empty:
+                return True
+            for path in paths:
+                if not self._scan(path):
+                    return False
+
+    # One path: answered from the index or handed to the pool. False once
+    # the pool was shut down
+    def _scan(self, path):
+        if "://" in path or path in self.gains or path in self._submitted:
+            self._answered()
+            return True
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._answered()
+            return True
+
+        measured = self.library.lookup_loudness(path, st.st_size, st.st_mtime_ns)
+        if measured is not None:
+            self.cache_hits += 1
+            self._set_gain(path, measured)
+            self._answered()
+            return True
+
+        if not self.available or self._closed:
+            self._answered()
+            return True
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_lower_priority)
+
+        self._in_flight.acquire()
+        try:
+            future = self._pool.submit(measure_file, path)
+        except RuntimeError:
+            # Pool shut down while we were feeding it
+            self._in_flight.release()
+            self._answered()
+            return False
+        self._submitted.add(path)
+        future.add_done_callback(lambda f, p=path, s=st: self._on_measured(f, p, s))
+        return True
+
+    def _on_measured(self, future, path, st):
+        try:
+            measured = None if future.cancelled() else future.result()
+        except Exception:
+            logger.exception("Loudness scan failed: %s", path)
+            measured = None
+        finally:
+            self._in_flight.release()
+            self._answered()
+            self._submitted.discard(path)
+
+        if self._closed or future.cancelled():
+            return
+        self.measured += 1
+        # Undecodable files are recorded too (without loudness), so they aren't decoded again
+        try:
+            self.library.store_loudness([(path, st.st_size, st.st_mtime_ns, *(measured or (None, None)))])
+        except Exception:
+            logger.exception("Could not store loudness for %s", path)
+        self._set_gain(path, measured)
@@ -0,0 +1,266 @@
+import io
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from app.services.http_client import CachedFetcher
+from app.services.playlist_cache import load_sidecar, signature
+from app.services.playlist_model import PlaylistModel, UNKNOWN, MISSING
+from app.services.url_probe import probe_urls
+
+
+class PlaylistEntry:
+    __slots__ = ("path", "title", "duration", "is_url", "missing")
+
+    def __init__(self, path, title=None, duration=None, is_url=False):
+        self.path = path
+        self.title = title
+        self.duration = duration  # seconds from #EXTINF, None if unknown
+        self.is_url = is_url
+        self.missing = None       # None = not checked yet, True/False once known
+
+    def display_name(self):
+        return self.title or os.path.basename(self.path) or self.path
+
+
+def parse_extinf(line):
+    # "#EXTINF:<duration> [key="value" ...],<title>"
+    info = line[len("#EXTINF:"):]
+    head, sep, title = info.partition(",")
+    head = head.strip().split(" ", 1)[0]
+
+    try:
+        duration = float(head)
+    except ValueError:
+        duration = None
+    if duration is not None and duration < 0:
+        duration = None  # -1 means "unknown" (live streams)
+
+    return duration, (title.strip() or None) if sep else None
+
+
+# Yield PlaylistEntry objects one line at a time without touching the files.
+def iter_m3u(lines, base_dir):
+    pending_info = None
+
+    for line in lines:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line.startswith("#"):
+            if line.upper().startswith("#EXTINF:"):
+                pending_info = parse_extinf(line)
+            continue
+
+        duration, title = pending_info or (None, None)
+        pending_info = None
+
+        # Absolute path or URL?
+        if "://" in line:
+            yield PlaylistEntry(line, title, duration, is_url=True)
+            continue
+
+        # Relative entry of a remote playlist: resolve against its URL
+        if "://" in base_dir:
+            yield PlaylistEntry(urljoin(base_dir, line), title, duration, is_url=True)
+            continue
+
+        # Otherwise treat as local file (relative)
+        abs_path = os.path.abspath(os.path.join(base_dir, line))
+        yield PlaylistEntry(abs_path, title, duration)
+
+
+def open_m3u(path, fetcher=None):
+    # Returns (text file, base for relative entries); URLs go through `fetcher`
+    if "://" in path:
+        if fetcher is None:
+            fetcher = CachedFetcher()
+        body, final_url, _ = fetcher.fetch(path)
+        text = body.decode("utf-8-sig", errors="ignore")
+        return io.StringIO(text), final_url
+    f = open(path, "r", encoding="utf-8", errors="ignore")
+    return f, os.path.dirname(path)
+
+
+# Reads an M3U/M3U8 file on a worker thread and hands entries over in chunks.
+#
+# Existence checks run afterwards in a small thread pool with a bounded
+# number of checks in flight, so a slow network share never delays showing
+# the list. Results come back as (index, missing) pairs; missing entries are
+# kept and flagged rather than dropped. `is_known(path)` lets the caller skip
+# the stat for paths it already knows exist (e.g. the library index).
+#
+# `path` may be an http(s) URL, fetched through `fetcher` (a CachedFetcher).
+# With probe_urls=True, stream URLs in the list are checked for
+# reachability too (asyncio, `url_concurrency` at a time) and unreachable
+# ones are reported as missing.
+#
+# With use_sidecar, a local playlist that was compiled before (see
+# playlist_cache) isn't parsed at all: `model` is set to a PlaylistModel
+# mapped from the sidecar, no entries are handed out, and only entries
+# not known to be present are checked again. `signature` is the source
+# file's signature taken before reading, for writing a new sidecar.
+class M3UReader:
+    def __init__(self, path, is_known=None, chunk_size=500, max_workers=8, max_in_flight=64,
+                 fetcher=None, probe_urls=False, url_concurrency=16, use_sidecar=False):
+        self.path = path
+        self.is_known = is_known
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.fetcher = fetcher
+        self.probe_urls = probe_urls
+        self.url_concurrency = url_concurrency
+        self.use_sidecar = use_sidecar and "://" not in path
+
+        self.model = None
+        self.signature = None
+        self.parsed = 0
+        self.checked = 0
+        self.error = None
+
+        self._entries = queue.Queue()
+        self._checks = queue.Queue()
+        self._cancel = threading.Event()
+        self._parsed = threading.Event()
+        self._checks_done = threading.Event()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def start(self):
+        threading.Thread(target=self._run, name="M3UReader", daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _run(self):
+        to_check = []
+        to_probe = []
+        chunk = []
+        try:
+            if self.use_sidecar:
+                self.signature = signature(self.path)
+                self.model = load_sidecar(self.path, PlaylistModel, self.signature)
+            if self.model is not None:
+                self.parsed = len(self.model)
+                to_check, to_probe = self._recheck(self.model)
+            else:
+                self._parse(to_check, to_probe, chunk)
+
+        except Exception as e:
+            self.error = e
+            to_check = []
+            to_probe = []
+
+        finally:
+            if chunk and not self._cancel.is_set():
+                self._entries.put(chunk)
+            self._parsed.set()
+
+        try:
+            self._check_existence(to_check)
+            self._check_urls(to_probe)
+        finally:
+            self._checks_done.set()
+
+    def _parse(self, to_check, to_probe, chunk):
+        # Text parse; fills the lists in place (the caller hands out what
+        # is left in `chunk`)
+        f, base_dir = open_m3u(self.path, self.fetcher)
+        with f:
+            for entry in iter_m3u(f, base_dir):
+                if self._cancel.is_set():
+                    return
+
+                if entry.is_url:
+                    if self.probe_urls:
+                        to_probe.append((self.parsed, entry.path))
+                    else:
+                        entry.missing = False
+                elif self.is_known is not None and self.is_known(entry.path):
+                    entry.missing = False
+                else:
+                    to_check.append((self.parsed, entry.path))
+
+                chunk.append(entry)
+                self.parsed += 1
+                if len(chunk) >= self.chunk_size or self.parsed == 1:
+                    self._entries.put(chunk[:])
+                    chunk.clear()
+
+    def _recheck(self, model):
+        # Entries of a mapped playlist that weren't present last time
+        to_check, to_probe = [], []
+        indexes = sorted([*model.indexes_with_status(UNKNOWN), *model.indexes_with_status(MISSING)])
+        for index in indexes:
+            path = model[index]
+            if "://" in path:
+                if self.probe_urls:
+                    to_probe.append((index, path))
+            elif self.is_known is not None and self.is_known(path):
+                self._checks.put((index, False))
+            else:
+                to_check.append((index, path))
+        return to_check, to_probe
+
+    def _check_existence(self, to_check):
+        # Entries are already in the UI; look them up lazily with a bounded pool
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for index, path in to_check:
+                if self._cancel.is_set():
+                    break
+                self._in_flight.acquire()
+                pool.submit(self._check_one, index, path)
+
+    def _check_urls(self, to_probe):
+        if not to_probe or self._cancel.is_set():
+            return
+
+        def on_result(index, reachable):
+            # None: scheme we can't check (rtsp:// etc.), don't flag it
+            self._checks.put((index, reachable is False))
+            self.checked += 1
+
+        probe_urls(to_probe, self.url_concurrency, on_result=on_result, cancelled=self._cancel.is_set)
+
+    def _check_one(self, index, path):
+        try:
+            if not self._cancel.is_set():
+                self._checks.put((index, not os.path.isfile(path)))
+                self.checked += 1
+        finally:
+            self._in_flight.release()
+
+    @property
+    def parsing_done(self):
+        return self._parsed.is_set() and self._entries.empty()
+
+    # Return (new entries, [(index, missing), ...], done) without blocking
+    def drain(self, max_items=5000):
+        entries = []
+        while len(entries) < max_items:
+            try:
+                entries.extend(self._entries.get_nowait())
+            except queue.Empty:
+                break
+
+        # Checks only start once parsing is over; hand them out after the
+        # last entries so every index already exists on the caller's side
+        checks = []
+        while self.parsing_done and len(checks) < max_items:
+            try:
+                checks.append(self._checks.get_nowait())
+            except queue.Empty:
+                break
+
+        done = (
+            self._parsed.is_set() and self._checks_done.is_set()
+            and self._entries.empty() and self._checks.empty()
+        )
+        return entries, checks, done
@@ -0,0 +1,14 @@
+import os
+
+VIDEO_EXTS = [".mp4", ".avi", ".mov", ".mkv"]
+AUDIO_EXTS = [".mp3", ".wav", ".flac", ".aac", ".m4a", ".ogg", ".opus"]
+MEDIA_EXTS = VIDEO_EXTS + AUDIO_EXTS
+
+
+def media_kind(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in AUDIO_EXTS:
+        return "audio"
+    if ext in VIDEO_EXTS:
+        return "video"
+    return None
@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+FFPROBE = shutil.which("ffprobe")
+
+
+# Runs in a worker process: extract duration, codecs, resolution, bitrate
+# and tags with ffprobe. Returns None if the file can't be probed.
+def probe_file(path):
+    try:
+        out = subprocess.run(
+            [FFPROBE or "ffprobe", "-v", "error", "-print_format", "json",
+             "-show_format", "-show_streams", path],
+            capture_output=True, timeout=30, check=True
+        ).stdout
+        data = json.loads(out or b"{}")
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+    fmt = data.get("format", {})
+    meta = {
+        "duration": _float(fmt.get("duration")),
+        "container": fmt.get("format_name"),
+        "bitrate": _int(fmt.get("bit_rate")),
+        "tags": {k.lower(): v for k, v in (fmt.get("tags") or {}).items()},
+    }
+
+    for stream in data.get("streams", []):
+        kind = stream.get("codec_type")
+        # Embedded cover art shows up as a single-frame video stream
+        if kind == "video" and not stream.get("disposition", {}).get("attached_pic"):
+            meta.setdefault("video_codec", stream.get("codec_name"))
+            meta.setdefault("width", stream.get("width"))
+            meta.setdefault("height", stream.get("height"))
+        elif kind == "audio":
+            meta.setdefault("audio_codec", stream.get("codec_name"))
+            meta.setdefault("sample_rate", _int(stream.get("sample_rate")))
+            meta.setdefault("channels", stream.get("channels"))
+        if meta["duration"] is None:
+            meta["duration"] = _float(stream.get("duration"))
+
+    return meta
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def describe(meta):
+    # Short text for the list's format column
+    if not meta:
+        return ""
+    if meta.get("height"):
+        return f'{meta["height"]}p {meta.get("video_codec") or ""}'.strip()
+    codec = meta.get("audio_codec") or meta.get("container") or ""
+    if meta.get("sample_rate"):
+        return f'{codec} {meta["sample_rate"] / 1000:g}k'
+    return codec
+
+
+# Background metadata service.
+#
+# Paths requested by the UI are handled by a feeder thread: files whose
+# (path, size, mtime) already has metadata in the library index are
+# answered from the cache, the rest are probed in a process pool with a
+# bounded number of jobs in flight and written back to the index. So a
+# rescan of an unchanged folder performs zero probes. Results are collected
+# with drain() from the Tk thread.
+class MetadataProbe:
+    def __init__(self, library, max_workers=None):
+        self.library = library
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+
+        self.probed = 0      # files actually run through ffprobe
+        self.cache_hits = 0
+
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._generation = 0
+        self._outstanding = 0  # requested paths not answered yet
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        self._pool = None
+        self._thread = None
+        self._closed = False
+
+    @property
+    def available(self):
+        return FFPROBE is not None
+
+    def request(self, paths):
+        paths = list(paths)
+        if not paths:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._feed, name="MetadataProbe", daemon=True)
+            self._thread.start()
+        with self._lock:
+            self._outstanding += len(paths)
+        self._requests.put((self._generation, paths))
+
+    # Forget everything queued so far (a new folder/playlist was loaded)
+    def cancel_pending(self):
+        self._generation += 1
+
+    # True while requested paths are still being looked up or probed
+    @property
+    def busy(self):
+        return self._outstanding > 0 or not self._results.empty()
+
+    def _answered(self, count=1):
+        with self._lock:
+            self._outstanding = max(0, self._outstanding - count)
+
+    def drain(self, max_items=1000):
+        results = []
+        while len(results) < max_items:
+            try:
+                generation, path, meta = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                results.append((path, meta))
+        return results
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_pending()
+        self._requests.put(None)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _feed(self):
+        while True:
+            job = self._requests.get()
+            if job is None or self._closed:
+                break
+            generation, paths = job
+
+            for done, path in enumerate(paths):
+                if generation != self._generation or self._closed:
+                    self._answered(len(paths) - done)
+                    break
+                if "://" in path:
+                    self._answered()
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    self._answered()
+                    continue
+
+                meta = self.library.lookup_meta(path, st.st_size, st.st_mtime_ns)
+                if meta is not None:
+                    self.cache_hits += 1
+                    self._results.put((generation, path, meta))
+                    self._answered()
+                    continue
+
+                if not self.available:
+                    self._answered()
+                    continue
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+                self._in_flight.acquire()
+                try:
+                    future = self._pool.submit(probe_file, path)
+                except RuntimeError:
+                    # Pool shut down while we were feeding it
+                    self._in_flight.release()
+                    self._answered(len(paths) - done)
+                    return
+                future.add_done_callback(
+                    lambda f, p=path, s=st, g=generation: self._on_probed(f, p, s, g)
+                )
+
+    def _on_probed(self, future, path, st, generation):
+        try:
+            meta = None if future.cancelled() else future.result()
+        except Exception:
+            meta = None
+        finally:
+            self._in_flight.release()
+            self._answered()
+
+        if self._closed:
+            return
+        if meta is None:
+            # Remember unreadable files too, so they aren't probed again
+            meta = {"duration": None, "error": True}
+        self.probed += 1
+        self.library.store_meta(path, st.st_size, st.st_mtime_ns, meta)
+        self._results.put((generation, path, meta))
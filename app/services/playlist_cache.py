@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import accumulate, repeat
+from operator import add
+from app.services.app_data import cache_dir
+
+# Compiled playlists ("sidecars"): the parsed form of a local .m3u kept in
+# the cache folder and memory-mapped on later loads.
+#
+# Layout (little-endian): a header with the source file's signature and the
+# entry count, a table of (offset, length) per section, then the sections,
+# each 8-byte aligned:
+#   dir_offsets / dir_blob    directory table
+#   dir_of                    uint32 per entry
+#   durations                 float64 per entry (NaN = unknown)
+#   status                    uint8 per entry (UNKNOWN / PRESENT / MISSING)
+#   name_offsets / name_blob  basenames
+#   title_offsets / title_blob, info_offsets / info_blob  ("" = none)
+# A string table is a uint32 offset array (count + 1 entries) into a blob
+# of NUL-separated UTF-8, so a single string decodes without touching the
+# others and the whole column decodes with one split().
+
+MAGIC = b"AXPL"
+VERSION = 1
+SAMPLE = 64 * 1024  # bytes hashed at each end of the source file
+
+_HEADER = struct.Struct("<4sIQq16sII")  # magic, version, size, mtime_ns, digest, count, dirs
+_SECTION = struct.Struct("<QQ")
+_SECTIONS = ("dir_offsets", "dir_blob", "dir_of", "durations", "status",
+             "name_offsets", "name_blob", "title_offsets", "title_blob", "info_offsets", "info_blob")
+
+logger = logging.getLogger(__name__)
+
+
+def sidecar_path(path, generation):
+    key = hashlib.blake2b(os.path.abspath(path).encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    folder = os.path.join(cache_dir(), "playlists")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{key}.{generation}.axpl")
+
+
+def sidecar_files(path):
+    # [(generation, file)] of a playlist's sidecars, newest first. Every
+    # rewrite goes to the next generation: the current file may still be
+    # mapped by the open model, and Windows refuses to replace or delete a
+    # mapped file. Older generations are removed once nothing maps them
+    folder, name = os.path.split(sidecar_path(path, 0))
+    key = name.split(".")[0]
+    found = []
+    for entry in os.scandir(folder):
+        parts = entry.name.split(".")
+        if parts[0] == key and len(parts) == 3 and parts[2] == "axpl" and parts[1].isdigit():
+            found.append((int(parts[1]), entry.path))
+    return sorted(found, reverse=True)
+
+
+def _remove_old(files):
+    for _, old in files:
+        try:
+            os.unlink(old)
+        except OSError:
+            pass  # still mapped (Windows); retried on the next load or write
+
+
+def signature(path):
+    # (size, mtime_ns, hash of the first and last SAMPLE bytes): cheap,
+    # and catches an edit that kept the size and the timestamp
+    st = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(SAMPLE))
+        if st.st_size > SAMPLE:
+            f.seek(max(SAMPLE, st.st_size - SAMPLE))
+            digest.update(f.read(SAMPLE))
+    return st.st_size, st.st_mtime_ns, digest.digest()
+
+
+# A column of strings decoded from the mapped file on access
+class MappedStrings:
+    def __init__(self, blob, offsets):
+        self._blob = blob         # memoryview
+        self._offsets = offsets   # memoryview cast to uint32
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        start, stop = self._offsets[index], self._offsets[index + 1] - 1  # minus the NUL
+        return str(self._blob[start:stop], "utf-8", "surrogateescape")
+
+    def __iter__(self):
+        if not len(self):
+            return iter(())
+        return iter(str(self._blob[:len(self._blob) - 1], "utf-8", "surrogateescape").split("\0"))
+
+
+# Sparse index -> string view over a MappedStrings column (titles, info)
+class MappedSparse:
+    def __init__(self, strings):
+        self._strings = strings
+
+    def get(self, index, default=None):
+        return self._strings[index] or default
+
+    def items(self):
+        return ((i, text) for i, text in enumerate(self._strings) if text)
+
+    def __bool__(self):
+        return len(self._strings) > 0
+
+
+def _string_table(strings):
+    # -> (offsets bytes, blob bytes)
+    strings = list(strings)
+    text = "".join(s + "\0" for s in strings)
+    blob = text.encode("utf-8", "surrogateescape")
+    if len(blob) >= 2 ** 32:
+        raise ValueError("playlist too large for a sidecar")
+    if len(blob) == len(text):
+        sizes = map(len, strings)  # ASCII: one byte per character
+    else:
+        sizes = (len(s.encode("utf-8", "surrogateescape")) for s in strings)
+    offsets = array("I", [0])
+    offsets.extend(accumulate(map(add, sizes, repeat(1))))
+    return _little(offsets), blob
+
+
+def _little(data):
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+# -------------------------------------------------------------
+# Writing
+# -------------------------------------------------------------
+def write_sidecar(path, source_signature, columns, target=None):
+    # `columns` from PlaylistModel.columns(), taken on the UI thread;
+    # encoding and writing run on the caller's (worker) thread. `target`
+    # overrides the location in the cache folder (and is replaced in place)
+    dirs, dir_of, names, durations, status, titles, info = columns
+    count = len(names)
+    sections = {}
+    sections["dir_offsets"], sections["dir_blob"] = _string_table(dirs)
+    sections["dir_of"] = _little(array("I", dir_of))
+    sections["durations"] = _little(array("d", durations))
+    sections["status"] = bytes(status)
+    sections["name_offsets"], sections["name_blob"] = _string_table(names)
+    sections["title_offsets"], sections["title_blob"] = _string_table(titles.get(i, "") for i in range(count))
+    sections["info_offsets"], sections["info_blob"] = _string_table(info.get(i, "") for i in range(count))
+
+    size, mtime_ns, digest = source_signature
+    header = _HEADER.pack(MAGIC, VERSION, size, mtime_ns, digest, count, len(dirs))
+    position = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    table, body = [], []
+    for name in _SECTIONS:
+        pad = -position % 8
+        body.append(b"\0" * pad)
+        position += pad
+        table.append(_SECTION.pack(position, len(sections[name])))
+        body.append(sections[name])
+        position += len(sections[name])
+
+    older = []
+    if target is None:
+        older = sidecar_files(path)
+        target = sidecar_path(path, older[0][0] + 1 if older else 0)
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.writelines(table)
+            f.writelines(body)
+        os.replace(temp, target)
+    except OSError:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    _remove_old(older)
+    logger.info("Wrote playlist sidecar for %s (%d entries)", path, count)
+    return target
+
+
+# -------------------------------------------------------------
+# Loading
+# -------------------------------------------------------------
+def load_sidecar(path, model_class, source_signature=None, target=None):
+    # A model_class instance backed by the sidecar, or None when there is
+    # none or it doesn't match the source file any more
+    try:
+        source_signature = source_signature or signature(path)
+        if target is None:
+            files = sidecar_files(path)
+            if not files:
+                return None
+            target = files[0][1]
+            _remove_old(files[1:])
+        with open(target, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        view = memoryview(mapped)
+        magic, version, size, mtime_ns, digest, count, dir_count = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or (size, mtime_ns, digest) != source_signature:
+            return None
+        sections = {}
+        position = _HEADER.size
+        for name in _SECTIONS:
+            offset, length = _SECTION.unpack_from(view, position)
+            position += _SECTION.size
+            if offset + length > len(view):
+                return None
+            sections[name] = view[offset:offset + length]
+
+        def strings(name):
+            offsets = sections[name + "_offsets"].cast("I")
+            if sys.byteorder != "little":
+                offsets = array("I", offsets)
+                offsets.byteswap()
+            return MappedStrings(sections[name + "_blob"], offsets)
+
+        def numbers(name, typecode):
+            data = array(typecode)
+            data.frombytes(sections[name])
+            if sys.byteorder != "little":
+                data.byteswap()
+            return data
+
+        columns = (
+            list(strings("dir")),
+            numbers("dir_of", "I"),
+            strings("name"),
+            numbers("durations", "d"),
+            bytearray(sections["status"]),
+            MappedSparse(strings("title")),
+            MappedSparse(strings("info")),
+        )
+        if len(columns[2]) != count or len(columns[1]) != count or len(columns[0]) != dir_count:
+            return None
+    except (ValueError, TypeError, struct.error):
+        logger.warning("Ignoring damaged playlist sidecar for %s", path)
+        return None
+    # The views keep the mapping alive for as long as the model uses them
+    return model_class.from_columns(*columns)
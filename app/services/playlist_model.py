@@ -0,0 +1,435 @@
+import math
+import os
+import sys
+from array import array
+from operator import itemgetter
+
+UNKNOWN, PRESENT, MISSING = 0, 1, 2
+
+
+def split_path(path):
+    # Split after the last separator so dir + name gives the path back exactly
+    # (also for URLs, which must never be re-joined with os.path.join)
+    cut = path.rfind("/")
+    if os.sep != "/":
+        cut = max(cut, path.rfind(os.sep))
+    return path[:cut + 1], path[cut + 1:]
+
+
+# Ordered list of media paths shared by the panels and AppState.
+#
+# Paths are stored compactly: each distinct directory is kept once in a
+# table and entries only hold an array-backed directory id plus their
+# basename. Per-entry extras (duration, existence, optional title) live in
+# parallel arrays. A name -> index map is built on first lookup so finding
+# a path's position is O(1) instead of a list scan.
+#
+# A model loaded from a compiled playlist (playlist_cache) starts with
+# read-only name/title/info columns that decode entries on access; a column
+# is turned into a plain list or dict the first time it is modified.
+#
+# Sorting doesn't move the stored entries: apply_order() installs a view
+# order (position -> storage slot, plus the inverse) computed on a worker
+# by app.services.sorting, so a re-sort costs the UI thread nothing however
+# long the list is. Sort keys are cached per slot and survive re-sorting.
+class PlaylistModel:
+    def __init__(self, paths=()):
+        self._dirs = []              # directory table (with trailing separator)
+        self._dir_ids = {}           # directory -> id
+        self._dir_of = array("I")    # per entry: directory id
+        self._names = []             # per entry: basename
+        self._durations = array("d") # per entry: seconds, NaN if unknown
+        self._status = bytearray()   # per entry: UNKNOWN / PRESENT / MISSING
+        self._titles = {}            # index -> title, only for entries that have one
+        self._info = {}              # index -> short format text, once probed
+        self._by_name = None         # basename -> slot or [slots], built lazily
+        self._order = None           # position -> slot once sorted (None: stored order)
+        self._position = None        # slot -> position, alongside _order
+        self._keys = {}              # sort field -> cached keys per slot
+        self._orders = {}            # (field, descending) -> (order, position) still valid
+        self._version = 0            # bumped when entries are added, removed or renamed
+        self.extend(paths)
+
+    @classmethod
+    def from_columns(cls, dirs, dir_of, names, durations, status, titles, info):
+        model = cls()
+        model._dirs = [sys.intern(folder) for folder in dirs]
+        model._dir_ids = {folder: i for i, folder in enumerate(model._dirs)}
+        model._dir_of = dir_of
+        model._names = names
+        model._durations = durations
+        model._status = status
+        model._titles = titles
+        model._info = info
+        return model
+
+    def columns(self):
+        # Snapshot for playlist_cache.write_sidecar(), safe to hand to a thread
+        if self._order is not None:
+            return self._permuted_columns()
+        return (
+            list(self._dirs), array("I", self._dir_of), list(self._names), array("d", self._durations),
+            bytes(self._status), dict(self._titles.items()), dict(self._info.items()),
+        )
+
+    def snapshot(self):
+        # The paths as they are now, for reading on another thread. Only
+        # the containers are copied (mapped columns are read-only and
+        # shared); paths are joined by whoever iterates the snapshot
+        names = list(self._names) if isinstance(self._names, list) else self._names
+        order = array("I", self._order) if self._order is not None else None
+        return PathSnapshot(list(self._dirs), array("I", self._dir_of), names, order)
+
+    def _permuted_columns(self):
+        # The columns in view order
+        order, position = self._order, self._position
+        if len(order) < 2:
+            pick = lambda column: [column[slot] for slot in order]
+        else:
+            get = itemgetter(*order)
+            pick = lambda column: get(column)
+        return (
+            list(self._dirs), array("I", pick(self._dir_of)), list(pick(self._names)),
+            array("d", pick(self._durations)), bytes(pick(self._status)),
+            {position[slot]: text for slot, text in self._titles.items()},
+            {position[slot]: text for slot, text in self._info.items()},
+        )
+
+    # Mapped columns become plain containers before the first change
+    def _own_names(self):
+        if not isinstance(self._names, list):
+            self._names = list(self._names)
+
+    def _own_extras(self):
+        if not isinstance(self._titles, dict):
+            self._titles = dict(self._titles.items())
+        if not isinstance(self._info, dict):
+            self._info = dict(self._info.items())
+
+    def __len__(self):
+        return len(self._names)
+
+    def __bool__(self):
+        return bool(self._names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._names)
+        if self._order is not None:
+            index = self._order[index]
+        return self._dirs[self._dir_of[index]] + self._names[index]
+
+    def __iter__(self):
+        dirs, dir_of, names = self._dirs, self._dir_of, self._names
+        if self._order is not None:
+            for slot in self._order:
+                yield dirs[dir_of[slot]] + names[slot]
+            return
+        for i, name in enumerate(names):
+            yield dirs[dir_of[i]] + name
+
+    # -------------------------------------------------------------
+    # Adding entries
+    # -------------------------------------------------------------
+    def _dir_id(self, folder):
+        dir_id = self._dir_ids.get(folder)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(sys.intern(folder))
+            self._dir_ids[folder] = dir_id
+        return dir_id
+
+    def append(self, path, title=None, duration=None, status=UNKNOWN):
+        folder, name = split_path(path)
+        self._add(self._dir_id(folder), name, title, duration, status)
+
+    def extend(self, paths, status=UNKNOWN):
+        for path in paths:
+            folder, name = split_path(path)
+            self._add(self._dir_id(folder), name, None, None, status)
+
+    # Fast path for a folder listing: one directory, many basenames
+    def extend_names(self, folder, names, status=PRESENT):
+        dir_id = self._dir_id(os.path.join(folder, ""))
+        self._own_names()
+        start = len(self._names)
+        self._names.extend(names)
+        count = len(self._names) - start
+        self._dir_of.extend([dir_id] * count)
+        self._durations.extend([math.nan] * count)
+        self._status.extend([status] * count)
+        if self._by_name is not None:
+            for i in range(start, len(self._names)):
+                self._map_name(self._names[i], i)
+        self._appended(start, len(self._names))
+
+    def _add(self, dir_id, name, title, duration, status):
+        self._own_names()
+        self._own_extras()
+        index = len(self._names)
+        self._names.append(name)
+        self._dir_of.append(dir_id)
+        self._durations.append(math.nan if duration is None else duration)
+        self._status.append(status)
+        if title:
+            self._titles[index] = title
+        if self._by_name is not None:
+            self._map_name(name, index)
+        self._appended(index, index + 1)
+
+    def _appended(self, start, stop):
+        # New entries go to the end of the view; their slot is their position
+        if self._order is not None:
+            self._order.extend(range(start, stop))
+            self._position.extend(range(start, stop))
+        self._changed()
+
+    # -------------------------------------------------------------
+    # Removing entries
+    # -------------------------------------------------------------
+    def remove_range(self, start, stop):
+        if start >= stop:
+            return
+        self._store_order()
+        self._own_names()
+        self._own_extras()
+        del self._names[start:stop]
+        del self._dir_of[start:stop]
+        del self._durations[start:stop]
+        del self._status[start:stop]
+        self._titles = self._shift_keys(self._titles, start, stop)
+        self._info = self._shift_keys(self._info, start, stop)
+        # Every later index moved; rebuild the map on next lookup
+        self._by_name = None
+        for keys in self._keys.values():
+            del keys[start:stop]
+        self._changed()
+
+    # -------------------------------------------------------------
+    # Renaming entries (same folder, same position)
+    # -------------------------------------------------------------
+    def rename(self, index, name):
+        self._own_names()
+        slot = self._slot(index)
+        old = self._names[slot]
+        self._names[slot] = name
+        if self._by_name is not None:
+            self._unmap_name(old, slot)
+            self._map_name(name, slot)
+        self.forget_sort_keys(index)
+        self._changed()
+
+    @staticmethod
+    def _shift_keys(sparse, start, stop):
+        if not sparse:
+            return sparse
+        count = stop - start
+        return {
+            (i - count if i >= stop else i): value
+            for i, value in sparse.items()
+            if not start <= i < stop
+        }
+
+    # -------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------
+    def _map_name(self, name, index):
+        found = self._by_name.get(name)
+        if found is None:
+            self._by_name[name] = index
+        elif isinstance(found, list):
+            found.append(index)
+        else:
+            self._by_name[name] = [found, index]
+
+    def _unmap_name(self, name, index):
+        found = self._by_name.get(name)
+        if isinstance(found, list):
+            found.remove(index)
+            if len(found) == 1:
+                self._by_name[name] = found[0]
+        elif found == index:
+            del self._by_name[name]
+
+    def index_of(self, path):
+        if self._by_name is None:
+            self._by_name = {}
+            for i, name in enumerate(self._names):
+                self._map_name(name, i)
+
+        folder, name = split_path(path)
+        dir_id = self._dir_ids.get(folder)
+        found = self._by_name.get(name)
+        if dir_id is None or found is None:
+            return -1
+        if not isinstance(found, list):
+            return self.index_of_slot(found) if self._dir_of[found] == dir_id else -1
+        for slot in found:
+            if self._dir_of[slot] == dir_id:
+                return self.index_of_slot(slot)
+        return -1
+
+    def __contains__(self, path):
+        return self.index_of(path) != -1
+
+    def basename(self, index):
+        return self._names[self._slot(index)]
+
+    def title(self, index):
+        return self._titles.get(self._slot(index))
+
+    def display_name(self, index):
+        slot = self._slot(index)
+        return self._titles.get(slot) or self._names[slot] or self[index]
+
+    def duration(self, index):
+        value = self._durations[self._slot(index)]
+        return None if math.isnan(value) else value
+
+    def set_duration(self, index, seconds):
+        self._durations[self._slot(index)] = math.nan if seconds is None else seconds
+        if self._orders:
+            self._orders.pop(("duration", False), None)
+            self._orders.pop(("duration", True), None)
+
+    def info(self, index):
+        return self._info.get(self._slot(index), "")
+
+    def set_info(self, index, text):
+        self._own_extras()
+        slot = self._slot(index)
+        if text:
+            self._info[slot] = text
+        else:
+            self._info.pop(slot, None)
+
+    def status(self, index):
+        return self._status[self._slot(index)]
+
+    def set_status(self, index, status):
+        self._status[self._slot(index)] = status
+
+    def is_missing(self, index):
+        return self._status[self._slot(index)] == MISSING
+
+    def count_status(self, status):
+        return self._status.count(status)
+
+    def indexes_with_status(self, status):
+        find = self._status.find
+        slot = find(status)
+        if self._order is not None:
+            found = []
+            while slot != -1:
+                found.append(self._position[slot])
+                slot = find(status, slot + 1)
+            yield from sorted(found)
+            return
+        while slot != -1:
+            yield slot
+            slot = find(status, slot + 1)
+
+    # -------------------------------------------------------------
+    # View order
+    # -------------------------------------------------------------
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def is_sorted(self):
+        return self._order is not None
+
+    def _changed(self):
+        self._version += 1
+        self._orders = {}
+
+    def _slot(self, index):
+        return index if self._order is None else self._order[index]
+
+    # Slots stay with their entry when the view is re-sorted: take one
+    # before apply_order() to find the entry's new position afterwards
+    def slot(self, index):
+        return self._slot(index)
+
+    def index_of_slot(self, slot):
+        return slot if self._position is None else self._position[slot]
+
+    def stored_columns(self):
+        # Live (dirs, dir_of, names, durations) in slot order, for the sort
+        # worker: it only reads them and checks `version` afterwards
+        return self._dirs, self._dir_of, self._names, self._durations
+
+    def sort_keys(self, field):
+        # Cached keys per slot (may be shorter than the list, or hold None)
+        return self._keys.get(field, ())
+
+    def forget_sort_keys(self, index):
+        # The entry changed on disk or was renamed: its keys are computed again
+        slot = self._slot(index)
+        for keys in self._keys.values():
+            if slot < len(keys):
+                keys[slot] = None
+        self._orders = {}
+
+    def cached_order(self, field, descending):
+        # (order, position) of an earlier sort that is still valid, or None
+        return self._orders.get((field, descending))
+
+    def apply_order(self, order, position, version=None, field=None, descending=False, keys=None):
+        # Install a view order from sorting.sort_order(); False (and nothing
+        # changed) if entries were added, removed or renamed since it was
+        # computed. order=None goes back to the stored order.
+        if version is not None and version != self._version:
+            return False
+        if keys:
+            self._keys.update(keys)
+        if order is not None and field is not None:
+            self._orders[(field, descending)] = (order, position)
+        # Copies: appending to the view must not grow a cached order
+        self._order = array("I", order) if order is not None else None
+        self._position = array("I", position) if order is not None else None
+        return True
+
+    def _store_order(self):
+        # Make the view order the stored order (before removing entries)
+        if self._order is None:
+            return
+        dirs, dir_of, names, durations, status, titles, info = self._permuted_columns()
+        self._dir_of, self._names, self._durations, self._status = dir_of, names, durations, bytearray(status)
+        self._titles, self._info = titles, info
+        self._keys = {
+            field: [keys[slot] if slot < len(keys) else None for slot in self._order]
+            for field, keys in self._keys.items()
+        }
+        self._order = self._position = None
+        self._by_name = None
+        self._changed()
+
+
+# Frozen paths of a PlaylistModel (see PlaylistModel.snapshot()), in view order
+class PathSnapshot:
+    def __init__(self, dirs, dir_of, names, order):
+        self._dirs = dirs
+        self._dir_of = dir_of
+        self._names = names
+        self._order = order
+
+    def __len__(self):
+        return len(self._names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._names)
+        if self._order is not None:
+            index = self._order[index]
+        return self._dirs[self._dir_of[index]] + self._names[index]
+
+    def __iter__(self):
+        dirs, dir_of, names = self._dirs, self._dir_of, self._names
+        if self._order is not None:
+            for slot in self._order:
+                yield dirs[dir_of[slot]] + names[slot]
+            return
+        for i, name in enumerate(names):
+            yield dirs[dir_of[i]] + name
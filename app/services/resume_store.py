@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+import time
+
+from app.services.app_data import data_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    key        TEXT PRIMARY KEY,
+    path       TEXT NOT NULL,
+    position   REAL NOT NULL,
+    duration   REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_updated ON positions(updated_at);
+"""
+
+MIN_POSITION = 10    # seconds; closer to the start is not worth resuming
+END_MARGIN = 15      # seconds; closer to the end counts as finished
+MAX_ENTRIES = 5000   # oldest positions are dropped beyond this (on open)
+
+
+# Saved playback positions, keyed by file identity.
+#
+# record() only updates an in-memory table; flush() writes everything that
+# changed since the last flush in one transaction. However often positions
+# arrive, each file costs at most one row write per flush, so the write
+# volume depends on the flush interval and not on the update rate.
+#
+# Local files are keyed by name, size and mtime so a position survives the
+# file being moved or the folder being reached through another path; URLs
+# are keyed by themselves.
+class ResumeStore:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(data_dir(), "resume.db")
+        self._conn = None
+        self._lock = threading.Lock()
+        self._dirty = {}  # key -> (path, position, duration, updated_at), position None = forget
+        self._keys = {}   # path -> key
+
+    def connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            with conn:
+                conn.execute(
+                    "DELETE FROM positions WHERE key NOT IN "
+                    "(SELECT key FROM positions ORDER BY updated_at DESC LIMIT ?)",
+                    (MAX_ENTRIES,)
+                )
+            self._conn = conn
+        return self._conn
+
+    def key(self, path):
+        key = self._keys.get(path)
+        if key is None:
+            if "://" in path and not path.startswith("file://"):
+                key = path
+            else:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    return None
+                key = f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+            self._keys[path] = key
+        return key
+
+    # -------------------------------------------------------------
+    # In memory
+    # -------------------------------------------------------------
+    def record(self, path, position, duration=None):
+        key = self.key(path)
+        if key is None or position is None:
+            return
+        if position < MIN_POSITION or (duration and duration - position < END_MARGIN):
+            position = None
+        with self._lock:
+            old = self._dirty.get(key)
+            if old is not None and old[1] is None and position is None:
+                return
+            self._dirty[key] = (path, position, duration, time.time())
+
+    def forget(self, path):
+        key = self.key(path)
+        if key is not None:
+            with self._lock:
+                self._dirty[key] = (path, None, None, time.time())
+
+    @property
+    def pending(self):
+        return len(self._dirty)
+
+    # Saved position in seconds, or None to start from the beginning
+    def lookup(self, path):
+        key = self.key(path)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._dirty.get(key)
+            if entry is not None:
+                return entry[1]
+            row = self.connection().execute(
+                "SELECT position FROM positions WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    # -------------------------------------------------------------
+    # Disk
+    # -------------------------------------------------------------
+    def flush(self):
+        # Returns the number of entries written
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            upserts = [
+                (key, path, position, duration, updated_at)
+                for key, (path, position, duration, updated_at) in dirty.items()
+                if position is not None
+            ]
+            removed = [(key,) for key, entry in dirty.items() if entry[1] is None]
+
+            conn = self.connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO positions (key, path, position, duration, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)", upserts
+                )
+                conn.executemany("DELETE FROM positions WHERE key = ?", removed)
+        return len(dirty)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,219 @@
+import re
+import threading
+import unicodedata
+from array import array
+
+RANK_LIMIT = 5000   # larger result sets keep list order instead of being ranked
+CHUNK = 2000        # entries indexed per lock hold
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    # Case- and accent-insensitive, punctuation folded to single spaces
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def _grams(word):
+    # 1-, 2- and 3-grams: every query term is looked up by one of them
+    grams = set(word)
+    grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+# Type-ahead search over a PlaylistModel.
+#
+# Two levels: every word of an entry's normalized name (plus any tags added
+# later) has a posting list of the entries containing it, and the set of
+# distinct words is itself indexed by n-grams. A query term is matched
+# against the words first - only the words in its rarest n-gram's list are
+# checked with a substring test - and the union of their postings gives the
+# entries. Libraries repeat the same words over and over, so the word level
+# stays small. The most selective term picks the candidates, the other
+# terms are checked on those only; a query that extends the previous one
+# (the user typed another character) only re-checks the previous matches.
+#
+# The index is filled on a worker thread and catches up with entries
+# appended to the model; search() on a partly built index answers from
+# what is indexed so far (`building` tells the UI to ask again). Models
+# that lose, rename or reorder entries call invalidate() to start over,
+# before changing the model: the worker reads it under the lock.
+class SearchIndex:
+    def __init__(self, model=None):
+        self.model = model
+        self._texts = []    # per indexed entry: normalized text
+        self._postings = {} # word -> array of entry indexes
+        self._words = {}    # n-gram -> [words containing it]
+        self._tags = {}     # entry index -> tag text waiting for the entry to be indexed
+        self._generation = 0
+        self._last = None   # (query, generation, indexed count, matches) for refinement
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def reset(self, model):
+        self.model = model
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._texts = []
+            self._postings = {}
+            self._words = {}
+            self._tags = {}
+            self._last = None
+
+    @property
+    def building(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def indexed(self):
+        return len(self._texts)
+
+    # -------------------------------------------------------------
+    # Building (worker thread)
+    # -------------------------------------------------------------
+    def sync(self):
+        # Index entries appended since the last call, in the background
+        if self.model is None or self.building or len(self._texts) >= len(self.model):
+            return
+        self._thread = threading.Thread(target=self._build, args=(self._generation,),
+                                        name="SearchIndex", daemon=True)
+        self._thread.start()
+
+    def _build(self, generation):
+        model = self.model
+        while True:
+            with self._lock:
+                if generation != self._generation:
+                    return
+                start = len(self._texts)
+                stop = min(start + CHUNK, len(model))
+                if start >= stop:
+                    return
+                for index in range(start, stop):
+                    try:
+                        text = normalize(model.display_name(index))
+                    except IndexError:
+                        # Entries removed before invalidate() got the lock
+                        return
+                    tags = self._tags.pop(index, None)
+                    if tags:
+                        text = f"{text} {tags}"
+                    self._texts.append(text)
+                    self._add_words(index, text)
+
+    def _add_words(self, index, text):
+        postings = self._postings
+        for word in set(text.split(" ")):
+            posting = postings.get(word)
+            if posting is not None:
+                posting.append(index)
+                continue
+            postings[word] = array("I", (index,))
+            # A new word: make it findable by its n-grams
+            for gram in _grams(word):
+                self._words.setdefault(gram, []).append(word)
+
+    def add_tags(self, index, tags):
+        # Probed tags (title, artist, album) become searchable too
+        words = normalize(" ".join(str(tags[key]) for key in ("title", "artist", "album") if tags.get(key)))
+        if not words:
+            return
+        with self._lock:
+            if index >= len(self._texts):
+                self._tags[index] = words
+                return
+            old = self._texts[index]
+            if words in old:
+                return
+            self._texts[index] = f"{old} {words}"
+            self._add_words(index, " ".join(set(words.split(" ")) - set(old.split(" "))))
+            self._last = None
+
+    # -------------------------------------------------------------
+    # Queries (UI thread)
+    # -------------------------------------------------------------
+    def search(self, query):
+        # Matching model indexes, best first; None for an empty query
+        query = normalize(query)
+        if not query:
+            return None
+        terms = query.split(" ")
+        self.sync()
+
+        with self._lock:
+            texts = self._texts
+            last = self._last
+            if (last is not None and last[1] == self._generation and last[2] == len(texts)
+                    and query.startswith(last[0])):
+                matches = last[3]
+                for term in terms:
+                    matches = [i for i in matches if term in texts[i]]
+            else:
+                matches, picked = self._candidates(terms)
+                for term in terms:
+                    if term != picked:
+                        matches = [i for i in matches if term in texts[i]]
+            self._last = (query, self._generation, len(texts), matches)
+
+            if len(matches) <= RANK_LIMIT:
+                return sorted(matches, key=lambda i: (self._rank(texts[i], terms), i))
+        return matches
+
+    def _matching_words(self, term):
+        # Indexed words containing `term`, found through its rarest n-gram
+        size = min(3, len(term))
+        best = None
+        for i in range(len(term) - size + 1):
+            words = self._words.get(term[i:i + size])
+            if words is None:
+                return []
+            if best is None or len(words) < len(best):
+                best = words
+        if size < 3 or len(term) == 3:
+            return best  # the n-gram is the whole term
+        return [word for word in best if term in word]
+
+    def _candidates(self, terms):
+        # Entries matching the most selective term, and that term
+        # A term in a large share of the entries is checked entry by entry:
+        # cheaper than building the union of its postings
+        limit = len(self._texts) // 4
+        picked = None
+        for term in set(terms):
+            words = self._matching_words(term)
+            total = 0
+            for word in words:
+                total += len(self._postings[word])
+                if total > limit:
+                    break
+            if total <= limit and (picked is None or total < picked[0]):
+                picked = (total, term, words)
+            if not total:
+                break
+
+        if picked is None:
+            return range(len(self._texts)), None
+        _, term, words = picked
+        if len(words) == 1:
+            return array("I", self._postings[words[0]]), term  # a copy, the index keeps growing
+        entries = set()
+        for word in words:
+            entries.update(self._postings[word])
+        return sorted(entries), term
+
+    @staticmethod
+    def _rank(text, terms):
+        # 0: name starts with the query, 1: every term starts a word, 2: elsewhere
+        if text.startswith(terms[0]):
+            return 0
+        padded = " " + text
+        if all(" " + term in padded for term in terms):
+            return 1
+        return 2
@@ -0,0 +1,158 @@
+import random
+from array import array
+
+
+# Shuffled play order over the indexes 0..size-1.
+#
+# The permutation is an array drawn lazily (Fisher-Yates, one swap per
+# step), so building it for a million entries costs one array fill and no
+# shuffle pass. Positions before `cursor` are the history (previous), the
+# ones up to `fixed` are already decided (upcoming). Appends only grow the
+# undrawn pool; removals and inserts remap the array in one pass instead
+# of reshuffling.
+class ShuffleOrder:
+    def __init__(self, size, seed=None, first=None):
+        self.random = random.Random(seed)
+        self.order = array("l", range(size))  # position -> item
+        self.pos = array("l", range(size))    # item -> position
+        self.cursor = -1   # position of the current item
+        self.fixed = 0     # positions [0, fixed) are drawn
+        self.last = None   # last item of the previous cycle
+
+        if first is not None and 0 <= first < size:
+            self._place(first, 0)
+            self.cursor = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    # -------------------------------------------------------------
+    # Drawing
+    # -------------------------------------------------------------
+    def _swap(self, a, b):
+        order, pos = self.order, self.pos
+        item_a, item_b = order[a], order[b]
+        order[a], order[b] = item_b, item_a
+        pos[item_b], pos[item_a] = a, b
+
+    def _fix_until(self, position):
+        size = len(self.order)
+        while self.fixed <= position and self.fixed < size:
+            j = self.random.randrange(self.fixed, size)
+            # Don't start a new cycle with the track that just ended
+            if self.fixed == 0 and self.order[j] == self.last and size > 1:
+                j = self.random.randrange(1, size)
+            self._swap(self.fixed, j)
+            self.fixed += 1
+
+    def _place(self, item, position):
+        # Put `item` at `position` and mark everything up to it as drawn
+        self._fix_until(position - 1)
+        self._swap(position, self.pos[item])
+        self.fixed = max(self.fixed, position + 1)
+
+    def _new_cycle(self):
+        if self.cursor >= 0:
+            self.last = self.order[self.cursor]
+        self.cursor = -1
+        self.fixed = 0
+
+    # -------------------------------------------------------------
+    # Navigation
+    # -------------------------------------------------------------
+    def current(self):
+        if 0 <= self.cursor < len(self.order):
+            return self.order[self.cursor]
+        return -1
+
+    # The next `count` items; a finished cycle rolls over into a new one
+    def upcoming(self, count=1):
+        size = len(self.order)
+        if not size:
+            return []
+        if self.cursor + 1 >= size:
+            self._new_cycle()
+        stop = min(self.cursor + 1 + count, size)
+        self._fix_until(stop - 1)
+        return list(self.order[self.cursor + 1:stop])
+
+    def peek_next(self):
+        upcoming = self.upcoming(1)
+        return upcoming[0] if upcoming else -1
+
+    def peek_previous(self):
+        if self.cursor > 0:
+            return self.order[self.cursor - 1]
+        return -1
+
+    # Record that `item` is now playing
+    def move_to(self, item):
+        size = len(self.order)
+        if not 0 <= item < size or item == self.current():
+            return
+        if item == self.peek_previous():
+            self.cursor -= 1
+            return
+
+        if self.cursor + 1 < size:
+            self._fix_until(self.cursor + 1)
+            if item == self.order[self.cursor + 1]:
+                self.cursor += 1
+                return
+
+        position = self.pos[item]
+        if position > self.cursor:
+            # Not played yet in this cycle: pull it forward
+            self._place(item, self.cursor + 1)
+            self.cursor += 1
+        else:
+            # Already played (or the cycle is over): start a new cycle from it
+            self._new_cycle()
+            self._place(item, 0)
+            self.cursor = 0
+
+    # -------------------------------------------------------------
+    # Keeping up with list changes
+    # -------------------------------------------------------------
+    def append(self, count):
+        # New items join the undrawn pool; nothing else moves
+        size = len(self.order)
+        self.order.extend(range(size, size + count))
+        self.pos.extend(range(size, size + count))
+
+    def insert(self, index, count):
+        if index >= len(self.order):
+            self.append(count)
+            return
+        self.order = array("l", (v + count if v >= index else v for v in self.order))
+        self.order.extend(range(index, index + count))
+        self._rebuild_pos()
+
+    def remove(self, start, stop):
+        count = stop - start
+        if count <= 0:
+            return
+
+        cursor, fixed = self.cursor, self.fixed
+        order = array("l")
+        for position, v in enumerate(self.order):
+            if start <= v < stop:
+                if position <= self.cursor:
+                    cursor -= 1
+                if position < self.fixed:
+                    fixed -= 1
+                continue
+            order.append(v - count if v >= stop else v)
+
+        self.order = order
+        self.cursor = max(-1, min(cursor, len(order) - 1))
+        self.fixed = max(0, fixed)
+        if self.last is not None and self.last >= start:
+            self.last = None if self.last < stop else self.last - count
+        self._rebuild_pos()
+
+    def _rebuild_pos(self):
+        pos = array("l", bytes(len(self.order) * self.order.itemsize))
+        for position, v in enumerate(self.order):
+            pos[v] = position
+        self.pos = pos
@@ -0,0 +1,141 @@
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+
+# Only the standard library here: main.py uses this module before the
+# heavy imports, so a second launch can hand over and exit in milliseconds.
+
+
+def socket_path():
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(base, f"aurorax-{user}.sock")
+
+
+def _absolute(arg):
+    # The running instance has its own working directory
+    return arg if "://" in arg else os.path.abspath(arg)
+
+
+def forward_to_running(args, path=None, timeout=1.0):
+    # True if a running player accepted the arguments
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path or socket_path())
+            request = {"open": [_absolute(arg) for arg in args]}
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            return sock.makefile("rb").readline().strip() == b"ok"
+    except (OSError, ValueError):
+        return False
+
+
+def _alive(path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(0.5)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+# Listens on a per-user Unix domain socket for later launches of the player.
+#
+# Each connection sends one JSON line, {"open": [paths or URLs]}, and gets
+# "ok" back as soon as the request is queued; the UI picks requests up
+# with drain(). The socket is bound before the UI is imported, so a launch
+# racing with a starting instance still finds it.
+class InstanceServer:
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self._requests = queue.Queue()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        # Returns self, or None if another instance owns the socket
+        if not hasattr(socket, "AF_UNIX"):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            if not self._bind(sock):
+                sock.close()
+                return None
+            sock.listen(8)
+        except OSError:
+            sock.close()
+            return None
+
+        self._sock = sock
+        self._thread = threading.Thread(target=self._serve, name="InstanceServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _bind(self, sock):
+        old_umask = os.umask(0o177)  # owner only
+        try:
+            try:
+                sock.bind(self.path)
+                return True
+            except OSError:
+                if _alive(self.path):
+                    return False
+                # Left behind by an instance that didn't exit cleanly
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+                sock.bind(self.path)
+                return True
+        finally:
+            os.umask(old_umask)
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed
+            with conn:
+                try:
+                    conn.settimeout(2)
+                    request = json.loads(conn.makefile("rb").readline() or b"{}")
+                    paths = request.get("open")
+                    if not isinstance(paths, list):
+                        raise ValueError("no paths")
+                    self._requests.put([str(p) for p in paths])
+                    conn.sendall(b"ok\n")
+                except (OSError, ValueError, AttributeError):
+                    try:
+                        conn.sendall(b"error\n")
+                    except OSError:
+                        pass
+
+    # Lists of paths handed over since the last call (non-blocking)
+    def drain(self):
+        requests = []
+        while True:
+            try:
+                requests.append(self._requests.get_nowait())
+            except queue.Empty:
+                return requests
+
+    def close(self):
+        if self._sock is None:
+            return
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)  # wakes up accept()
+        except OSError:
+            pass
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,163 @@
+import locale
+import math
+import os
+import re
+from array import array
+from itertools import islice
+
+# Sort fields offered by the panels: field -> label
+FIELDS = {
+    "name": "Name",
+    "duration": "Duration",
+    "size": "Size",
+    "modified": "Modified",
+    "type": "Type",
+}
+COMPLETE = ("name", "type")  # fields every entry has a key for
+CHECK_EVERY = 5000  # entries between cancel checks
+
+_DIGITS = re.compile(r"\d+")
+
+
+def _number(match):
+    # Length first, so "9" < "10"; leading zeros don't count
+    digits = match.group().lstrip("0") or "0"
+    return f"{len(digits):03d}{digits}"
+
+
+def natural_key(name):
+    # "track 9" before "Track 10": case-insensitive, runs of digits compared
+    # by value, the rest by the locale's collation (LC_COLLATE, set in main.py)
+    return locale.strxfrm(_DIGITS.sub(_number, name.casefold()))
+
+
+def type_key(name, key):
+    # Extension first, then the natural name key
+    dot = name.rfind(".")
+    return (name[dot + 1:].casefold() if dot > 0 else "") + "\0" + key
+
+
+def file_details(path):
+    # (size, mtime_ns) of a local file; None for URLs and unreadable files.
+    # Nanoseconds, like the library index, so both sources compare
+    if "://" in path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def library_details(library, folder):
+    # file_details() for an indexed folder: one query instead of a stat per
+    # file. The query runs on first use, i.e. on the sort worker.
+    known = None
+
+    def details(path):
+        nonlocal known
+        if known is None:
+            known = {f["path"]: (f["size"], f["mtime"]) for f in library.files_in(folder)}
+        return known.get(path) or file_details(path)
+    return details
+
+
+def _cached(model, field, count):
+    # The model's cached keys for `field` as a list of `count` (None = to compute)
+    keys = list(islice(model.sort_keys(field), count))
+    keys.extend([None] * (count - len(keys)))
+    return keys
+
+
+def _missing(keys):
+    return [slot for slot, key in enumerate(keys) if key is None]
+
+
+def _cancelled(cancel, done):
+    return cancel is not None and done % CHECK_EVERY == 0 and cancel.is_set()
+
+
+def reverse_order(order, position):
+    # The other direction of a COMPLETE field's order, without sorting again
+    last = len(order) - 1
+    return order[::-1], array("I", map(last.__sub__, position))
+
+
+def _field_keys(model, field, details, cancel, computed):
+    # -> (keys per slot, slots that have a key, count), or None when cancelled.
+    # Reads the live columns: the Tk thread may remove entries meanwhile
+    dirs, dir_of, names, durations = model.stored_columns()
+    count = min(len(names), len(dir_of), len(durations))
+
+    if field in ("name", "type"):
+        keys = _cached(model, "name", count)
+        missing = _missing(keys)
+        if len(missing) == count:
+            names_now = list(islice(names, count))  # decodes a mapped column in one go
+        for done, slot in enumerate(missing):
+            keys[slot] = natural_key(names_now[slot] if len(missing) == count else names[slot])
+            if _cancelled(cancel, done):
+                return None
+        computed["name"] = keys
+        if field == "type":
+            keys = [type_key(name, key) for name, key in zip(islice(names, count), keys)]
+        known = range(count)
+    elif field == "duration":
+        keys = durations[:count]
+        known = [slot for slot in range(count) if not math.isnan(keys[slot])]
+    else:
+        sizes = _cached(model, "size", count)
+        times = _cached(model, "modified", count)
+        for done, slot in enumerate(_missing(sizes)):
+            found = details(dirs[dir_of[slot]] + names[slot])
+            sizes[slot], times[slot] = found if found is not None else (-1, -1)
+            if _cancelled(cancel, done):
+                return None
+        computed["size"], computed["modified"] = sizes, times
+        keys = sizes if field == "size" else times
+        known = [slot for slot in range(count) if keys[slot] >= 0]
+
+    return keys, known, count
+
+
+# Computes a view order for a PlaylistModel on a worker thread.
+#
+# Returns the keyword arguments of model.apply_order() (a stale one that it
+# refuses if entries were removed meanwhile), or None when cancelled. Keys that are expensive to get (natural name keys, file size
+# and date) are taken from the model's cache and the missing ones are
+# computed and handed back to be cached, so only the first sort by a field
+# pays for them. Entries without a value (unknown duration, unreadable or
+# remote file) go last in both directions; ties keep their stored order.
+def sort_order(model, field, descending=False, details=file_details, cancel=None):
+    if field not in FIELDS:
+        raise ValueError(f"unknown sort field: {field}")
+    version = model.version  # read first: anything added later changes it
+    computed = {}
+    try:
+        found = _field_keys(model, field, details, cancel, computed)
+        if found is None:
+            return None
+        keys, known, count = found
+        order = sorted(known, key=keys.__getitem__, reverse=descending)
+    except IndexError:
+        if model.version == version:
+            raise
+        # Entries were removed while their keys were read: apply_order()
+        # refuses the stale version and the sorter starts over
+        return {"order": None, "position": None, "version": version}
+    if len(order) < count:
+        placed = set(order)
+        order.extend(slot for slot in range(count) if slot not in placed)
+    order = array("I", order)
+    # Inverse permutation: slot -> position
+    position = array("I", [0]) * count
+    for i, slot in enumerate(order):
+        position[slot] = i
+    return {
+        "order": order,
+        "position": position,
+        "version": version,
+        "field": field,
+        "descending": descending,
+        "keys": computed,
+    }
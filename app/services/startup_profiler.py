@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# Set to a file path to get the timings as JSON, or to "1" for stderr
+PROFILE_ENV = "AURORAX_STARTUP_PROFILE"
+
+# Phases and marks that usually finish after "interactive"; the report is
+# written once more when all of them are in
+AWAITED = ("mpv_init", "first_frame")
+
+logger = logging.getLogger(__name__)
+
+
+# Wall-clock timings of the startup phases.
+#
+# Phases are measured from the moment this module is first imported
+# (main.py imports it before anything heavy). "interactive" is the time at
+# which the window is built and the event loop is idle, i.e. the user can
+# click; that number is what we track for regressions. The report is
+# written then, and a final time once the AWAITED phases (mpv init, first
+# frame) are in; anything measured after that (lazily loaded icons, ...)
+# is only counted.
+class StartupProfiler:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = {}           # name -> seconds spent
+        self.marks = {}            # name -> seconds since t0
+        self.interactive_at = None
+        self.finished = False      # final report written
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self._arrived(name)
+
+    def mark(self, name):
+        # Only the first occurrence counts (e.g. the first frame ever shown)
+        if name in self.marks:
+            return
+        self.marks[name] = time.perf_counter() - self.t0
+        self._arrived(name)
+
+    def _arrived(self, name):
+        if self.interactive_at is None or self.finished or name not in AWAITED:
+            return
+        if self._all_arrived():
+            self.finished = True
+            self.report()
+
+    def _all_arrived(self):
+        return all(name in self.phases or name in self.marks for name in AWAITED)
+
+    def interactive(self):
+        if self.interactive_at is None:
+            self.interactive_at = time.perf_counter() - self.t0
+            self.finished = self._all_arrived()
+            self.report()
+
+    def as_dict(self):
+        return {
+            "time_to_interactive_ms": _ms(self.interactive_at),
+            "phases_ms": {name: _ms(s) for name, s in self.phases.items()},
+            "marks_ms": {name: _ms(s) for name, s in self.marks.items()},
+        }
+
+    def report(self):
+        data = self.as_dict()
+        logger.info("Startup: %s", json.dumps(data))
+
+        target = os.environ.get(PROFILE_ENV)
+        if not target:
+            return
+        text = json.dumps(data, indent=2)
+        if target == "1":
+            print(text, file=sys.stderr)
+            return
+        try:
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            logger.warning("Could not write startup profile: %s", e)
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+profiler = StartupProfiler()
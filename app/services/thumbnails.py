@@ -0,0 +1,283 @@
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from app.services.app_data import cache_dir
+from app.services.media_types import media_kind
+
+FFMPEG = shutil.which("ffmpeg")
+
+THUMB_SIZE = (48, 27)
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+# Size-bounded folder of thumbnail files with least-recently-used eviction.
+# Recency is the file mtime, bumped on every hit, so the order survives
+# restarts. An empty file marks "no picture" (e.g. audio without cover art).
+class ThumbnailCache:
+    def __init__(self, folder=None, max_bytes=256 * 1024 * 1024):
+        self.folder = folder or os.path.join(cache_dir(), "thumbnails")
+        os.makedirs(self.folder, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> size, oldest first
+        self._total = 0
+
+        files = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    _remove(entry.path)  # left by an interrupted generation
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+    @staticmethod
+    def key(path, st):
+        raw = f"{path}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8", "surrogatepass")
+        return hashlib.sha1(raw).hexdigest() + ".jpg"
+
+    def lookup(self, name):
+        # Returns the file path on a hit, "" for a cached "no picture", None on a miss
+        with self._lock:
+            size = self._entries.get(name)
+            if size is None:
+                return None
+            self._entries.move_to_end(name)
+        file_path = os.path.join(self.folder, name)
+        try:
+            os.utime(file_path)
+        except OSError:
+            with self._lock:
+                self._forget(name)
+            return None
+        return file_path if size else ""
+
+    def add(self, name):
+        file_path = os.path.join(self.folder, name)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = size
+            self._total += size
+            self._evict()
+
+    def add_empty(self, name):
+        open(os.path.join(self.folder, name), "wb").close()
+        self.add(name)
+
+    def discard(self, name):
+        # A file that turned out to be unreadable: generated again next time
+        with self._lock:
+            self._forget(name)
+        _remove(os.path.join(self.folder, name))
+
+    def _forget(self, name):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total -= size
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            _remove(os.path.join(self.folder, name))
+
+
+def _remove(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+# Runs in the worker pool: grab a frame (video) or the embedded cover
+# (audio) with ffmpeg and write a small JPEG. ffmpeg writes to a temporary
+# file that is renamed into place, so out_path is never a partial image.
+# Returns True on success, False when ffmpeg ran to the end without a
+# picture (for ffmpeg, no cover art is an error too) and None when it
+# couldn't run or timed out, which says nothing about the file.
+def generate_thumbnail(path, out_path, size=THUMB_SIZE):
+    scale = f"scale={size[0]}:{size[1]}:force_original_aspect_ratio=decrease"
+    if media_kind(path) == "audio":
+        attempts = [["-i", path, "-an", "-map", "0:v:0?", "-frames:v", "1", "-vf", scale]]
+    else:
+        # A few seconds in avoids black intro frames; short clips fall back to 0
+        attempts = [
+            ["-ss", "5", "-i", path, "-an", "-frames:v", "1", "-vf", "thumbnail," + scale],
+            ["-i", path, "-an", "-frames:v", "1", "-vf", scale],
+        ]
+
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    os.close(fd)
+    try:
+        for args in attempts:
+            try:
+                done = subprocess.run(
+                    [FFMPEG or "ffmpeg", "-v", "error", "-y", *args, "-f", "image2", "-c:v", "mjpeg", temp],
+                    capture_output=True, timeout=30
+                )
+            except (OSError, subprocess.SubprocessError):
+                return None
+            if done.returncode < 0:
+                return None  # killed
+            if os.path.getsize(temp) > 0:
+                os.replace(temp, out_path)
+                return True
+        return False
+    finally:
+        _remove(temp)
+
+
+def shared_cache():
+    # The one ThumbnailCache over the cache folder: every ThumbnailService
+    # uses it unless given its own, so the size bound and the LRU order are
+    # global. The first call reads the folder, so it belongs on a worker
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ThumbnailCache()
+        return _shared_cache
+
+
+# Thumbnails for list rows.
+#
+# Only rows reported as visible are worked on: requests for rows that
+# scrolled away before a worker picked them up are dropped. Workers look
+# up or generate the JPEG and decode it with Pillow; the Tk thread only
+# wraps the decoded image into a PhotoImage when it drains results, so the
+# UI never waits on disk or ffmpeg. Decoded images stay in a small
+# in-memory LRU.
+class ThumbnailService:
+    def __init__(self, cache=None, max_workers=2, memory_items=300):
+        self.cache = cache  # None: shared_cache(), fetched by the first worker
+        self.max_workers = max_workers
+        self.memory_items = memory_items
+
+        self._images = OrderedDict()   # path -> PhotoImage, "" if there is no picture
+        self._wanted = set()
+        self._queued = set()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def available(self):
+        return FFMPEG is not None
+
+    def get(self, path):
+        image = self._images.get(path)
+        if image is not None:
+            self._images.move_to_end(path)
+        return image
+
+    # Called with the paths of the rows on screen
+    def set_visible(self, paths):
+        if not self.available:
+            return
+        with self._lock:
+            self._wanted = set(paths)
+            todo = [p for p in paths if p not in self._images and p not in self._queued]
+            self._queued.update(todo)
+
+        if not todo:
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Thumbnail")
+        for path in todo:
+            self._pool.submit(self._load, path)
+
+    def _load(self, path):
+        with self._lock:
+            if path not in self._wanted:
+                # Scrolled away before we got to it
+                self._queued.discard(path)
+                return
+
+        image = None
+        try:
+            if "://" not in path:
+                image = self._load_or_generate(path)
+        except Exception:
+            image = None
+        self._results.put((path, image))
+
+    def _disk_cache(self):
+        # Workers only: building the cache reads the whole folder, so it must
+        # not happen under self._lock, which the Tk thread takes too
+        if self.cache is None:
+            self.cache = shared_cache()
+        return self.cache
+
+    def _load_or_generate(self, path):
+        cache = self._disk_cache()
+        st = os.stat(path)
+        name = ThumbnailCache.key(path, st)
+        file_path = cache.lookup(name)
+
+        if file_path is None:
+            file_path = os.path.join(cache.folder, name)
+            made = generate_thumbnail(path, file_path)
+            if made:
+                cache.add(name)
+            elif made is False:
+                cache.add_empty(name)
+                return None
+            else:
+                return None  # tried again when the row is shown next time
+        elif not file_path:
+            return None
+
+        try:
+            with Image.open(file_path) as img:
+                img.load()
+                return img.copy()
+        except OSError:
+            cache.discard(name)
+            raise
+
+    # Tk thread: turn decoded images into PhotoImages; returns the paths done
+    def drain(self, max_items=50):
+        done = []
+        while len(done) < max_items:
+            try:
+                path, image = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._queued.discard(path)
+            self._images[path] = ImageTk.PhotoImage(image) if image is not None else ""
+            self._images.move_to_end(path)
+            done.append(path)
+
+        while len(self._images) > self.memory_items:
+            self._images.popitem(last=False)
+        return done
+
+    @property
+    def busy(self):
+        return bool(self._queued) or not self._results.empty()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,97 @@
+import asyncio
+import ssl
+from urllib.parse import urljoin, urlsplit
+
+from app.services.http_client import USER_AGENT
+
+MAX_REDIRECTS = 3
+
+
+# Reachability checks for stream URLs, many at a time on one asyncio loop.
+#
+# Each URL gets a HEAD request; servers that refuse HEAD (405/501, or a
+# streaming server answering with garbage) are retried with a GET that is
+# dropped as soon as the status line arrives, so no stream body is ever
+# downloaded. At most `concurrency` connections are open at once.
+async def _status(url, timeout, method="HEAD"):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+
+    ssl_context = ssl.create_default_context() if scheme == "https" else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl_context), timeout
+    )
+    try:
+        host = parts.hostname if not parts.port else f"{parts.hostname}:{parts.port}"
+        writer.write(
+            f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Icy-MetaData: 0\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+        # "HTTP/1.1 200 OK" (or "ICY 200 OK" from old SHOUTcast servers)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.split()
+        status = int(fields[1]) if len(fields) >= 2 and fields[1].isdigit() else None
+
+        location = None
+        if status in (301, 302, 303, 307, 308):
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "location":
+                    location = value.strip()
+        return status, location
+    finally:
+        writer.close()
+
+
+async def check_url(url, timeout=5.0):
+    # True if the URL answers with a success status, False if not, None if
+    # it can't be checked (rtmp://, rtsp://, ... are left to mpv)
+    if urlsplit(url).scheme.lower() not in ("http", "https"):
+        return None
+
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            status, location = await _status(url, timeout)
+            if status is None or status in (405, 501):
+                status, location = await _status(url, timeout, method="GET")
+        except (OSError, asyncio.TimeoutError, ValueError):
+            return False
+        if status is None:
+            return False
+        if location and status in (301, 302, 303, 307, 308):
+            url = urljoin(url, location)
+            continue
+        return status < 400
+    return False
+
+
+async def check_urls(items, concurrency=16, timeout=5.0, on_result=None, cancelled=None):
+    # items: iterable of (key, url); on_result(key, reachable) as each one finishes
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def one(key, url):
+        async with semaphore:
+            if cancelled is not None and cancelled():
+                return
+            ok = await check_url(url, timeout)
+        results[key] = ok
+        if on_result is not None:
+            on_result(key, ok)
+
+    await asyncio.gather(*(one(key, url) for key, url in items))
+    return results
+
+
+def probe_urls(items, concurrency=16, timeout=5.0, on_result=None, cancelled=None):
+    # Blocking entry point for worker threads
+    return asyncio.run(check_urls(items, concurrency, timeout, on_result, cancelled))
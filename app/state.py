@@ -1,8 +1,12 @@
+from app.services.playlist_model import PlaylistModel
+from app.services.shuffle_order import ShuffleOrder
+
 class AppState:
     def __init__(self):
         self.path = None
 
-        self.current_song_list = []
+        # Shared by reference with the panel that started playback
+        self.current_song_list = PlaylistModel()
         self.current_index = -1
     
         #self.volume = 50  # 0 to 100
@@ -13,14 +17,104 @@ class AppState:
 
         self.loop = 0  # 0 = no loop, 1 = loop all, 2 = loop one
         self.shuffle = False
+        self.gapless = True  # queue the next entry inside mpv ahead of time
+        self.check_stream_urls = True  # probe URL entries of playlists for reachability
+        self.normalize_loudness = False  # per-track gain from the loudness scanner
+
+        self.shuffle_seed = None   # set for a reproducible shuffle order
+        self.shuffle_order = None  # built on demand for current_song_list
+        self._shuffle_list = None
+
+    def shuffled(self):
+        songs = self.current_song_list
+        order = self.shuffle_order
+        if order is None or self._shuffle_list is not songs or len(order) > len(songs):
+            order = ShuffleOrder(len(songs), self.shuffle_seed, first=self.current_index)
+            self.shuffle_order = order
+            self._shuffle_list = songs
+        elif len(order) < len(songs):
+            order.append(len(songs) - len(order))  # entries were appended
+        return order
+
+    def set_song_list(self, songs, index):
+        self.current_song_list = songs
+        self.set_current(index)
+
+    def set_current(self, index):
+        self.current_index = index
+        self.path = self.current_song_list[index] if index != -1 else None
+        if self.shuffle and index != -1:
+            self.shuffled().move_to(index)
+
+    def set_shuffle(self, enabled):
+        self.shuffle = enabled
+        # A new order starting from the current track
+        self.shuffle_order = None
+
+    # The current list lost the entries [start, stop): keep the current
+    # index and the shuffle order pointing at the same entries. If the
+    # playing entry itself went away, it keeps playing and the entry that
+    # followed it comes next.
+    def entries_removed(self, start, stop):
+        count = stop - start
+        if self.current_index >= stop:
+            self.current_index -= count
+        elif self.current_index >= start:
+            self.current_index = start - 1
+        if self.shuffle_order is not None and self._shuffle_list is self.current_song_list:
+            self.shuffle_order.remove(start, stop)
+
+    def entry_renamed(self, index):
+        if index == self.current_index:
+            self.path = self.current_song_list[index]
+
+    # The current list was re-sorted and the playing entry is now at
+    # `index`: next/previous follow the new order, and a shuffle starts
+    # over from the current track
+    def entries_reordered(self, index):
+        self.current_index = index
+        if self._shuffle_list is self.current_song_list:
+            self.shuffle_order = None
+
+    # Indexes that will play after the current one (for preloading)
+    def upcoming(self, count=1):
+        total = len(self.current_song_list)
+        if not total:
+            return []
+        if self.shuffle:
+            return self.shuffled().upcoming(count)
+        if self.loop == 2:
+            return [self.current_index] * count
+        result = []
+        index = self.current_index
+        for _ in range(count):
+            index += 1
+            if index >= total:
+                if self.loop == 0:
+                    break
+                index = 0
+            result.append(index)
+        return result
+
+    def previous_index(self):
+        if not self.current_song_list:
+            return -1
+
+        if self.shuffle:
+            return self.shuffled().peek_previous()
+
+        if self.current_index > 0:
+            return self.current_index - 1
+        if self.loop == 1:
+            return len(self.current_song_list) - 1  # wrap around
+        return -1
 
     def next_index(self):
         if not self.current_song_list:
             return -1
 
         if self.shuffle:
-            import random
-            return random.randint(0, len(self.current_song_list) - 1)
+            return self.shuffled().peek_next()
 
         if self.loop != 0:
             if self.loop != 2:  # not loop one
@@ -36,9 +130,11 @@ class AppState:
     
     def reset_all(self):
         self.path = None
-        self.current_song_list = []
+        self.current_song_list = PlaylistModel()
         self.current_index = -1
         self.is_paused = False
         self.is_stopped = False
         self.loop = 0
-        self.shuffle = False
\ No newline at end of file
+        self.shuffle = False
+        self.shuffle_order = None
+        self._shuffle_list = None
\ No newline at end of file
@@ -1,21 +1,27 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, ttk
+from app.ui.ui_scheduler import HIGH
+from app.ui.search_bar import shortcut
 
 class ControlPanel(ctk.CTkFrame):
     def __init__(self, parent, state, media_player, icons):
         super().__init__(parent)
         self.media_player = media_player
+        self.scheduler = media_player.scheduler
         self.state = state
         self.icons = icons
         self.root = self.winfo_toplevel()
+        self.scrubbing = False  # slider held down: don't move it from playback updates
 
         # Bind keys to methods
-        self.root.bind("<s>", lambda event: self.stop())
-        self.root.bind("<space>", lambda event: self.toggle_play_pause())
-        self.root.bind("<l>", lambda event: self.media_player.forward(10))
-        self.root.bind("<j>", lambda event: self.media_player.backward(10))
-        self.root.bind("<k>", lambda event: self.toggle_play_pause())
+        self.root.bind("<s>", shortcut(lambda event: self.stop()))
+        self.root.bind("<space>", shortcut(lambda event: self.toggle_play_pause()))
+        self.root.bind("<l>", shortcut(lambda event: self.media_player.forward(10)))
+        self.root.bind("<j>", shortcut(lambda event: self.media_player.backward(10)))
+        self.root.bind("<k>", shortcut(lambda event: self.toggle_play_pause()))
+        self.root.bind("<N>", shortcut(lambda event: self.media_player.skip_next()))
+        self.root.bind("<P>", shortcut(lambda event: self.media_player.play_previous()))
 
         # Build the Control Panel UI
         self.build_ui()
@@ -113,6 +119,8 @@ class ControlPanel(ctk.CTkFrame):
             fg_color=("gray90", "gray20")
         )
         self.seek_slider.grid(row=0, column=4, sticky="ew", padx=20, pady=10)
+        self.seek_slider.bind("<Button-1>", self.on_seek_press)
+        self.seek_slider.bind("<ButtonRelease-1>", self.on_seek_release)
         self.columnconfigure(4, weight=1)
 
         # Time Label
@@ -123,27 +131,31 @@ class ControlPanel(ctk.CTkFrame):
         )
         self.lbl_time.grid(row=0, column=5, padx=15, pady=5)
 
-        # Start UI updates
-        self.update_loop()
+        # UI updates are pushed by the player when something changes
+        self.media_player.add_listener(self.on_playback_update)
 
     def toggle_shuffle(self):
-        self.state.shuffle = not self.state.shuffle 
+        self.set_shuffle(not self.state.shuffle)
+
+    def set_shuffle(self, enabled):
+        self.state.set_shuffle(enabled)
         self.btn_shuffle.configure(
             fg_color="deepskyblue" if self.state.shuffle else ("gray90", "gray20"),
             hover_color="deepskyblue" if self.state.shuffle else "gray"
         )
+        self.media_player.queue_next()
 
 
     def toggle_loop(self):
-        if self.state.loop == 0:
-            self.state.loop = 1
-            self.btn_loop.configure(image=self.icons["loop_1"])
-        elif self.state.loop == 1:
-            self.state.loop = 2
-            self.btn_loop.configure(image=self.icons["loop_2"])
-        else:
-            self.state.loop = 0
-            self.btn_loop.configure(image=self.icons["loop_0"])
+        self.set_loop((self.state.loop + 1) % 3)
+
+    # 0 = no loop, 1 = loop all, 2 = loop one
+    def set_loop(self, loop):
+        if loop not in (0, 1, 2):
+            raise ValueError(f"loop must be 0, 1 or 2, not {loop}")
+        self.state.loop = loop
+        self.btn_loop.configure(image=self.icons[f"loop_{loop}"])
+        self.media_player.queue_next()
 
 
     def toggle_play_pause(self):
@@ -163,53 +175,54 @@ class ControlPanel(ctk.CTkFrame):
         self.state.is_stopped = True
         self.state.is_paused = True
 
-        # Reset UI elements
+        # Reset UI elements (and drop a position update still queued)
+        self.scheduler.cancel((self, "position"))
         self.btn_play_pause.configure(image=self.icons["play"])
         self.seek_slider.set(0)
         self.lbl_time.configure(text="00:00 / 00:00")
         
 
     def on_seek(self, value):
+        # Fired for every motion event; the player coalesces them
         self.media_player.seek(value)
 
-    def update_loop(self):
+    def on_seek_press(self, event):
+        self.scrubbing = True
+
+    def on_seek_release(self, event):
+        self.scrubbing = False
+        self.media_player.seek(self.seek_slider.get(), final=True)
+
+    def on_playback_update(self, changes):
+        # Called by MediaPlayer only when mpv reported a change. The state is
+        # updated right away; the widgets at most once per UI slice
+        if "pause" in changes:
+            self.state.is_paused = self.media_player.paused
+            self.scheduler.post(self.show_paused, key=(self, "pause"), priority=HIGH)
+
+        if "time_pos" in changes or "duration" in changes or "paused_for_cache" in changes:
+            self.scheduler.post(self.show_position, key=(self, "position"), priority=HIGH)
+
+    def show_paused(self):
         try:
-            # --- Get playback position safely ---
-            pos = self.media_player.get_position()
-            if pos is not None:
-                try:
-                    self.seek_slider.set(pos)
-                except tk.TclError:
-                    # Widget temporarily unavailable (playlist reload, dialogs, etc.)
-                    return self.after(150, self.update_loop)
-
-            # --- Get times safely ---
+            self.btn_play_pause.configure(
+                image=self.icons["play" if self.media_player.paused else "pause"]
+            )
+        except tk.TclError:
+            pass
+
+    def show_position(self):
+        try:
+            if not self.scrubbing:
+                self.seek_slider.set(self.media_player.get_position())
+
             current, total = self.media_player.get_time()
-            if (
-                current is not None 
-                and total is not None 
-                and total > 0
-            ):
-                try:
-                    self.lbl_time.configure(
-                        text=f"{current//60:02d}:{current%60:02d} / {total//60:02d}:{total%60:02d}"
-                    )
-                except tk.TclError:
-                    return self.after(150, self.update_loop)
-            elif (
-                current is not None 
-                and total is not None
-                and (self.state.loop != 0 or self.state.shuffle)
-            ): 
-                if  total > 0 and (total - current) < 0.1:
-                    try:
-                        self.media_player.play_next()
-                    except tk.TclError:
-                        return self.after(150, self.update_loop)
-        except Exception as e:
-            # Show error to the user instead of printing
-            messagebox.showerror("Media Player Error", f"An error occurred:\n{e}")
-
-        finally:
-            # Smooth update ~6× per second (safe for Tk)
-            self.after(150, self.update_loop)
+            if self.media_player.buffer_stats.buffering:
+                self.lbl_time.configure(text="Buffering...")
+            elif total > 0:
+                self.lbl_time.configure(
+                    text=f"{current//60:02d}:{current%60:02d} / {total//60:02d}:{total%60:02d}"
+                )
+        except tk.TclError:
+            # Widget temporarily unavailable (playlist reload, dialogs, etc.)
+            pass
@@ -0,0 +1,87 @@
+import customtkinter as ctk
+from app.services.duplicates import DuplicateFinder
+from app.ui.formatting import format_size
+from app.ui.ui_scheduler import LOW
+
+MAX_GROUPS = 1000  # groups listed in the window; the summary counts all of them
+
+STAGES = {
+    "sizes": "Comparing sizes",
+    "samples": "Hashing samples",
+    "full": "Hashing colliding files",
+}
+
+
+# Runs a DuplicateFinder over the library (plus the given path lists) and lists
+# the groups of identical files it finds.
+class DuplicatesWindow(ctk.CTkToplevel):
+    def __init__(self, master, scheduler, library, extra_lists=()):
+        super().__init__(master)
+        self.scheduler = scheduler
+        self.title("Duplicate Files")
+        self.geometry("720x460")
+
+        self.lbl_status = ctk.CTkLabel(self, text="Starting...", font=("Segoe UI", 12), anchor="w")
+        self.lbl_status.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+
+        self.text = ctk.CTkTextbox(self, font=("Segoe UI", 12), wrap="none")
+        self.text.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+        self.text.configure(state="disabled")
+
+        self.btn_close = ctk.CTkButton(self, text="Cancel", command=self.close)
+        self.btn_close.grid(row=2, column=0, padx=10, pady=(0, 10))
+
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.finder = DuplicateFinder(library, extra_lists).start()
+        self.scheduler.after(200, self.poll, self.finder, priority=LOW)
+
+    def poll(self, finder):
+        if finder is not self.finder or finder.cancelled:
+            return
+        if not finder.finished:
+            self.lbl_status.configure(text=self.progress_text(finder))
+            self.scheduler.after(200, self.poll, finder, priority=LOW)
+            return
+
+        self.btn_close.configure(text="Close")
+        if finder.error:
+            self.lbl_status.configure(text=f"Duplicate search failed: {finder.error}")
+            return
+        self.lbl_status.configure(text=self.summary_text(finder))
+        self.show_groups(finder.groups)
+
+    def progress_text(self, finder):
+        text = STAGES.get(finder.stage, "")
+        if finder.to_hash:
+            text += f"... {finder.hashed:,} / {finder.to_hash:,} files"
+        return f"{text}, {format_size(finder.bytes_read)} read"
+
+    def summary_text(self, finder):
+        if not finder.groups:
+            return f"No duplicates among {finder.candidates:,} same-size files."
+        copies = sum(len(paths) - 1 for _, paths in finder.groups)
+        text = (f"{len(finder.groups):,} groups, {copies:,} extra copies using {format_size(finder.wasted)}. "
+                f"Read {format_size(finder.bytes_read)}")
+        if finder.bytes_total:
+            text += f" of {format_size(finder.bytes_total)} ({finder.bytes_read / finder.bytes_total:.1%})"
+        return text + "."
+
+    def show_groups(self, groups):
+        lines = []
+        for size, paths in groups[:MAX_GROUPS]:
+            lines.append(f"{len(paths)} × {format_size(size)}")
+            lines.extend("    " + path for path in paths)
+            lines.append("")
+        if len(groups) > MAX_GROUPS:
+            lines.append(f"... and {len(groups) - MAX_GROUPS:,} more groups")
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.configure(state="disabled")
+
+    def close(self):
+        self.finder.cancel()
+        self.destroy()
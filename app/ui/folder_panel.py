@@ -1,45 +1,402 @@
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk
 import os
+import threading
 from app.services.file_loader import FileLoader
+from app.services.background import BackgroundTask
+from app.services.folder_watcher import FolderWatcher
+from app.services.media_types import MEDIA_EXTS
+from app.services.library_index import normalize
+from app.services.playlist_model import PlaylistModel
+from app.services.search_index import SearchIndex
+from app.services.metadata_probe import MetadataProbe, describe
+from app.services.thumbnails import ThumbnailService
+from app.services.sorting import FIELDS, library_details
+from app.ui.virtual_list import VirtualList
+from app.ui.list_sorter import ListSorter, HEADING_FIELDS
+from app.ui.search_bar import SearchBar, FilteredRows
+from app.ui.formatting import format_duration
+from app.ui.ui_scheduler import NORMAL, LOW
+
+UNSORTED = "Folder order"
+SORT_LABELS = {UNSORTED: None, **{label: field for field, label in FIELDS.items()}}
 
 class FolderPanel(ctk.CTkFrame):
-    def __init__(self, master, state, media_player, control_panel, icons):
+    def __init__(self, master, state, media_player, control_panel, icons, library):
         super().__init__(master)
 
         self.folder_path = None
         self.state = state
         self.media_player = media_player
-        self.files = []    
+        self.scheduler = media_player.scheduler
+        self.playlist = PlaylistModel()  # shared with AppState once played
+        self.scanner = None
+        self.library = library
+        self.index_task = None
+        self.watcher = None
+        self.probe = MetadataProbe(library)
+        self.probe_polling = False
+        self.thumbnails = ThumbnailService()
+        self.thumb_polling = False
+        self.search = SearchIndex(self.playlist)
+        self.results = None  # FilteredRows while a search is active
+        self.search_polling = False
         self.control_panel = control_panel
         self.icons = icons
 
         self.build_ui()
-        self.tree_list.bind("<Return>", lambda event: self.selected_video())
+        self.tree_list.bind_key("<Return>", lambda event: self.selected_video())
+
+        # Folders are listed by name unless the user picks another order
+        self.sorter = ListSorter(state, self.scheduler, self.tree_list, self.on_sorted,
+                                 details=lambda: library_details(self.library, self.folder_path))
+        self.sort_by("name", False)
 
     
-    def load_folder(self):
-        self.files, self.folder_path = FileLoader().load(
-            allowed_exts=[".mp4", ".avi", ".mov", ".mkv", 
-                ".mp3", ".wav", ".flac", ".aac", ".m4a", 
-                ".ogg", ".opus"])
-        if self.folder_path:
-            self.refresh_media()
+    def load_folder(self, folder=None):
+        loader = FileLoader()
+        if folder is None:
+            folder = loader.select_folder()
+        if not folder:
+            return
 
-    def refresh_media(self):
-        for item in self.tree_list.get_children():
-            self.tree_list.delete(item)
+        # A new folder replaces whatever scan is still running
+        if self.scanner:
+            self.scanner.cancel()
+            self.scanner = None
+        if self.index_task:
+            self.index_task.cancel()
+            self.index_task = None
+
+        self.folder_path = folder
+        self.search_bar.clear()
+        self.clear_rows()
+        self.watch_folder(folder)
 
-        if not self.folder_path or not self.files:
-            messagebox.showwarning("Folder Empty", "Please select a folder that contains at least a video/music!")
+        if self.library.knows_folder(folder):
+            # Known folder: show the indexed listing right away and only
+            # check the filesystem for changes in the background
+            self.insert_rows([f["name"] for f in self.library.files_in(folder)])
+            self.lbl_status.configure(text=f"{len(self.playlist):,} media files (checking for changes...)")
+            self.sorter.resort(self.playlist)
+            self.refresh_index(folder, reload=True)
+            return
+
+        self.scanner = loader.scan(folder, MEDIA_EXTS)
+        self.lbl_status.configure(text="Scanning...")
+        self.poll_scanner(self.scanner)
+
+    def poll_scanner(self, scanner):
+        if scanner is not self.scanner or scanner.cancelled:
+            return
+
+        names, done = scanner.drain()
+        self.insert_rows(names)
+
+        if not done:
+            self.lbl_status.configure(
+                text=f"Scanning... {scanner.matched:,} media / {scanner.scanned:,} files"
+            )
+            self.scheduler.after(30, self.poll_scanner, scanner, priority=NORMAL)
+            return
+
+        self.scanner = None
+        self.lbl_status.configure(text=f"{len(self.playlist):,} media files")
+
+        if scanner.error:
+            self.scheduler.show_message("error", "Error", f"Failed to read folder:\n{scanner.error}")
+        elif not self.playlist:
+            self.scheduler.show_message("warning", "Folder Empty", "Please select a folder that contains at least a video/music!")
+        else:
+            self.sorter.resort(self.playlist)
+            # Record the folder so the next visit is an index lookup
+            self.refresh_index(self.folder_path, reload=False)
+
+    def refresh_index(self, folder, reload):
+        task = BackgroundTask(self.library.refresh, folder, MEDIA_EXTS, cancel=threading.Event(), changes=[])
+        self.index_task = task.start()
+        self.poll_index(task, reload)
+
+    def poll_index(self, task, reload):
+        if task is not self.index_task or task.cancelled:
+            return
+        if not task.done:
+            self.scheduler.after(100, self.poll_index, task, reload, priority=NORMAL)
             return
-            
-        for i, fname in enumerate(self.files):
-            path = os.path.join(self.folder_path, fname)
-            if os.path.isfile(path):
-                row_tag = "evenrow" if i % 2 == 0 else "oddrow"
-                self.tree_list.insert("", tk.END, values=(fname,), tags=(row_tag,))
+
+        self.index_task = None
+        if reload and task.kwargs["changes"]:
+            # Applied like the watcher's changes: the model (maybe the list
+            # being played), selection and scroll position stay
+            folder = normalize(task.args[0])
+            self.apply_changes(sorted(
+                (op, os.path.basename(path), None)
+                for op, path in task.kwargs["changes"] if os.path.dirname(path) == folder
+            ))
+        self.lbl_status.configure(text=f"{len(self.playlist):,} media files")
+
+        if reload and not self.playlist:
+            self.scheduler.show_message("warning", "Folder Empty", "Please select a folder that contains at least a video/music!")
+
+    # -------------------------------------------------------------
+    # Live folder changes
+    # -------------------------------------------------------------
+    def watch_folder(self, folder):
+        # Started before the listing so nothing that happens meanwhile is missed
+        if self.watcher:
+            self.watcher.cancel()
+        self.watcher = FolderWatcher(folder, MEDIA_EXTS).start()
+        self.scheduler.after(500, self.poll_watcher, self.watcher, priority=LOW)
+
+    def poll_watcher(self, watcher):
+        if watcher is not self.watcher or watcher.cancelled:
+            return
+        # While the listing is still loading the changes stay queued
+        if self.scanner is None and self.index_task is None:
+            changes = watcher.drain()
+            if changes:
+                self.apply_changes(changes)
+        self.scheduler.after(500, self.poll_watcher, watcher, priority=LOW)
+
+    def apply_changes(self, changes):
+        # Incremental update: renames in place, removals as index ranges,
+        # additions appended. Adding a name already listed (a file that was
+        # rewritten) only refreshes its metadata.
+        folder = os.path.join(self.folder_path, "")
+        version = self.playlist.version
+        added = {}
+        removed = set()
+        for op, name, old in changes:
+            if op == "resync":
+                listed = {self.playlist.basename(i) for i in range(len(self.playlist))}
+                added = dict.fromkeys(sorted(name - listed))
+                removed = listed - name
+            elif op == "add":
+                removed.discard(name)
+                added[name] = None
+            elif op == "remove":
+                added.pop(name, None)
+                removed.add(name)
+            elif op == "rename":
+                index = self.playlist.index_of(folder + old)
+                if old in added or index == -1:
+                    added.pop(old, None)
+                    added[name] = None
+                elif self.playlist.index_of(folder + name) != -1:
+                    removed.add(old)  # replaced an existing file
+                else:
+                    self.search.invalidate()  # before the model changes under the index worker
+                    self.playlist.rename(index, name)
+                    self.model_rows_changed(index, index + 1)
+                    if self.state.current_song_list is self.playlist:
+                        self.state.entry_renamed(index)
+
+        playing = self.state.current_song_list is self.playlist
+        indexes = sorted(
+            i for i in (self.playlist.index_of(folder + name) for name in removed) if i != -1
+        )
+        # Contiguous runs, last first so earlier indexes stay valid
+        while indexes:
+            stop = indexes.pop() + 1
+            start = stop - 1
+            while indexes and indexes[-1] == start - 1:
+                start = indexes.pop()
+            self.search.invalidate()
+            self.playlist.remove_range(start, stop)
+            if self.results is None:
+                self.tree_list.rows_removed(start, stop)
+            if playing:
+                self.state.entries_removed(start, stop)
+
+        new_names = []
+        for name in added:
+            index = self.playlist.index_of(folder + name)
+            if index == -1:
+                new_names.append(name)
+            else:
+                self.playlist.set_duration(index, None)
+                self.playlist.set_info(index, "")
+                self.playlist.forget_sort_keys(index)
+                self.model_rows_changed(index, index + 1)
+                self.request_metadata(index, index + 1)
+        self.insert_rows(new_names)
+        self.refresh_search()
+
+        # The entry queued for gapless playback may have moved or gone
+        if playing:
+            self.media_player.queue_next()
+        self.lbl_status.configure(text=f"{len(self.playlist):,} media files")
+        if self.playlist.version != version:
+            self.sorter.resort(self.playlist)  # new and renamed entries take their place
+
+    def clear_rows(self):
+        # A fresh model: the old one may still be the list being played
+        self.sorter.cancel()
+        self.playlist = PlaylistModel()
+        self.results = None
+        self.search.reset(self.playlist)
+        self.tree_list.set_source(self.playlist)
+        self.probe.cancel_pending()
+
+    def insert_rows(self, names):
+        if not names:
+            return
+        start = len(self.playlist)
+        self.playlist.extend_names(self.folder_path, names)
+        if self.results is None:
+            self.tree_list.rows_appended(start, len(self.playlist))
+        self.request_metadata(start, len(self.playlist))
+
+    # -------------------------------------------------------------
+    # Metadata (duration / format columns)
+    # -------------------------------------------------------------
+    def request_metadata(self, start, stop):
+        self.probe.request(self.playlist[i] for i in range(start, stop))
+        if not self.probe_polling:
+            self.probe_polling = True
+            self.scheduler.after(200, self.poll_metadata, priority=LOW)
+
+    def poll_metadata(self):
+        results = self.probe.drain()
+        low = high = None
+        for path, meta in results:
+            index = self.playlist.index_of(path)
+            if index == -1:
+                continue
+            self.playlist.set_duration(index, meta.get("duration"))
+            self.playlist.set_info(index, describe(meta))
+            if meta.get("tags"):
+                self.search.add_tags(index, meta["tags"])
+            low = index if low is None else min(low, index)
+            high = index if high is None else max(high, index)
+
+        if low is not None:
+            self.model_rows_changed(low, high + 1)
+
+        # Stop polling once nothing is left to probe
+        if self.probe.busy:
+            self.scheduler.after(200, self.poll_metadata, priority=LOW)
+        else:
+            self.probe_polling = False
+
+    # -------------------------------------------------------------
+    # Search (rows shown are a filtered view while a query is active)
+    # -------------------------------------------------------------
+    def model_index(self, row):
+        return row if self.results is None else self.results.model_index(row)
+
+    def model_rows_changed(self, start, stop):
+        if self.results is None and not self.tree_list.shows(start, stop):
+            return
+        self.redraw_rows()
+
+    def redraw_rows(self):
+        # However many updates come in, the rows are redrawn once per UI slice
+        self.scheduler.post(self.tree_list.refresh, key=(self.tree_list, "refresh"))
+
+    def on_search(self, query):
+        if not query:
+            self.results = None
+            self.tree_list.set_source(self.playlist)
+            self.search_bar.show_count("")
+            return
+
+        indexes = self.search.search(query)
+        self.results = FilteredRows(self.playlist, indexes)
+        self.tree_list.set_source(self.results)
+        if indexes:
+            self.tree_list.select(0)  # Return plays the best match
+        self.search_bar.show_count(f"{len(indexes):,} found")
+
+        # Matches so far; searched again once the index is complete
+        if self.search.building:
+            self.search_bar.show_count(f"{len(indexes):,} found...")
+            if not self.search_polling:
+                self.search_polling = True
+                self.scheduler.after(250, self.poll_search, priority=NORMAL)
+
+    def poll_search(self):
+        if self.search.building:
+            self.scheduler.after(250, self.poll_search, priority=NORMAL)
+            return
+        self.search_polling = False
+        self.refresh_search()
+
+    def refresh_search(self):
+        if self.results is not None:
+            self.on_search(self.search_bar.query)
+
+    # -------------------------------------------------------------
+    # Sorting (column headings and the sort menu)
+    # -------------------------------------------------------------
+    def on_heading(self, column):
+        self.sort_by(HEADING_FIELDS[column])
+
+    def on_sort_menu(self, label):
+        self.sort_by(SORT_LABELS[label], False)
+
+    def flip_sort(self):
+        if self.sorter.field is not None:
+            self.sort_by(self.sorter.field, not self.sorter.descending)
+
+    def sort_by(self, field, descending=None):
+        field, descending = self.sorter.choose(field, descending)
+        self.sort_menu.set(FIELDS.get(field, UNSORTED))
+        self.btn_sort_dir.configure(text="▼" if descending else "▲")
+        # While scanning, the listing is sorted once it's complete
+        if self.scanner is None and self.playlist:
+            self.sorter.resort(self.playlist)
+            if self.sorter.busy:
+                self.lbl_status.configure(text=f"Sorting {len(self.playlist):,} media files...")
+
+    def on_sorted(self, model):
+        if model is not self.playlist:
+            return
+        # Indexes moved: searches start over, the entry queued for gapless
+        # playback is picked again in the new order
+        self.search.invalidate()
+        self.refresh_search()
+        if self.state.current_song_list is model:
+            self.media_player.queue_next()
+        if self.scanner is None:
+            self.lbl_status.configure(text=f"{len(self.playlist):,} media files")
+
+    # -------------------------------------------------------------
+    # Thumbnails (visible rows only)
+    # -------------------------------------------------------------
+    def row_image(self, path, index):
+        return self.thumbnails.get(path) or ""
+
+    def on_rows_visible(self, start, stop):
+        self.thumbnails.set_visible([self.tree_list.source[i] for i in range(start, stop)])
+        if self.thumbnails.busy and not self.thumb_polling:
+            self.thumb_polling = True
+            self.scheduler.after(100, self.poll_thumbnails, priority=LOW)
+
+    def poll_thumbnails(self):
+        if self.thumbnails.drain():
+            self.redraw_rows()
+
+        if self.thumbnails.busy:
+            self.scheduler.after(100, self.poll_thumbnails, priority=LOW)
+        else:
+            self.thumb_polling = False
+
+    def format_row(self, path, row):
+        index = self.model_index(row)
+        return (
+            self.playlist.basename(index),
+            format_duration(self.playlist.duration(index)),
+            self.playlist.info(index),
+        )
+
+    def refresh_media(self):
+        self.search_bar.clear()
+        self.tree_list.set_source(self.playlist)
+
+        if not self.folder_path or not self.playlist:
+            self.scheduler.show_message("warning", "Folder Empty", "Please select a folder that contains at least a video/music!")
 
     def build_ui(self):
         # ---------- Style the Treeview ----------
@@ -66,61 +423,66 @@ class FolderPanel(ctk.CTkFrame):
                 foreground=[("active", "#ffffff"), 
                             ("pressed", "#ffffff")])
 
-        # ---------- Treeview ----------
-        self.tree_list = ttk.Treeview(
-            self, 
-            columns=("Media",), 
-            show="headings",  # Changed from "tree" to "headings"
-            style="Custom.Treeview", 
-            selectmode="browse",
-            height=10
+        # ---------- Virtual list (Treeview + Scrollbar) ----------
+        self.tree_list = VirtualList(
+            self,
+            columns=[
+                ("Media", "Media Folder", 200, "center"),
+                ("Time", "Time", 60, "center"),
+                ("Format", "Format", 80, "center"),
+            ],
+            formatter=self.format_row,
+            image=self.row_image if self.thumbnails.available else None,
+            on_visible=self.on_rows_visible,
+            on_heading=self.on_heading
         )
-        self.tree_list.heading("Media", text="Media Folder")  # Add heading
-        self.tree_list.column("Media", anchor="center", width=300)
-        self.tree_list.tag_configure("oddrow", background="#2b2b2b")
-        self.tree_list.tag_configure("evenrow", background="#383838")
 
-        # ---------- Scrollbar ----------
-        self.v_scroll = ctk.CTkScrollbar(self, orientation="vertical", command=self.tree_list.yview)
-        self.tree_list.configure(yscrollcommand=self.v_scroll.set)
+        # ---------- Search ----------
+        self.search_bar = SearchBar(self, on_change=self.on_search, on_submit=self.selected_video,
+                                    on_focus=self.search.sync, placeholder="Search folder...")
 
         # ---------- Grid Layout ----------
-        self.tree_list.grid(row=0, column=0, padx=(10,0), pady=10, columnspan=2, sticky="nsew")
-        self.v_scroll.grid(row=0, column=2, padx=(0,10), pady=10, sticky="ns")
+        self.search_bar.grid(row=0, column=0, padx=10, pady=(10, 0), columnspan=3, sticky="ew")
+        self.tree_list.grid(row=1, column=0, padx=10, pady=10, columnspan=3, sticky="nsew")
 
         # Make the tree expand with the frame
-        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
         # -------------------------------------------------------------
         # BUTTON BAR (BOTTOM) — ALWAYS SHOWS
         # -------------------------------------------------------------
         button_bar = ctk.CTkFrame(self)
-        button_bar.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0,10))
+        button_bar.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(0,10))
 
         # Expand button bar horizontally
         button_bar.grid_columnconfigure((0,1), weight=1)
 
+        self.sort_menu = ctk.CTkOptionMenu(button_bar, values=list(SORT_LABELS), command=self.on_sort_menu)
+        self.sort_menu.grid(row=0, column=0, padx=10, pady=(10, 0))
+
+        self.btn_sort_dir = ctk.CTkButton(button_bar, text="▲", width=40, command=self.flip_sort)
+        self.btn_sort_dir.grid(row=0, column=1, padx=10, pady=(10, 0))
+
         self.btn_load = ctk.CTkButton(button_bar, text="Load Folder", command=self.load_folder)
         self.btn_load.grid(row=1, column=0, padx=10, pady=10)
 
         self.btn_play = ctk.CTkButton(button_bar, text="Play", command=self.selected_video)
         self.btn_play.grid(row=1, column=1, padx=10, pady=10)
 
+        # Scan progress / item count
+        self.lbl_status = ctk.CTkLabel(button_bar, text="", font=("Segoe UI", 11))
+        self.lbl_status.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 5))
+
     def selected_video(self):
-        selected = self.tree_list.focus()
-        if selected:
-            values = self.tree_list.item(selected, "values")
-            if values:
-                fname = values[0]
-                self.state.path = os.path.join(self.folder_path, fname)
-                self.state.current_song_list = [
-                    os.path.join(self.folder_path, f) for f in self.files  # full paths
-                ]
-                self.state.current_index = (self.files.index(fname))    # current index
-                self.media_player.load_media()
-                self.control_panel.btn_play_pause.configure(image=self.icons["pause"])
-                return
-
-        messagebox.showwarning("Folder", "Please select a file!")
+        index = self.tree_list.selected_index()
+        if index != -1:
+            index = self.model_index(index)
+            # The model is shared by reference: no copy, no index search
+            self.state.set_song_list(self.playlist, index)
+            self.media_player.load_media()
+            self.control_panel.btn_play_pause.configure(image=self.icons["pause"])
+            return
+
+        self.scheduler.show_message("warning", "Folder", "Please select a file!")
         self.state.path = None
@@ -0,0 +1,22 @@
+import time
+from PIL import Image
+from customtkinter import CTkImage
+from app.services.startup_profiler import profiler
+
+
+# Icon name -> CTkImage, loaded from disk the first time a name is used.
+# Icons that are only shown later (pause, the other loop states, ...) don't
+# cost anything at startup.
+class IconSet(dict):
+    def __init__(self, files, size=(20, 20)):
+        super().__init__()
+        self.files = files  # name -> image path
+        self.size = size
+
+    def __missing__(self, name):
+        started = time.perf_counter()
+        img = Image.open(self.files[name])
+        icon = CTkImage(light_image=img, size=self.size)
+        self[name] = icon
+        profiler.add("icons", time.perf_counter() - started)
+        return icon
@@ -0,0 +1,100 @@
+import threading
+from app.services.background import BackgroundTask
+from app.services.sorting import COMPLETE, FIELDS, sort_order, reverse_order, file_details
+from app.ui.ui_scheduler import NORMAL
+
+# Column heading -> sort field (both panels use the same columns)
+HEADING_FIELDS = {"Media": "name", "Time": "duration", "Format": "type"}
+FIELD_HEADINGS = {field: heading for heading, field in HEADING_FIELDS.items()}
+
+
+# Sorts a panel's PlaylistModel and keeps everything pointing at the same
+# entries: the selected row, and AppState's current index when the model is
+# the list being played, so next/previous follow the order on screen.
+#
+# A sort by a field and direction that was computed before (and is still
+# valid) is applied at once; otherwise sorting.sort_order() runs on a
+# worker and the result is applied when it's ready. If entries were added,
+# removed or renamed meanwhile the order is computed again.
+class ListSorter:
+    def __init__(self, state, scheduler, tree_list, on_sorted, details=None):
+        self.state = state
+        self.scheduler = scheduler
+        self.tree_list = tree_list
+        self.on_sorted = on_sorted  # (model) after an order was applied
+        self.details = details      # () -> details function for size/date, default file_details
+        self.field = None           # None: stored order
+        self.descending = False
+        self.task = None
+
+    @property
+    def busy(self):
+        return self.task is not None
+
+    def choose(self, field, descending=None):
+        # Heading click semantics: the same field flips the direction,
+        # another one starts ascending. Returns the chosen (field, descending).
+        if field is not None and field not in FIELDS:
+            raise ValueError(f"unknown sort field: {field}")
+        if descending is None:
+            descending = field == self.field and not self.descending
+        self.field, self.descending = field, descending if field else False
+        self.tree_list.show_sort(FIELD_HEADINGS.get(field), self.descending)
+        return self.field, self.descending
+
+    def cancel(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def resort(self, model):
+        # Apply the chosen sort to `model` (after loading or adding entries)
+        self.cancel()
+        if self.field is None:
+            if model.is_sorted:
+                self._apply(model, {"order": None, "position": None})
+            return
+        cached = model.cached_order(self.field, self.descending)
+        if cached is None and self.field in COMPLETE:
+            opposite = model.cached_order(self.field, not self.descending)
+            cached = reverse_order(*opposite) if opposite is not None else None
+        if cached is not None:
+            order, position = cached
+            self._apply(model, {"order": order, "position": position, "version": model.version,
+                                "field": self.field, "descending": self.descending})
+            return
+        details = self.details() if self.details else file_details
+        self.task = BackgroundTask(sort_order, model, self.field, self.descending, details,
+                                   cancel=threading.Event()).start()
+        self.scheduler.after(50, self.poll, self.task, model, priority=NORMAL)
+
+    def poll(self, task, model):
+        if task is not self.task or task.cancelled:
+            return
+        if not task.done:
+            self.scheduler.after(50, self.poll, task, model, priority=NORMAL)
+            return
+        self.task = None
+        if task.error is not None:
+            self.scheduler.show_message("error", "Sort", f"Could not sort the list:\n{task.error}")
+        elif task.result is not None and not self._apply(model, task.result):
+            self.resort(model)  # the list changed while the order was computed
+
+    def _apply(self, model, result):
+        playing = self.state.current_song_list is model and 0 <= self.state.current_index < len(model)
+        current = model.slot(self.state.current_index) if playing else -1
+        shown = self.tree_list.source is model
+        selected = self.tree_list.selected_index() if shown else -1
+        selected = model.slot(selected) if selected != -1 else -1
+
+        if not model.apply_order(**result):
+            return False
+
+        if playing:
+            self.state.entries_reordered(model.index_of_slot(current))
+        if selected != -1:
+            self.tree_list.select(model.index_of_slot(selected))
+        if shown:
+            self.tree_list.refresh()
+        self.on_sorted(model)
+        return True
@@ -1,13 +1,22 @@
-import os, ctypes, sys
+import os, ctypes, sys, logging
 import customtkinter as ctk
-from PIL import Image, ImageTk
-from customtkinter import CTkImage
+from PIL import ImageTk
+import tkinter as tk
 from tkinter import messagebox
 from app.state import AppState
 from app.players.media_player import MediaPlayer
 from app.ui.folder_panel import FolderPanel
 from app.ui.control_panel import ControlPanel
 from app.ui.playlist_panel import PlaylistPanel
+from app.services.library_index import LibraryIndex
+from app.services.loudness import LoudnessScanner
+from app.services.startup_profiler import profiler
+from app.services.control_api import ControlServer, control_address
+from app.ui.remote_control import RemoteControl
+from app.ui.duplicates_window import DuplicatesWindow
+from app.ui.ui_scheduler import UiScheduler, HIGH, LOW
+from app.ui.icons import IconSet
+from app.ui.search_bar import shortcut
 
 
 # Initialize application state and controller
@@ -19,18 +28,20 @@ APP_SUPPORT_EMAIL = ""
 APP_GITHUB = "https://github.com/RC-git-hub"
 
 state = AppState()
+library = LibraryIndex()
+logger = logging.getLogger(__name__)
+
+LOUDNESS_AHEAD = 3  # upcoming entries measured before the rest of the list
 
 
 class MainApp(ctk.CTk):
-    def __init__(self,):
+    def __init__(self, instance_server=None, paths=()):
         super().__init__()
-        self.setup_window()
+        with profiler.phase("window"):
+            self.setup_window()
         root = self.winfo_toplevel()
 
-        
-        self.icons = {}
-        
-        # Load icons
+        # Icons are loaded on first use
         base_dir = os.path.dirname(os.path.abspath(__file__))
         icons_dir = os.path.join(base_dir,'..', '..', 'assets', 'icons')
 
@@ -49,12 +60,25 @@ class MainApp(ctk.CTk):
             "loop_2": "loop[2]_icon.png",
         }
 
-        for name, file in icon_files.items():
-            self.load_icon(name, os.path.join(icons_dir, file))
-
+        self.icons = IconSet({
+            name: self.resource_path(os.path.join(icons_dir, file))
+            for name, file in icon_files.items()
+        })
 
         # Build UI components
+        with profiler.phase("widgets"):
+            self.build_ui()
+
+        root.bind("<Escape>", shortcut(self.exit_fullscreen))
+        root.bind("<f>", shortcut(self.toggle_fullscreen))
+        root.bind("<F>", shortcut(self.toggle_fullscreen))
+        self.bind("<Control-q>", lambda event: self.on_close())
 
+        # No UI refresh while the window is minimized
+        self.bind("<Unmap>", self.on_visibility_change)
+        self.bind("<Map>", self.on_visibility_change)
+
+    def build_ui(self):
         # Configure grid for dashboard layout
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)   # main video area expands
@@ -62,14 +86,22 @@ class MainApp(ctk.CTk):
 
         # Main content area (video player always here)
 
-        self.media_player = MediaPlayer(self, state)
+        # Every piece of UI work, from any thread, goes through the scheduler
+        self.scheduler = UiScheduler(self)
+
+        # Per-track gains for loudness normalization, measured in the background
+        self.loudness = LoudnessScanner(library)
+        self._loudness_list = None  # (list, version) being scanned
+        self._loudness_track = None
+
+        self.media_player = MediaPlayer(self, state, self.scheduler, loudness=self.loudness)
         self.media_player.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
 
         self.control_panel = ControlPanel(self, state, self.media_player, self.icons)
         self.control_panel.grid(row=1, column=0, columnspan=2, sticky="ew", padx=10, pady=10)
 
         # Create Tabview as a vertical sidebar on the right
-        self.tabview = ctk.CTkTabview(self, width=350, height=600, corner_radius=10)
+        self.tabview = ctk.CTkTabview(self, width=350, height=600, corner_radius=10, command=self.on_tab_change)
         self.tabview.grid(row=0, column=1, sticky="ns", padx=10, pady=10)
         self.tabview.grid_propagate(False)   # prevents resizing to fit children
         
@@ -80,31 +112,171 @@ class MainApp(ctk.CTk):
 
         # Access each tab like a frame
         folder_tab = self.tabview.tab("Folder")
-        settings_tab = self.tabview.tab("Settings")
-        playlist_tab = self.tabview.tab("C/O Playlist")
         
         
-        self.folder_panel = FolderPanel(folder_tab, state, self.media_player, self.control_panel, self.icons)
+        self.folder_panel = FolderPanel(folder_tab, state, self.media_player, self.control_panel, self.icons, library)
         self.folder_panel.grid(row=0, column=0)
 
-        playlist_panel = PlaylistPanel(playlist_tab, state, self.media_player, self.control_panel, self.icons)
-        playlist_panel.grid(row=0, column=0, sticky="nsew")
+        # The other tabs are built the first time they are needed
+        self.playlist_panel = None
+        self.fullscreen_switch = None
+        self.lbl_buffer = None
+        self.lbl_ui_queue = None
+        self.lbl_loudness = None
+        self.duplicates_window = None
+        self.media_player.add_listener(self.on_playback_update)
+
+        # Files from the command line, and from later launches (single instance)
+        self.instance_server = instance_server
+        if instance_server is not None:
+            self.scheduler.after(100, self.poll_instance, priority=HIGH)
+        if paths:
+            self.scheduler.post(self.open_paths, paths)
+
+        # Local control API, opt-in through AURORAX_CONTROL
+        address = control_address()
+        self.control_server = ControlServer(address).start() if address else None
+        if self.control_server is not None:
+            self.remote_control = RemoteControl(self, self.control_server)
+
+    def poll_instance(self):
+        try:
+            for paths in self.instance_server.drain():
+                try:
+                    self.open_paths(paths)
+                except Exception:
+                    logger.exception("Could not open %r", paths)
+                # Bring the window to the front
+                self.deiconify()
+                self.lift()
+                self.focus_force()
+        finally:
+            self.scheduler.after(100, self.poll_instance, priority=HIGH)
+
+    def open_paths(self, paths):
+        # Folders open in the Folder tab, playlists and media files in the
+        # playlist tab; media files start playing if nothing is playing
+        folders, playlists, media = [], [], []
+        for path in paths:
+            if path.lower().split("?")[0].endswith((".m3u", ".m3u8")):
+                playlists.append(path)
+            elif "://" in path or os.path.isfile(path):
+                media.append(path)
+            elif os.path.isdir(path):
+                folders.append(path)
+
+        if folders:
+            self.tabview.set("Folder")
+            self.folder_panel.load_folder(folders[-1])
+        if not (playlists or media):
+            return
+
+        self.build_playlist_tab()
+        self.tabview.set("C/O Playlist")
+        if playlists:
+            self.playlist_panel.open_playlist(playlists[-1])
+        if media:
+            start = self.playlist_panel.add_entries(media)
+            if state.current_index == -1 or state.is_stopped:
+                self.playlist_panel.play_index(start)
+            elif state.current_song_list is self.playlist_panel.entries:
+                self.media_player.queue_next()  # the next entry may have changed
+
+    def on_playback_update(self, changes):
+        # Buffer statistics in the Settings tab (once it exists)
+        if self.lbl_buffer is None:
+            return
+        if "demuxer_cache_state" in changes or "paused_for_cache" in changes or "track" in changes:
+            self.scheduler.post(self.show_buffer_stats, key=(self, "buffer"), priority=LOW)
+
+    def show_buffer_stats(self):
+        self.lbl_buffer.configure(text=self.media_player.buffer_stats.summary())
+
+    def show_ui_queue(self):
+        # Backlog of the UI scheduler, refreshed while Settings is open
+        if self.tabview.get() == "Settings":
+            self.lbl_ui_queue.configure(text=self.scheduler.summary())
+        self.scheduler.after(1000, self.show_ui_queue, key=(self, "ui_queue"), priority=LOW)
+
+    def on_tab_change(self):
+        name = self.tabview.get()
+        if name == "Settings":
+            self.build_settings_tab()
+        elif name == "C/O Playlist":
+            self.build_playlist_tab()
+
+    def build_playlist_tab(self):
+        if self.playlist_panel is not None:
+            return
+        playlist_tab = self.tabview.tab("C/O Playlist")
+        self.playlist_panel = PlaylistPanel(playlist_tab, state, self.media_player, self.control_panel, self.icons, library)
+        self.playlist_panel.grid(row=0, column=0, sticky="nsew")
+
+    def build_settings_tab(self):
+        if self.fullscreen_switch is not None:
+            return
+        settings_tab = self.tabview.tab("Settings")
 
         # Example content in Settings tab
         ctk.CTkLabel(settings_tab, text="⚙️ Settings", font=("Arial", 16)).grid(row=0, column=0, padx=20, pady=20)
 
         self.fullscreen_switch = ctk.CTkSwitch(settings_tab, text="Full Screen", command=self.toggle_fullscreen)
         self.fullscreen_switch.grid(row=1, column=0, padx=20, pady=10)
-        
-        root.bind("<Escape>", self.exit_fullscreen)
-        root.bind("<f>", self.toggle_fullscreen)
-        root.bind("<F>", self.toggle_fullscreen)
-        self.bind("<Control-q>", lambda event: self.on_close())
+
+        self.gapless_switch = ctk.CTkSwitch(settings_tab, text="Gapless Playback", command=self.toggle_gapless)
+        self.gapless_switch.grid(row=2, column=0, padx=20, pady=10)
+        if state.gapless:
+            self.gapless_switch.select()
+
+        self.stream_check_switch = ctk.CTkSwitch(settings_tab, text="Check Stream URLs", command=self.toggle_stream_check)
+        self.stream_check_switch.grid(row=3, column=0, padx=20, pady=10)
+        if state.check_stream_urls:
+            self.stream_check_switch.select()
+
+        # Cache profile and rebuffering of the current entry
+        self.lbl_buffer = ctk.CTkLabel(settings_tab, text=self.media_player.buffer_stats.summary(),
+                                       font=("Segoe UI", 11), wraplength=280, justify="left")
+        self.lbl_buffer.grid(row=4, column=0, padx=20, pady=10, sticky="w")
+
+        self.lbl_ui_queue = ctk.CTkLabel(settings_tab, text=self.scheduler.summary(),
+                                         font=("Segoe UI", 11), wraplength=280, justify="left")
+        self.lbl_ui_queue.grid(row=5, column=0, padx=20, pady=(0, 10), sticky="w")
+        self.show_ui_queue()
+
+        self.normalize_switch = ctk.CTkSwitch(settings_tab, text="Normalize Loudness", command=self.toggle_normalize)
+        self.normalize_switch.grid(row=6, column=0, padx=20, pady=10)
+        if state.normalize_loudness:
+            self.normalize_switch.select()
+        self.lbl_loudness = ctk.CTkLabel(settings_tab, text=self.loudness_text(),
+                                         font=("Segoe UI", 11), wraplength=280, justify="left")
+        self.lbl_loudness.grid(row=7, column=0, padx=20, pady=(0, 10), sticky="w")
+        if not self.loudness.available:
+            self.normalize_switch.configure(state="disabled")
+
+        self.btn_duplicates = ctk.CTkButton(settings_tab, text="Find Duplicate Files", command=self.find_duplicates)
+        self.btn_duplicates.grid(row=8, column=0, padx=20, pady=10)
+
+    def find_duplicates(self):
+        # Over the library index, plus the loaded folder and playlist
+        if self.duplicates_window is not None and self.duplicates_window.winfo_exists():
+            self.duplicates_window.lift()
+            return
+        # Snapshots: the finder expands them into paths on its own thread
+        lists = [self.folder_panel.playlist.snapshot()]
+        if self.playlist_panel is not None:
+            lists.append(self.playlist_panel.entries.snapshot())
+        self.duplicates_window = DuplicatesWindow(self, self.scheduler, library, lists)
+
+    def on_visibility_change(self, event):
+        # Toplevel bindings also fire for every child widget
+        if event.widget is self:
+            self.media_player.set_ui_active(event.type == tk.EventType.Map)
 
 
 
     def exit_fullscreen(self, event=None):
         self.attributes("-fullscreen", False)
+        self.build_settings_tab()
         self.fullscreen_switch.deselect()
         # Show panels back
         self.tabview.grid(row=0, column=1, sticky="ns", padx=10, pady=10)
@@ -114,6 +286,7 @@ class MainApp(ctk.CTk):
 
     def toggle_fullscreen(self, event=None):
     # Flip switch manually if user pressed F
+        self.build_settings_tab()
         if event is not None:
             if self.fullscreen_switch.get():
                 self.fullscreen_switch.deselect()
@@ -130,10 +303,55 @@ class MainApp(ctk.CTk):
             self.control_panel.grid(row=1, column=0, columnspan=2, sticky="ew", padx=10, pady=10)
 
 
-    def load_icon(self, name, path, size=(20, 20)):
-        img = Image.open(self.resource_path(path))
-        icon = CTkImage(light_image=img, size=size)
-        self.icons[name] = icon
+    def toggle_gapless(self):
+        state.gapless = bool(self.gapless_switch.get())
+        self.media_player.queue_next()
+
+    def toggle_stream_check(self):
+        state.check_stream_urls = bool(self.stream_check_switch.get())
+
+    def toggle_normalize(self):
+        state.normalize_loudness = bool(self.normalize_switch.get())
+        if state.normalize_loudness:
+            self.scan_loudness()
+        else:
+            self.loudness.cancel_pending()
+            self._loudness_list = self._loudness_track = None
+        self.lbl_loudness.configure(text=self.loudness_text())
+        self.media_player.queue_next()  # the queued entry gets (or loses) its gain
+
+    def scan_loudness(self):
+        # While normalization is on: the playing entry and the next few are
+        # measured first, then the rest of the list being played. A gain
+        # that arrived for the queued entry re-queues it with the gain
+        if not state.normalize_loudness:
+            return
+        songs = state.current_song_list
+        upcoming = [i for i in state.upcoming(LOUDNESS_AHEAD) if i < len(songs)]
+        if state.path != self._loudness_track:
+            self._loudness_track = state.path
+            ahead = [songs[i] for i in upcoming]
+            self.loudness.request(([state.path] if state.path else []) + ahead, urgent=True)
+        if self._loudness_list != (songs, songs.version):
+            self._loudness_list = (songs, songs.version)
+            self.loudness.cancel_pending()
+            self.loudness.request(songs.snapshot())
+
+        self.loudness.drain()
+        if self.media_player.queued_gain_changed():
+            self.media_player.queue_next()
+        if self.lbl_loudness is not None and self.tabview.get() == "Settings":
+            self.lbl_loudness.configure(text=self.loudness_text())
+        self.scheduler.after(1000, self.scan_loudness, key=(self, "loudness"), priority=LOW)
+
+    def loudness_text(self):
+        if not self.loudness.available:
+            return "Loudness normalization needs FFmpeg and NumPy."
+        text = f"Loudness: {self.loudness.measured:,} measured, {self.loudness.cache_hits:,} from cache"
+        if self.loudness.queued:
+            text += f", {self.loudness.queued:,} queued"
+        return text
+
 
     def setup_window(self):
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -185,5 +403,22 @@ class MainApp(ctk.CTk):
             return  # user pressed Cancel → do nothing
 
         # Clean up resources
+        self.media_player.save_positions()
         self.media_player.destroy()
+        if self.folder_panel.watcher:
+            self.folder_panel.watcher.cancel()
+        self.folder_panel.probe.shutdown()
+        self.folder_panel.thumbnails.shutdown()
+        self.loudness.shutdown()
+        if self.playlist_panel is not None:
+            self.playlist_panel.probe.shutdown()
+            self.playlist_panel.thumbnails.shutdown()
+        if self.duplicates_window is not None and self.duplicates_window.winfo_exists():
+            self.duplicates_window.finder.cancel()
+        library.close()
+        if self.instance_server is not None:
+            self.instance_server.close()
+        if self.control_server is not None:
+            self.control_server.close()
+        self.scheduler.close()
         self.destroy()
\ No newline at end of file
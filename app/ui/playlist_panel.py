@@ -1,21 +1,56 @@
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, filedialog
 import os
+import logging
+from app.ui.virtual_list import VirtualList
+from app.ui.search_bar import SearchBar, FilteredRows
+from app.ui.formatting import format_duration
+from app.ui.list_sorter import ListSorter, HEADING_FIELDS
+from app.ui.ui_scheduler import NORMAL, LOW
+from app.services.m3u_parser import M3UReader
+from app.services.background import BackgroundTask
+from app.services.playlist_cache import write_sidecar
+from app.services.http_client import CachedFetcher
+from app.services.metadata_probe import MetadataProbe, describe
+from app.services.thumbnails import ThumbnailService
+from app.services.search_index import SearchIndex
+from app.services.sorting import FIELDS
+from app.services.playlist_model import PlaylistModel, UNKNOWN, PRESENT, MISSING
+
+WRITE_CHUNK = 5000  # playlist lines written per scheduler step
+UNSORTED = "Playlist order"
+SORT_LABELS = {UNSORTED: None, **{label: field for field, label in FIELDS.items()}}
+
+logger = logging.getLogger(__name__)
 
 class PlaylistPanel(ctk.CTkFrame):
-    def __init__(self, master, state, video_player, control_panel, icons):
+    def __init__(self, master, state, video_player, control_panel, icons, library):
         super().__init__(master)
         self.state = state
+        self.library = library
         self.video_player = video_player
+        self.scheduler = video_player.scheduler
         self.control_panel = control_panel
         self.icons = icons
 
         self.playlist_path = None
-        self.entries = []  # list of absolute file paths from the m3u
+        self.entries = PlaylistModel()  # absolute paths (+ title/duration) from the m3u
+        self.reader = None
+        self.statuses_changed = False  # existence checks changed the list since it was read
+        self.fetcher = None  # remote playlists: keep-alive client + HTTP cache
+        self.probe = MetadataProbe(library)
+        self.probe_polling = False
+        self.thumbnails = ThumbnailService()
+        self.thumb_polling = False
+        self.search = SearchIndex(self.entries)
+        self.results = None  # FilteredRows while a search is active
+        self.search_polling = False
 
         self.build_ui()
-        self.tree_list.bind("<Return>", lambda event: self.selected_video())
+        self.tree_list.bind_key("<Return>", lambda event: self.selected_video())
+        # Playlists keep their own order until the user picks a sort
+        self.sorter = ListSorter(state, self.scheduler, self.tree_list, self.on_sorted)
 
     # -------------------------------------------------------------
     # Load an .m3u or .m3u8 file
@@ -28,62 +63,274 @@ class PlaylistPanel(ctk.CTkFrame):
 
         if not path:
             return
+        self.open_playlist(path)
+
+    # -------------------------------------------------------------
+    # Load an .m3u or .m3u8 from an http(s) URL
+    # -------------------------------------------------------------
+    def load_playlist_url(self):
+        dialog = ctk.CTkInputDialog(text="Playlist URL (http/https):", title="Load M3U from URL")
+        url = (dialog.get_input() or "").strip()
+        if not url:
+            return
+        if not url.lower().startswith(("http://", "https://")):
+            self.scheduler.show_message("error", "Error", "Please enter an http:// or https:// URL.")
+            return
+        if self.fetcher is None:
+            self.fetcher = CachedFetcher()
+        self.open_playlist(url)
+
+    def open_playlist(self, path):
+        # A new playlist replaces whatever is still being read
+        if self.reader:
+            self.reader.cancel()
+        self.sorter.cancel()
 
         self.playlist_path = path
-        self.entries = self.parse_m3u(path)
-        self.refresh_media()
+        # A fresh model: the old one may still be the list being played
+        self.entries = PlaylistModel()
+        self.search_bar.clear()
+        self.results = None
+        self.search.reset(self.entries)
+        self.tree_list.set_source(self.entries)
+        self.probe.cancel_pending()
+
+        # Entries stream in from a worker; existence is checked afterwards
+        self.reader = M3UReader(
+            path,
+            is_known=self.library.contains,
+            fetcher=self.fetcher,
+            probe_urls=self.state.check_stream_urls,
+            use_sidecar=True
+        ).start()
+        self.statuses_changed = False
+        self.lbl_status.configure(text="Reading playlist...")
+        self.poll_reader(self.reader)
 
     # -------------------------------------------------------------
-    # Parse M3U playlist
+    # Receive parsed entries and existence checks from the reader
     # -------------------------------------------------------------
-    def parse_m3u(self, path):
-        entries = []
+    def poll_reader(self, reader):
+        if reader is not self.reader or reader.cancelled:
+            return
 
-        try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
+        new_entries, checks, done = reader.drain()
+
+        if reader.model is not None and reader.model is not self.entries:
+            # Compiled before: the whole list at once, decoded as rows are drawn
+            self.entries = reader.model
+            self.search.reset(self.entries)
+            self.tree_list.set_source(self.entries)
+            self.request_metadata(0, len(self.entries))
+
+        if new_entries:
+            start = len(self.entries)
+            for entry in new_entries:
+                status = UNKNOWN if entry.missing is None else (MISSING if entry.missing else PRESENT)
+                self.entries.append(entry.path, entry.title, entry.duration, status)
+            if self.results is None:
+                self.tree_list.rows_appended(start, len(self.entries))
+            self.request_metadata(start, len(self.entries))
+
+        if checks:
+            for index, missing in checks:
+                status = MISSING if missing else PRESENT
+                if self.entries.status(index) != status:
+                    self.entries.set_status(index, status)
+                    self.statuses_changed = True
+            low = min(index for index, _ in checks)
+            high = max(index for index, _ in checks)
+            self.model_rows_changed(low, high + 1)
+
+        if not done:
+            state = "Checking files" if reader.parsing_done else "Reading playlist"
+            self.lbl_status.configure(text=f"{state}... {len(self.entries):,} entries")
+            self.scheduler.after(30, self.poll_reader, reader, priority=NORMAL)
+            return
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to read playlist:\n{e}")
-            return entries
+        self.reader = None
+        self.refresh_search()
+        self.show_count()
+
+        if reader.error:
+            self.scheduler.show_message("error", "Error", f"Failed to read playlist:\n{reader.error}")
+        elif not self.entries:
+            self.scheduler.show_message("warning", "Playlist Empty", "The selected M3U playlist contains no playable files!")
+        elif reader.signature is not None and (reader.model is None or self.statuses_changed):
+            # Next time the list is mapped from the sidecar instead of parsed
+            task = BackgroundTask(write_sidecar, reader.path, reader.signature, self.entries.columns()).start()
+            self.scheduler.after(500, self.poll_sidecar, task, priority=LOW)
+        # Existence checks address entries by their place in the file, so
+        # a chosen sort waits until the reader is done
+        self.sort_by(self.sorter.field, self.sorter.descending)
+
+    def poll_sidecar(self, task):
+        if not task.done:
+            self.scheduler.after(500, self.poll_sidecar, task, priority=LOW)
+        elif task.error:
+            logger.warning("Could not write the playlist sidecar for %s: %s", task.args[0], task.error)
+
+    # -------------------------------------------------------------
+    # Refresh tree
+    # -------------------------------------------------------------
+    def refresh_media(self):
+        # Rows are drawn lazily from self.entries by the virtual list
+        self.search_bar.clear()
+        self.tree_list.set_source(self.entries)
 
-        base_dir = os.path.dirname(path)
+        if not self.entries:
+            self.scheduler.show_message("warning", "Playlist Empty", "The selected M3U playlist contains no playable files!")
 
-        for line in lines:
-            line = line.strip()
+    def format_row(self, path, row):
+        index = self.model_index(row)
+        name = self.entries.display_name(index)
+        if self.entries.is_missing(index):
+            reason = "unreachable" if "://" in path else "missing"
+            name = f"⚠ {name} ({reason})"
+        return (name, format_duration(self.entries.duration(index)), self.entries.info(index))
 
-            if not line or line.startswith("#"):
+    # -------------------------------------------------------------
+    # Metadata (duration / format columns)
+    # -------------------------------------------------------------
+    def request_metadata(self, start, stop):
+        self.probe.request(self.entries[i] for i in range(start, stop))
+        if not self.probe_polling:
+            self.probe_polling = True
+            self.scheduler.after(200, self.poll_metadata, priority=LOW)
+
+    def poll_metadata(self):
+        results = self.probe.drain()
+        low = high = None
+        for path, meta in results:
+            index = self.entries.index_of(path)
+            if index == -1:
                 continue
+            # Probed duration wins over the #EXTINF hint
+            if meta.get("duration"):
+                self.entries.set_duration(index, meta["duration"])
+            self.entries.set_info(index, describe(meta))
+            if meta.get("tags"):
+                self.search.add_tags(index, meta["tags"])
+            low = index if low is None else min(low, index)
+            high = index if high is None else max(high, index)
+
+        if low is not None:
+            self.model_rows_changed(low, high + 1)
+
+        # Stop polling once nothing is left to probe
+        if self.probe.busy:
+            self.scheduler.after(200, self.poll_metadata, priority=LOW)
+        else:
+            self.probe_polling = False
 
-            # Absolute path or URL?
-            if "://" in line:
-                entries.append(line)
-                continue
+    # -------------------------------------------------------------
+    # Search (rows shown are a filtered view while a query is active)
+    # -------------------------------------------------------------
+    def model_index(self, row):
+        return row if self.results is None else self.results.model_index(row)
+
+    def model_rows_changed(self, start, stop):
+        if self.results is None and not self.tree_list.shows(start, stop):
+            return
+        self.redraw_rows()
+
+    def redraw_rows(self):
+        # However many updates come in, the rows are redrawn once per UI slice
+        self.scheduler.post(self.tree_list.refresh, key=(self.tree_list, "refresh"))
 
-            # Otherwise treat as local file (relative)
-            abs_path = os.path.abspath(os.path.join(base_dir, line))
+    def on_search(self, query):
+        if not query:
+            self.results = None
+            self.tree_list.set_source(self.entries)
+            self.search_bar.show_count("")
+            return
 
-            if os.path.isfile(abs_path):
-                entries.append(abs_path)
+        indexes = self.search.search(query)
+        self.results = FilteredRows(self.entries, indexes)
+        self.tree_list.set_source(self.results)
+        if indexes:
+            self.tree_list.select(0)  # Return plays the best match
+        self.search_bar.show_count(f"{len(indexes):,} found")
+
+        # Matches so far; searched again once the index is complete
+        if self.search.building:
+            self.search_bar.show_count(f"{len(indexes):,} found...")
+            if not self.search_polling:
+                self.search_polling = True
+                self.scheduler.after(250, self.poll_search, priority=NORMAL)
+
+    def poll_search(self):
+        if self.search.building:
+            self.scheduler.after(250, self.poll_search, priority=NORMAL)
+            return
+        self.search_polling = False
+        self.refresh_search()
 
-        return entries
+    def refresh_search(self):
+        if self.results is not None:
+            self.on_search(self.search_bar.query)
 
     # -------------------------------------------------------------
-    # Refresh tree
+    # Sorting (column headings and the sort menu)
     # -------------------------------------------------------------
-    def refresh_media(self):
-        for item in self.tree_list.get_children():
-            self.tree_list.delete(item)
-
-        if not self.entries:
-            messagebox.showwarning("Playlist Empty", "The selected M3U playlist contains no playable files!")
+    def on_heading(self, column):
+        self.sort_by(HEADING_FIELDS[column])
+
+    def on_sort_menu(self, label):
+        self.sort_by(SORT_LABELS[label], False)
+
+    def flip_sort(self):
+        if self.sorter.field is not None:
+            self.sort_by(self.sorter.field, not self.sorter.descending)
+
+    def sort_by(self, field, descending=None):
+        field, descending = self.sorter.choose(field, descending)
+        self.sort_menu.set(FIELDS.get(field, UNSORTED))
+        self.btn_sort_dir.configure(text="▼" if descending else "▲")
+        if self.reader is None and self.entries:
+            self.sorter.resort(self.entries)
+            if self.sorter.busy:
+                self.lbl_status.configure(text=f"Sorting {len(self.entries):,} entries...")
+
+    def on_sorted(self, model):
+        if model is not self.entries:
             return
+        # Indexes moved: searches start over, the entry queued for gapless
+        # playback is picked again in the new order
+        self.search.invalidate()
+        self.refresh_search()
+        if self.state.current_song_list is model:
+            self.video_player.queue_next()
+        if self.reader is None:
+            self.show_count()
+
+    def show_count(self):
+        missing = self.entries.count_status(MISSING)
+        status = f"{len(self.entries):,} entries"
+        if missing:
+            status += f" ({missing:,} missing)"
+        self.lbl_status.configure(text=status)
 
-        for i, full_path in enumerate(self.entries):
-            fname = os.path.basename(full_path)
+    # -------------------------------------------------------------
+    # Thumbnails (visible rows only)
+    # -------------------------------------------------------------
+    def row_image(self, path, index):
+        return self.thumbnails.get(path) or ""
+
+    def on_rows_visible(self, start, stop):
+        self.thumbnails.set_visible([self.tree_list.source[i] for i in range(start, stop)])
+        if self.thumbnails.busy and not self.thumb_polling:
+            self.thumb_polling = True
+            self.scheduler.after(100, self.poll_thumbnails, priority=LOW)
 
-            row_tag = "evenrow" if i % 2 == 0 else "oddrow"
-            self.tree_list.insert("", tk.END, values=(fname,), tags=(row_tag,))
+    def poll_thumbnails(self):
+        if self.thumbnails.drain():
+            self.redraw_rows()
+
+        if self.thumbnails.busy:
+            self.scheduler.after(100, self.poll_thumbnails, priority=LOW)
+        else:
+            self.thumb_polling = False
 
     # -------------------------------------------------------------
     # UI
@@ -112,36 +359,36 @@ class PlaylistPanel(ctk.CTkFrame):
                   foreground=[("active", "#ffffff"),
                               ("pressed", "#ffffff")])
 
-        # ---------- Treeview ----------
-        self.tree_list = ttk.Treeview(
+        # ---------- Virtual list (Treeview + Scrollbar) ----------
+        self.tree_list = VirtualList(
             self,
-            columns=("Media",),
-            show="headings",
-            style="Custom.Treeview",
-            selectmode="browse",
-            height=10
+            columns=[
+                ("Media", "Playlist Media", 200, "center"),
+                ("Time", "Time", 60, "center"),
+                ("Format", "Format", 80, "center"),
+            ],
+            formatter=self.format_row,
+            image=self.row_image if self.thumbnails.available else None,
+            on_visible=self.on_rows_visible,
+            on_heading=self.on_heading
         )
-        self.tree_list.heading("Media", text="Playlist Media")
-        self.tree_list.column("Media", anchor="center", width=300)
-        self.tree_list.tag_configure("oddrow", background="#2b2b2b")
-        self.tree_list.tag_configure("evenrow", background="#383838")
 
-        # ---------- Scrollbar ----------
-        self.v_scroll = ctk.CTkScrollbar(self, orientation="vertical", command=self.tree_list.yview)
-        self.tree_list.configure(yscrollcommand=self.v_scroll.set)
+        # ---------- Search ----------
+        self.search_bar = SearchBar(self, on_change=self.on_search, on_submit=self.selected_video,
+                                    on_focus=self.search.sync, placeholder="Search playlist...")
 
         # ---------- Layout ----------
-        self.tree_list.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=(10,0), pady=10)
-        self.v_scroll.grid(row=0, column=2, sticky="ns", padx=(0,10), pady=10)
+        self.search_bar.grid(row=0, column=0, columnspan=3, sticky="ew", padx=10, pady=(10, 0))
+        self.tree_list.grid(row=1, column=0, columnspan=3, sticky="nsew", padx=10, pady=10)
 
-        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
         # -------------------------------------------------------------
         # BUTTON BAR (BOTTOM) — ALWAYS SHOWS
         # -------------------------------------------------------------
         button_bar = ctk.CTkFrame(self)
-        button_bar.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0,10))
+        button_bar.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(0,10))
 
         # Expand button bar horizontally
         button_bar.grid_columnconfigure((0,1), weight=1)
@@ -158,13 +405,26 @@ class PlaylistPanel(ctk.CTkFrame):
         self.btn_add = ctk.CTkButton(button_bar, text="Add Files", command=self.append_file)
         self.btn_add.grid(row=1, column=1, padx=10, pady=10, sticky="ew")
 
+        self.btn_load_url = ctk.CTkButton(button_bar, text="Load URL", command=self.load_playlist_url)
+        self.btn_load_url.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+
+        self.sort_menu = ctk.CTkOptionMenu(button_bar, values=list(SORT_LABELS), command=self.on_sort_menu)
+        self.sort_menu.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="ew")
+
+        self.btn_sort_dir = ctk.CTkButton(button_bar, text="▲", width=40, command=self.flip_sort)
+        self.btn_sort_dir.grid(row=3, column=1, padx=10, pady=(0, 10))
+
+        # Load progress / entry count
+        self.lbl_status = ctk.CTkLabel(button_bar, text="", font=("Segoe UI", 11))
+        self.lbl_status.grid(row=4, column=0, columnspan=2, padx=10, pady=(0, 5))
+
     # -------------------------------------------------------------
     # Append a file to a playlist
     # -------------------------------------------------------------
 
     def append_file(self):
         if not self.entries:
-            messagebox.showwarning("No Playlist Loaded", "Load a playlist first or create a new one.")
+            self.scheduler.show_message("warning", "No Playlist Loaded", "Load a playlist first or create a new one.")
             return
 
         # Allowed media types (video + audio)
@@ -184,45 +444,61 @@ class PlaylistPanel(ctk.CTkFrame):
 
         # Convert to list and extend existing entries
         new_files = list(new_files)
+        self.add_entries(new_files)
+
+        # If playlist came from a local M3U file → append automatically
+        done = ("Playlist Updated", f"Added {len(new_files)} file(s) to playlist.")
+        if self.playlist_path and "://" not in self.playlist_path:
+            self.scheduler.post_steps(
+                self.write_playlist(self.playlist_path, new_files, "a", done, "Could not update playlist file"),
+                key=(self, "write", self.playlist_path),
+            )
+            return
 
-        # Append to internal playlist
-        self.entries.extend(new_files)
-
-        # Refresh UI
-        self.refresh_media()
-
-        # If playlist came from an M3U file → append automatically
-        if self.playlist_path:
-            try:
-                with open(self.playlist_path, "a", encoding="utf-8") as f:
-                    for item in new_files:
-                        f.write(item.replace("\\", "/") + "\n")
+        self.scheduler.show_message("info", *done)
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not update playlist file:\n{e}")
-                return
+    # Append entries to the loaded list (not to its file); returns the first new index
+    def add_entries(self, paths):
+        start = len(self.entries)
+        self.entries.extend(paths, status=PRESENT)  # picked in a file dialog or handed over
 
-        messagebox.showinfo("Playlist Updated", f"Added {len(new_files)} file(s) to playlist.")
+        # Only the new rows reach the view; nothing is rebuilt
+        if self.results is None:
+            self.tree_list.rows_appended(start, len(self.entries))
+        self.request_metadata(start, len(self.entries))
+        self.refresh_search()
+        if self.sorter.field is not None and self.reader is None:
+            self.sorter.resort(self.entries)  # the new entries take their place
+        return start
 
     # -------------------------------------------------------------
     # Play selected entry
     # -------------------------------------------------------------
     def selected_video(self):
-        selected = self.tree_list.focus()
-        if selected:
-            index = self.tree_list.index(selected)
+        index = self.tree_list.selected_index()
+        if index != -1:
+            index = self.model_index(index)
+            if self.entries.is_missing(index):
+                path = self.entries[index]
+                if "://" in path:
+                    self.scheduler.show_message("warning", "Playlist", "This stream could not be reached:\n" + path)
+                else:
+                    self.scheduler.show_message("warning", "Playlist", "This file could not be found:\n" + path)
+                return
 
             if index < len(self.entries):
-                self.state.path = self.entries[index]
-                self.state.current_song_list = self.entries.copy()
-                self.state.current_index = index
-                self.video_player.load_media()
-                self.control_panel.btn_play_pause.configure(image=self.icons["pause"])
+                self.play_index(index)
                 return
 
-        messagebox.showwarning("Playlist", "Please select a file!")
+        self.scheduler.show_message("warning", "Playlist", "Please select a file!")
         self.state.path = None
 
+    def play_index(self, index):
+        # Shared by reference instead of copying the whole list
+        self.state.set_song_list(self.entries, index)
+        self.video_player.load_media()
+        self.control_panel.btn_play_pause.configure(image=self.icons["pause"])
+
     # -------------------------------------------------------------
     # Create M3U playlist
     # -------------------------------------------------------------
@@ -241,7 +517,7 @@ class PlaylistPanel(ctk.CTkFrame):
 
     def save_playlist(self):
         if not self.playlist:
-            messagebox.showerror("Error", "No playlist to save.")
+            self.scheduler.show_message("error", "Error", "No playlist to save.")
             return
         path = filedialog.asksaveasfilename(
             title="Save Playlist",
@@ -250,11 +526,23 @@ class PlaylistPanel(ctk.CTkFrame):
         )
         if not path:
             return
+        self.scheduler.post_steps(
+            self.write_playlist(path, list(self.playlist), "w", ("Playlist Saved", "Playlist saved successfully!"),
+                                "Failed to save playlist"),
+            key=(self, "write", path),
+        )
+
+    def write_playlist(self, path, paths, mode, done, failed):
+        # Steps for scheduler.post_steps(): a chunk of lines per step, so a
+        # long list is written across UI slices instead of freezing the window
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write("#EXTM3U\n")
-                for video in self.playlist:
-                    f.write(video.replace("\\", "/") + "\n")
-            messagebox.showinfo("Playlist Saved", "Playlist saved successfully!")
+            with open(path, mode, encoding="utf-8") as f:
+                if mode == "w":
+                    f.write("#EXTM3U\n")
+                for start in range(0, len(paths), WRITE_CHUNK):
+                    f.write("".join(p.replace("\\", "/") + "\n" for p in paths[start:start + WRITE_CHUNK]))
+                    yield
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save playlist:\n{e}")
+            self.scheduler.show_message("error", "Error", f"{failed}:\n{e}")
+            return
+        self.scheduler.show_message("info", *done)
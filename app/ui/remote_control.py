@@ -0,0 +1,105 @@
+import logging
+from app.ui.ui_scheduler import HIGH
+
+POLL_MS = 30  # how often queued API commands are picked up
+
+logger = logging.getLogger(__name__)
+
+
+# Connects the ControlServer to the player on the Tk thread: runs queued
+# commands through the same paths as the buttons and key bindings (so the
+# controls stay in sync), and publishes the status whenever playback
+# reports a change.
+class RemoteControl:
+    def __init__(self, app, server):
+        self.app = app
+        self.server = server
+        self.state = app.control_panel.state
+        self.media_player = app.media_player
+        self.control_panel = app.control_panel
+        self.commands = {
+            "status": lambda request: None,
+            "play": lambda request: self.set_paused(False),
+            "pause": lambda request: self.set_paused(True),
+            "toggle": lambda request: self.control_panel.toggle_play_pause(),
+            "stop": lambda request: self.control_panel.stop(),
+            "next": lambda request: self.media_player.skip_next(),
+            "previous": lambda request: self.media_player.play_previous(),
+            "seek": self.seek,
+            "loop": lambda request: self.control_panel.set_loop(int(request["value"])),
+            "shuffle": lambda request: self.control_panel.set_shuffle(bool(request["value"])),
+            "open": lambda request: self.app.open_paths([str(p) for p in request["paths"]]),
+        }
+
+        self.media_player.add_listener(self.on_playback_update)
+        self.publish()
+        self.app.scheduler.after(POLL_MS, self.poll, priority=HIGH)
+
+    def poll(self):
+        # A failing command gets an error reply; the loop always carries on
+        try:
+            for request, token in self.server.pending():
+                self.run(request, token)
+        finally:
+            self.app.scheduler.after(POLL_MS, self.poll, priority=HIGH)
+
+    def run(self, request, token):
+        handler = self.commands.get(request.get("cmd"))
+        try:
+            if handler is None:
+                raise ValueError(f"unknown command: {request.get('cmd')}")
+            handler(request)
+            status = self.status()
+        except (KeyError, TypeError, ValueError) as e:
+            self.server.reply(token, error=ValueError(f"bad request: {e}"))
+            return
+        except Exception as e:
+            logger.exception("Control command failed: %r", request)
+            self.server.reply(token, error=RuntimeError(f"command failed: {e}"))
+            return
+        self.server.reply(token, status)
+        self.publish()
+
+    def set_paused(self, paused):
+        if self.state.is_paused != paused:
+            self.control_panel.toggle_play_pause()
+
+    def seek(self, request):
+        # {"position": seconds}, {"fraction": 0..1} or {"relative": +-seconds}
+        core = self.media_player.core
+        if "relative" in request:
+            seconds = float(request["relative"])
+            if not (core.forward(seconds) if seconds >= 0 else core.backward(-seconds)):
+                raise ValueError("nothing seekable is playing")
+            return
+        if "fraction" in request:
+            fraction = float(request["fraction"])
+        else:
+            fraction = float(request["position"]) / core.duration if core.duration else None
+        if fraction is None or not core.duration:
+            raise ValueError("nothing seekable is playing")
+        self.media_player.seek(min(1.0, max(0.0, fraction)), final=True)
+
+    # -------------------------------------------------------------
+    # Status
+    # -------------------------------------------------------------
+    def status(self):
+        core = self.media_player.core
+        return {
+            "path": self.state.path,
+            "index": self.state.current_index,
+            "count": len(self.state.current_song_list),
+            "position": core.time_pos,
+            "duration": core.duration,
+            "paused": self.state.is_paused,
+            "stopped": self.state.is_stopped,
+            "buffering": core.buffer.buffering,
+            "loop": self.state.loop,
+            "shuffle": self.state.shuffle,
+        }
+
+    def publish(self):
+        self.server.publish(self.status())
+
+    def on_playback_update(self, changes):
+        self.publish()
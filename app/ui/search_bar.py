@@ -0,0 +1,96 @@
+import customtkinter as ctk
+import tkinter as tk
+
+SEARCH_DELAY_MS = 60  # keystrokes closer together than this are searched once
+
+
+# The rows of a model that match a search, in result order. Used as a
+# VirtualList source; model_index() maps a row back to the model entry.
+class FilteredRows:
+    def __init__(self, model, indexes):
+        self.model = model
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, row):
+        return self.model[self.indexes[row]]
+
+    def model_index(self, row):
+        return self.indexes[row]
+
+
+# Wraps a window-wide key shortcut so it stays out of the way while the user
+# types in an entry (the search bars): the window gets every key the entry got
+def shortcut(action):
+    def handler(event):
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            return None
+        return action(event)
+    return handler
+
+
+# Search entry with a match count. on_change(query) runs shortly after the
+# user stops typing, on_submit() on Return, on_focus() when the entry gets
+# the focus (to start indexing early); Escape clears the search.
+class SearchBar(ctk.CTkFrame):
+    def __init__(self, master, on_change, on_submit=None, on_focus=None, placeholder="Search..."):
+        super().__init__(master, fg_color="transparent")
+        self.on_change = on_change
+        self.on_submit = on_submit
+        self.on_focus = on_focus
+        self._job = None
+        self._query = ""
+
+        self.entry = ctk.CTkEntry(self, placeholder_text=placeholder)
+        self.entry.grid(row=0, column=0, sticky="ew")
+        self.lbl_count = ctk.CTkLabel(self, text="", font=("Segoe UI", 11), width=70)
+        self.lbl_count.grid(row=0, column=1, padx=(8, 0))
+        self.grid_columnconfigure(0, weight=1)
+
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Return>", self._on_return)
+        self.entry.bind("<Escape>", lambda event: self.clear())
+        if on_focus is not None:
+            self.entry.bind("<FocusIn>", lambda event: on_focus())
+
+    @property
+    def query(self):
+        return self.entry.get().strip()
+
+    def _on_key(self, event):
+        if self.query == self._query:
+            return  # arrows, modifiers, ...
+        if self._job is not None:
+            self.after_cancel(self._job)
+        self._job = self.after(SEARCH_DELAY_MS, self._fire)
+
+    def _fire(self):
+        self._job = None
+        self._query = self.query
+        self.on_change(self._query)
+
+    def _on_return(self, event):
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._fire()
+        if self.on_submit is not None:
+            self.on_submit()
+        return "break"
+
+    def clear(self):
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+        self.entry.delete(0, "end")
+        self.show_count("")
+        if self._query:
+            self._query = ""
+            self.on_change("")
+
+    def show_count(self, text):
+        self.lbl_count.configure(text=text)
+
+    def focus(self):
+        self.entry.focus_set()
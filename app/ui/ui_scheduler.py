@@ -0,0 +1,371 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import tkinter as tk
+from tkinter import messagebox
+
+FRAME_MS = 16      # while work is queued, one slice per frame
+BUDGET_MS = 8      # time a slice may spend on jobs; the rest of the frame is Tk's
+IDLE_MS = 25       # poll interval for work from other threads, without a thread-enabled Tcl
+SLOW_JOB_MS = 100  # single jobs taking longer than this are logged
+
+# Priorities: lower runs first
+HIGH = 0    # playback state, remote commands
+NORMAL = 1  # listing updates, row redraws
+LOW = 2     # metadata, thumbnails, messages, file writes
+
+WAKE_EVENT = "<<UiSchedulerWake>>"
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    __slots__ = ("func", "args", "key", "priority", "due", "posted", "steps", "state")
+
+    def __init__(self, func, args, key, priority):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.priority = priority
+        self.due = None      # perf_counter time for delayed jobs
+        self.posted = None   # when it became ready (for the lag)
+        self.steps = None    # iterator of a progressive job
+        self.state = "new"   # "waiting", "ready", "running" (steps), "done" or "cancelled"
+
+    @property
+    def pending(self):
+        return self.state in ("waiting", "ready")
+
+
+# All UI work goes through here: results of background threads, polls,
+# widget updates and message boxes.
+#
+# post() may be called from any thread; jobs only ever run on the Tk
+# thread. A timer picks them up and runs them in priority order, in slices
+# of at most BUDGET_MS, one slice per frame, so input and redraws are never
+# starved however much is queued. With nothing queued the timer is armed
+# for the next delayed job only, or not at all: an idle player doesn't wake
+# up. Other threads wake it through a waker thread that sends WAKE_EVENT
+# (event_generate blocks until the Tk thread takes it, posting never
+# does); a Tcl built without threads falls back to polling every IDLE_MS.
+# Jobs posted
+# with the same key while one is still queued replace it (a slider moved
+# ten times between two frames is set once). post_steps() runs a generator
+# one step at a time across slices for long operations.
+#
+# after() / after_cancel() mirror Tk's, so PlaybackCore and its seek
+# scheduler can use this directly; after() raises RuntimeError once
+# closed, which the core takes as "no main loop".
+class UiScheduler:
+    def __init__(self, widget):
+        self.widget = widget
+        self.closed = False
+        self.slices = 0
+        self.over_budget = 0  # slices that ran over because of a single long job
+
+        self._ready = []      # heap of (priority, seq, job)
+        self._timers = []     # heap of (due, seq, job)
+        self._keys = {}       # key -> pending job
+        self._count = 0       # pending ready jobs
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._ui_thread = threading.get_ident()
+        self._tk_job = None
+        self._tk_due = None   # perf_counter time the next slice is armed for
+        self._signal = threading.Event()
+        self._signalled = False  # a wake-up is on its way to the Tk thread
+        self._waker = None
+        try:
+            self._threaded = widget.tk.getboolean(widget.tk.call("info", "exists", "tcl_platform(threaded)"))
+            widget.bind(WAKE_EVENT, self._on_wake)
+        except tk.TclError:
+            self._threaded = False
+        self._arm(None if self._threaded else IDLE_MS)
+
+    # -------------------------------------------------------------
+    # Posting (any thread)
+    # -------------------------------------------------------------
+    def post(self, func, *args, key=None, priority=NORMAL):
+        job = self._queue(Job(func, args, key, priority), None)
+        self._wake(0)
+        return job
+
+    def post_steps(self, steps, key=None, priority=LOW):
+        # Runs next(steps) until the budget is used up, then continues in
+        # later slices; returns the job (cancel() stops it between steps)
+        job = Job(None, (), key, priority)
+        job.steps = iter(steps)
+        job = self._queue(job, None)
+        self._wake(0)
+        return job
+
+    def after(self, ms, func, *args, key=None, priority=HIGH):
+        if ms <= 0:
+            return self.post(func, *args, key=key, priority=priority)
+        job = self._queue(Job(func, args, key, priority), time.perf_counter() + ms / 1000)
+        self._wake(ms)
+        return job
+
+    def after_cancel(self, job):
+        self.cancel(job)
+
+    def cancel(self, job_or_key):
+        with self._lock:
+            job = self._keys.get(job_or_key) if not isinstance(job_or_key, Job) else job_or_key
+            if job is not None and (job.pending or job.state == "running"):
+                self._drop(job)
+
+    def show_message(self, kind, title, message):
+        # Message boxes run a nested event loop: shown after the pending
+        # updates, and the same message queued twice is shown once
+        show = getattr(messagebox, f"show{kind}")
+        return self.post(show, title, message, key=("message", title, message), priority=LOW)
+
+    def _queue(self, job, due):
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("UI scheduler closed")
+            old = self._keys.get(job.key) if job.key is not None else None
+            if old is not None and old.pending:
+                if due is None and old.state == "ready" and job.steps is None and old.steps is None:
+                    # Coalesce: the newest arguments, the earliest place in line
+                    old.func, old.args = job.func, job.args
+                    if job.priority < old.priority:
+                        old.priority = job.priority
+                        heapq.heappush(self._ready, (old.priority, next(self._seq), old))
+                    return old
+                self._drop(old)
+            if job.key is not None:
+                self._keys[job.key] = job
+            if due is None:
+                self._make_ready(job)
+            else:
+                job.due = due
+                job.state = "waiting"
+                heapq.heappush(self._timers, (due, next(self._seq), job))
+            return job
+
+    def _make_ready(self, job):
+        job.state = "ready"
+        job.posted = time.perf_counter()
+        self._count += 1
+        heapq.heappush(self._ready, (job.priority, next(self._seq), job))
+
+    def _drop(self, job):
+        # Heap entries of dropped jobs are skipped when they come up
+        if job.state == "ready":
+            self._count -= 1
+        job.state = "cancelled"
+        if job.key is not None and self._keys.get(job.key) is job:
+            del self._keys[job.key]
+
+    def _wake(self, ms):
+        # On the Tk thread, bring the next slice forward if it is armed for
+        # later. Other threads never touch Tk: they signal the waker when
+        # the slice is more than a frame away (or none is armed)
+        if self.closed:
+            return
+        due = time.perf_counter() + ms / 1000
+        if threading.get_ident() == self._ui_thread:
+            if self._tk_due is None or due < self._tk_due - 0.001:
+                self._arm(ms)
+            return
+        if not self._threaded:
+            return  # picked up by the poll
+        with self._lock:
+            if self._signalled or (self._tk_due is not None and self._tk_due <= due + FRAME_MS / 1000):
+                return
+            self._signalled = True
+            if self._waker is None:
+                self._waker = threading.Thread(target=self._run_waker, name="UiSchedulerWaker", daemon=True)
+                self._waker.start()
+        self._signal.set()
+
+    def _run_waker(self):
+        while True:
+            self._signal.wait()
+            self._signal.clear()
+            if self.closed:
+                return
+            try:
+                self.widget.event_generate(WAKE_EVENT, when="tail")
+            except (RuntimeError, tk.TclError):
+                return  # main loop gone
+
+    # -------------------------------------------------------------
+    # Running (Tk thread)
+    # -------------------------------------------------------------
+    def _arm(self, ms):
+        # ms None: nothing to wait for, the timer stops
+        if self._tk_job is not None:
+            try:
+                self.widget.after_cancel(self._tk_job)
+            except tk.TclError:
+                pass
+            self._tk_job = None
+        with self._lock:
+            self._tk_due = None if ms is None else time.perf_counter() + ms / 1000
+        if ms is None:
+            return
+        try:
+            self._tk_job = self.widget.after(max(0, int(ms)), self._tick)
+        except tk.TclError:
+            with self._lock:
+                self._tk_due = None  # widget destroyed
+
+    def _on_wake(self, event=None):
+        with self._lock:
+            self._signalled = False
+            delay = self._next_delay(time.perf_counter(), 0)
+        if delay is not None:
+            self._wake(delay)
+
+    def _next_delay(self, now, frame_ms):
+        # ms until the next slice is needed, None when nothing is queued.
+        # Called with the lock held
+        while self._timers and self._timers[0][2].state != "waiting":
+            heapq.heappop(self._timers)  # cancelled
+        if self._count:
+            return frame_ms
+        if self._timers:
+            return max(1, (self._timers[0][0] - now) * 1000)
+        return None if self._threaded else IDLE_MS
+
+    def _tick(self):
+        self._tk_job = None
+        with self._lock:
+            self._tk_due = None
+        if self.closed:
+            return
+        start = time.perf_counter()
+        deadline = start + BUDGET_MS / 1000
+        # Armed before running anything: a job showing a message box runs a
+        # nested event loop, and playback updates keep flowing meanwhile
+        self._arm(FRAME_MS)
+
+        with self._lock:
+            while self._timers and self._timers[0][0] <= start:
+                job = heapq.heappop(self._timers)[2]
+                if job.state == "waiting":
+                    self._make_ready(job)
+
+        while True:
+            job = self._pop()
+            if job is None:
+                break
+            self._run(job, deadline)
+            if time.perf_counter() >= deadline:
+                break
+
+        self.slices += 1
+        now = time.perf_counter()
+        if now - start > BUDGET_MS / 1000 * 2:
+            self.over_budget += 1
+        with self._lock:
+            delay = self._next_delay(now, max(1, FRAME_MS - (now - start) * 1000))
+            # Decided and published together: a post from another thread
+            # from here on either sees the slice armed or signals the waker
+            self._tk_due = None if delay is None else now + delay / 1000
+        if not self.closed:
+            self._arm(delay)
+
+    def _pop(self):
+        with self._lock:
+            while self._ready:
+                priority, _, job = heapq.heappop(self._ready)
+                if job.state != "ready" or priority != job.priority:
+                    continue  # dropped, or re-queued at a higher priority
+                self._count -= 1
+                if job.steps is None:
+                    job.state = "done"
+                    if job.key is not None and self._keys.get(job.key) is job:
+                        del self._keys[job.key]
+                else:
+                    job.state = "running"
+                return job
+        return None
+
+    def _run(self, job, deadline):
+        started = time.perf_counter()
+        try:
+            if job.steps is None:
+                job.func(*job.args)
+            else:
+                self._run_steps(job, deadline)
+        except Exception:
+            logger.exception("UI job failed: %r", job.func or job.steps)
+            if job.steps is not None:
+                self._finish(job)
+        took = (time.perf_counter() - started) * 1000
+        if took > SLOW_JOB_MS:
+            logger.info("Slow UI job: %r took %.0f ms", job.func or job.steps, took)
+
+    def _run_steps(self, job, deadline):
+        while True:
+            if job.state != "running":
+                return  # cancelled by one of its own steps
+            try:
+                next(job.steps)
+            except StopIteration:
+                self._finish(job)
+                return
+            if time.perf_counter() >= deadline:
+                break
+        # More to do: back in line behind the jobs of the same priority
+        with self._lock:
+            if job.state == "running":
+                self._make_ready(job)
+
+    def _finish(self, job):
+        with self._lock:
+            if job.state == "running":
+                job.state = "done"
+                if job.key is not None and self._keys.get(job.key) is job:
+                    del self._keys[job.key]
+
+    # -------------------------------------------------------------
+    # Backlog
+    # -------------------------------------------------------------
+    @property
+    def backlog(self):
+        # Jobs ready to run but not run yet
+        return self._count
+
+    def stats(self):
+        with self._lock:
+            now = time.perf_counter()
+            ready = [job for p, _, job in self._ready if job.state == "ready" and p == job.priority]
+            waiting = sum(1 for _, _, job in self._timers if job.state == "waiting")
+            lag = max((now - job.posted for job in ready), default=0.0)
+            by_priority = [sum(1 for job in ready if job.priority == p) for p in (HIGH, NORMAL, LOW)]
+        return {
+            "backlog": self._count,
+            "high": by_priority[0],
+            "normal": by_priority[1],
+            "low": by_priority[2],
+            "timers": waiting,
+            "lag_ms": round(lag * 1000, 1),
+            "slices": self.slices,
+            "over_budget": self.over_budget,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return f"UI queue: {s['backlog']} pending ({s['lag_ms']:.0f} ms behind), {s['over_budget']} long slices"
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            for _, _, job in self._ready + self._timers:
+                job.state = "cancelled"
+            self._ready, self._timers, self._keys = [], [], {}
+            self._count = 0
+        self._signal.set()  # lets the waker thread end
+        if self._tk_job is not None:
+            try:
+                self.widget.after_cancel(self._tk_job)
+            except tk.TclError:
+                pass
+            self._tk_job = None
@@ -0,0 +1,277 @@
+import customtkinter as ctk
+import tkinter as tk
+from tkinter import ttk
+
+
+# Treeview that only materializes the rows currently on screen.
+#
+# The rows live in a backing sequence owned by the caller (anything with
+# len() and indexing). The widget keeps a small pool of Treeview items,
+# sized to the visible area plus an overscan, and rewrites their values
+# when the view scrolls. Changes to the backing sequence are reported with
+# rows_appended / rows_removed / rows_changed so only the affected visible
+# rows are touched instead of rebuilding the whole list.
+#
+# With `image` set, the tree column shows a per-row picture and
+# `on_visible(start, stop)` is told whenever the window moves, so pictures
+# can be produced for the rows on screen only. `on_heading(column_id)` is
+# called when a column heading is clicked (see show_sort()).
+class VirtualList(ctk.CTkFrame):
+    def __init__(self, master, columns, formatter, rowheight=30, overscan=2, style="Custom.Treeview",
+                 image=None, image_width=60, on_visible=None, on_heading=None):
+        super().__init__(master, fg_color="transparent")
+
+        self.source = []
+        self.formatter = formatter  # (item, index) -> tuple of column values
+        self.image = image          # (item, index) -> PhotoImage or ""
+        self.on_visible = on_visible
+        self.rowheight = rowheight
+        self.overscan = overscan
+
+        self.offset = 0       # index of the first visible row
+        self.visible = 10     # rows that fit in the widget
+        self.selected = -1    # absolute index of the selected row
+        self._slots = []      # pooled Treeview item ids
+        self._shown = []      # (index, values, tag, image) currently displayed per slot
+        self._window = None   # last (start, stop) reported to on_visible
+        self._headings = {c[0]: c[1] for c in columns}
+
+        column_ids = [c[0] for c in columns]
+        self.tree = ttk.Treeview(
+            self,
+            columns=column_ids,
+            show="tree headings" if image else "headings",
+            style=style,
+            selectmode="browse",
+            height=10
+        )
+        for col_id, heading, width, anchor in columns:
+            if on_heading is not None:
+                self.tree.heading(col_id, text=heading, command=lambda c=col_id: on_heading(c))
+            else:
+                self.tree.heading(col_id, text=heading)
+            self.tree.column(col_id, anchor=anchor, width=width)
+        if image:
+            self.tree.column("#0", width=image_width, minwidth=image_width, stretch=False)
+        self.tree.tag_configure("oddrow", background="#2b2b2b")
+        self.tree.tag_configure("evenrow", background="#383838")
+
+        self.v_scroll = ctk.CTkScrollbar(self, orientation="vertical", command=self.yview)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.v_scroll.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        # The widget scrolls itself; keep Treeview's own handlers out of it
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.visible))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-len(self.source)))
+        self.tree.bind("<End>", lambda e: self.move_selection(len(self.source)))
+
+    # -------------------------------------------------------------
+    # Backing data
+    # -------------------------------------------------------------
+    def set_source(self, source):
+        self.source = source
+        self.offset = 0
+        self.selected = -1
+        self._render(force=True)
+
+    def rows_appended(self, start, stop):
+        # Only rows landing inside the window need drawing
+        if len(self._slots) < self._wanted_rows():
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def rows_removed(self, start, stop):
+        count = stop - start
+        if self.selected >= stop:
+            self.selected -= count
+        elif self.selected >= start:
+            self.selected = -1
+
+        if self.offset >= stop:
+            self.offset -= count
+        elif self.offset > start:
+            self.offset = start
+
+        self._clamp_offset()
+        if start < self.offset + len(self._slots):
+            self._render(force=True)
+        else:
+            self._update_scrollbar()
+
+    def rows_changed(self, start, stop):
+        if self.shows(start, stop):
+            self._render(force=True)
+
+    def shows(self, start, stop):
+        # Whether any of the rows [start, stop) is on screen
+        return start < self.offset + len(self._slots) and stop > self.offset
+
+    def refresh(self):
+        self._render(force=True)
+
+    def show_sort(self, col_id=None, descending=False):
+        # Arrow on the heading of the sorted column (None: no column)
+        for column, heading in self._headings.items():
+            if column == col_id:
+                heading += " ▼" if descending else " ▲"
+            self.tree.heading(column, text=heading)
+
+    # -------------------------------------------------------------
+    # Selection
+    # -------------------------------------------------------------
+    def selected_index(self):
+        if 0 <= self.selected < len(self.source):
+            return self.selected
+        return -1
+
+    def select(self, index, see=True):
+        if not self.source:
+            self.selected = -1
+            return
+        self.selected = max(0, min(index, len(self.source) - 1))
+        if see:
+            self.see(self.selected)
+        self._render()
+
+    def move_selection(self, delta):
+        start = self.selected if self.selected >= 0 else self.offset - 1
+        self.select(start + delta)
+        return "break"
+
+    def see(self, index):
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self._clamp_offset()
+
+    def bind_key(self, sequence, func):
+        self.tree.bind(sequence, func)
+
+    # -------------------------------------------------------------
+    # Scrolling
+    # -------------------------------------------------------------
+    def yview(self, *args):
+        total = len(self.source)
+        if not args or not total:
+            return
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self._clamp_offset()
+        self._render()
+
+    def scroll_rows(self, delta):
+        self.offset += delta
+        self._clamp_offset()
+        self._render()
+        return "break"
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        if abs(event.delta) >= 120:
+            rows = -3 * (event.delta // 120)
+        else:
+            rows = -event.delta
+        return self.scroll_rows(rows)
+
+    def _on_click(self, event):
+        # Let headings and column separators keep their default behaviour
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return None
+
+        iid = self.tree.identify_row(event.y)
+        if iid in self._slots:
+            self.selected = self.offset + self._slots.index(iid)
+            self._render()
+        self.tree.focus_set()
+        return "break"
+
+    def _on_resize(self, event):
+        # The heading takes roughly one row
+        visible = max(1, event.height // self.rowheight - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self._clamp_offset()
+            self._render()
+
+    def _clamp_offset(self):
+        max_offset = max(0, len(self.source) - self.visible)
+        self.offset = max(0, min(self.offset, max_offset))
+
+    # -------------------------------------------------------------
+    # Drawing
+    # -------------------------------------------------------------
+    def _wanted_rows(self):
+        return max(0, min(self.visible + self.overscan, len(self.source) - self.offset))
+
+    def _render(self, force=False):
+        wanted = self._wanted_rows()
+
+        # Grow or shrink the item pool to match the window
+        while len(self._slots) < wanted:
+            self._slots.append(self.tree.insert("", tk.END, values=()))
+            self._shown.append(None)
+        while len(self._slots) > wanted:
+            self.tree.delete(self._slots.pop())
+            self._shown.pop()
+
+        selected_slot = None
+        for slot, iid in enumerate(self._slots):
+            index = self.offset + slot
+            if index == self.selected:
+                selected_slot = iid
+
+            shown = self._shown[slot]
+            if not force and shown is not None and shown[0] == index:
+                continue
+
+            item = self.source[index]
+            values = self.formatter(item, index)
+            tag = "evenrow" if index % 2 == 0 else "oddrow"
+            image = self.image(item, index) if self.image else ""
+            if shown is None or shown[1:] != (values, tag, image):
+                if self.image:
+                    self.tree.item(iid, values=values, tags=(tag,), image=image)
+                else:
+                    self.tree.item(iid, values=values, tags=(tag,))
+            self._shown[slot] = (index, values, tag, image)
+
+        if selected_slot is not None:
+            self.tree.selection_set(selected_slot)
+            self.tree.focus(selected_slot)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        self._update_scrollbar()
+
+        window = (self.offset, self.offset + len(self._slots))
+        if self.on_visible is not None and (force or window != self._window):
+            self._window = window
+            self.on_visible(*window)
+
+    def visible_range(self):
+        return self.offset, self.offset + len(self._slots)
+
+    def _update_scrollbar(self):
+        total = len(self.source)
+        if not total:
+            self.v_scroll.set(0.0, 1.0)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.visible) / total)
+        self.v_scroll.set(first, last)
@@ -0,0 +1,39 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from benchmarks.cases import CASES, run
+
+# Usage: python -m benchmarks [--quick] [--only scan,next_index] [--output results.json]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="AuroraX micro-benchmarks")
+    parser.add_argument("--only", help="comma separated cases: " + ", ".join(CASES))
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a smoke run")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else None
+    unknown = [n for n in names or () if n not in CASES]
+    if unknown:
+        parser.error("unknown case: " + ", ".join(unknown))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": run(names, args.quick),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,478 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+from app.players.backends import FakeBackend
+from app.players.playback_core import PlaybackCore
+from app.services.control_api import ControlServer
+from app.services.duplicates import DuplicateFinder
+from app.services.folder_scanner import FolderScanner
+from app.services.library_index import LibraryIndex
+from app.services.loudness import LoudnessMeter, np as numpy
+from app.services.m3u_parser import M3UReader, iter_m3u
+from app.services.playlist_cache import load_sidecar, signature, write_sidecar
+from app.services.media_types import MEDIA_EXTS
+from app.services.playlist_model import PlaylistModel
+from app.services.search_index import SearchIndex
+from app.services.sorting import reverse_order, sort_order
+from app.state import AppState
+from app.ui.formatting import format_duration
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _best(func, repeat):
+    # Best of `repeat` runs: least disturbed by other processes
+    return min(_timed(func)[0] for _ in range(repeat))
+
+
+def _names(count, ext=".mp3"):
+    return [f"track {i:07d}{ext}" for i in range(count)]
+
+
+# -------------------------------------------------------------
+# Folder scan
+# -------------------------------------------------------------
+def bench_scan(workdir, files=20000, repeat=3):
+    folder = os.path.join(workdir, "scan")
+    os.makedirs(folder)
+    for i, name in enumerate(_names(files)):
+        # One in ten is not media, like cover images and subtitles
+        if i % 10 == 9:
+            name = name[:-4] + ".jpg"
+        open(os.path.join(folder, name), "wb").close()
+
+    def run():
+        scanner = FolderScanner(folder, MEDIA_EXTS).start()
+        first = None
+        total = 0
+        while True:
+            names, done = scanner.drain()
+            if names and first is None:
+                first = time.perf_counter()
+            total += len(names)
+            if done:
+                return first, total
+            time.sleep(0.001)
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        first, total = run()
+        runs.append((time.perf_counter() - start, first - start, total))
+    elapsed, first, total = min(runs)
+    return {
+        "files": files,
+        "matched": total,
+        "seconds": elapsed,
+        "first_chunk_ms": first * 1000,
+        "files_per_second": files / elapsed,
+    }
+
+
+# -------------------------------------------------------------
+# M3U parsing
+# -------------------------------------------------------------
+def bench_m3u(workdir, entries=100000, repeat=3):
+    path = os.path.join(workdir, "list.m3u8")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for i, name in enumerate(_names(entries)):
+            f.write(f"#EXTINF:{180 + i % 60},Artist {i % 500} - Title {i}\n")
+            f.write(f"music/{name}\n")
+
+    def parse():
+        with open(path, "r", encoding="utf-8") as f:
+            return sum(1 for _ in iter_m3u(f, workdir))
+
+    def read_first():
+        # Time until the reader hands over its first entry
+        reader = M3UReader(path, is_known=lambda p: True).start()
+        start = time.perf_counter()
+        while True:
+            got, _, _ = reader.drain(max_items=1)
+            if got:
+                reader.cancel()
+                return time.perf_counter() - start
+            time.sleep(0.0005)
+
+    # Compiled sidecar: mapping it and drawing one screen of rows
+    model = PlaylistModel()
+    with open(path, "r", encoding="utf-8") as f:
+        for entry in iter_m3u(f, workdir):
+            model.append(entry.path, entry.title, entry.duration)
+    sidecar = os.path.join(workdir, "list.axpl")
+    write_seconds, _ = _timed(write_sidecar, path, signature(path), model.columns(), sidecar)
+
+    def open_sidecar():
+        mapped = load_sidecar(path, PlaylistModel, target=sidecar)
+        return [mapped.display_name(i) for i in range(30)]
+
+    seconds = _best(parse, repeat)
+    return {
+        "entries": entries,
+        "seconds": seconds,
+        "entries_per_second": entries / seconds,
+        "first_entry_ms": min(read_first() for _ in range(repeat)) * 1000,
+        "sidecar_write_seconds": write_seconds,
+        "sidecar_open_ms": _best(open_sidecar, repeat) * 1000,
+    }
+
+
+# -------------------------------------------------------------
+# List population
+# -------------------------------------------------------------
+def bench_population(sizes=(1000, 100000, 1000000), visible=30, repeat=3):
+    results = {}
+    for size in sizes:
+        names = _names(size)
+
+        def build():
+            model = PlaylistModel()
+            # Arrives in scanner-sized chunks
+            for start in range(0, size, 256):
+                model.extend_names("/media/music", names[start:start + 256])
+            return model
+
+        model = build()
+
+        def render():
+            # What the list draws for one screenful in the middle
+            middle = size // 2
+            for i in range(middle, min(size, middle + visible)):
+                (model.basename(i), format_duration(model.duration(i)), model.info(i))
+
+        def lookup():
+            model.index_of(model[size - 1])
+
+        # The first lookup builds the name map
+        map_seconds, _ = _timed(lookup)
+        results[str(size)] = {
+            "build_seconds": _best(build, repeat),
+            "render_window_us": _best(render, repeat) * 1e6,
+            "index_map_seconds": map_seconds,
+            "index_of_us": _best(lookup, repeat) * 1e6,
+        }
+    return results
+
+
+# -------------------------------------------------------------
+# Playback
+# -------------------------------------------------------------
+def _core(size):
+    state = AppState()
+    model = PlaylistModel()
+    model.extend_names("/media/music", _names(size))
+    state.set_song_list(model, 0)
+    core = PlaybackCore(state)
+    backend = FakeBackend()
+    core.attach(backend)
+    return state, core, backend
+
+
+def bench_track_switch(size=1000, switches=2000):
+    state, core, backend = _core(size)
+    state.loop = 1
+    core.load_media()
+
+    latencies = []
+    for _ in range(switches):
+        start = time.perf_counter()
+        core.skip_next()
+        latencies.append(time.perf_counter() - start)
+
+    # Gapless: the queued entry takes over at the end of the file
+    gapless = []
+    for _ in range(200):
+        start = time.perf_counter()
+        backend.advance(backend.duration)
+        gapless.append(time.perf_counter() - start)
+
+    latencies.sort()
+    gapless.sort()
+    return {
+        "switches": switches,
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "p95_us": latencies[int(len(latencies) * 0.95)] * 1e6,
+        "gapless_mean_us": sum(gapless) / len(gapless) * 1e6,
+        "files_opened": backend.loads,
+        "hidden_window_ok": all(_advances_hidden(gapless, 3) for gapless in (False, True)),
+    }
+
+
+def _advances_hidden(gapless, tracks):
+    # With the window hidden (listeners paused) tracks must still move on,
+    # and the listeners catch up once it is shown again
+    state, core, backend = _core(10)
+    state.loop = 1
+    state.gapless = gapless
+    seen = []
+    core.add_listener(lambda changes: seen.append(changes.get("track")))
+    core.load_media()
+    core.set_active(False)
+    seen.clear()
+    for _ in range(tracks):
+        backend.advance(backend.duration)
+    assert state.current_index == tracks, f"hidden window stopped at {state.current_index}"
+    assert not seen, "listeners called while hidden"
+    core.set_active(True)
+    assert seen, "listeners not brought up to date"
+    return True
+
+
+def bench_next_index(sizes=(1000, 100000, 1000000), calls=10000):
+    results = {}
+    for size in sizes:
+        state, core, backend = _core(size)
+        entry = {}
+        for mode in ("sequential", "shuffle"):
+            state.loop = 1
+            state.set_shuffle(mode == "shuffle")
+
+            # The first shuffled call builds the order
+            first, _ = _timed(state.next_index)
+
+            start = time.perf_counter()
+            for _ in range(calls):
+                state.set_current(state.next_index())
+            per_call = (time.perf_counter() - start) / calls
+            entry[mode] = {"first_call_us": first * 1e6, "step_us": per_call * 1e6}
+        results[str(size)] = entry
+    return results
+
+
+# -------------------------------------------------------------
+# Search
+# -------------------------------------------------------------
+def bench_search(size=500000, repeat=3):
+    model = PlaylistModel()
+    model.extend_names("/media/music", [
+        f"Artist {i % 500} - Album {i % 3000} - Title {i:07d}.mp3" for i in range(size)
+    ])
+    index = SearchIndex(model)
+    build_seconds, _ = _timed(index._build, index._generation)
+
+    def query(text):
+        index._last = None  # no refinement from the previous run
+        return _best(lambda: index.search(text), repeat) * 1000
+
+    # Typing a query one character at a time refines the previous matches
+    typed = "title 0012"
+    start = time.perf_counter()
+    for end in range(1, len(typed) + 1):
+        index.search(typed[:end])
+    typing_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "entries": size,
+        "build_seconds": build_seconds,
+        "selective_ms": query("title 0012345"),
+        "two_terms_ms": query("artist 42 album 1042"),
+        "no_match_ms": query("zzz"),
+        "typing_total_ms": typing_ms,
+    }
+
+
+# -------------------------------------------------------------
+# Duplicate finder
+# -------------------------------------------------------------
+def bench_duplicates(workdir, files=200, size=4 * 1024 * 1024, copies=10):
+    # `files` same-size files, `copies` of them duplicated into another
+    # folder, plus near-duplicates that differ outside the sampled chunks
+    folder = os.path.join(workdir, "dupes")
+    os.makedirs(os.path.join(folder, "copies"))
+    for i in range(files):
+        with open(os.path.join(folder, f"video {i:05d}.mkv"), "wb") as f:
+            f.write(os.urandom(size))
+    for i in range(copies):
+        shutil.copy(os.path.join(folder, f"video {i:05d}.mkv"), os.path.join(folder, "copies"))
+        with open(os.path.join(folder, f"video {i:05d}.mkv"), "rb") as f:
+            data = bytearray(f.read())
+        data[size // 4] ^= 0xFF  # between the head and middle samples
+        with open(os.path.join(folder, "copies", f"near {i:05d}.mkv"), "wb") as f:
+            f.write(data)
+
+    library = LibraryIndex(os.path.join(workdir, "dupes.db"))
+    library.refresh(folder, MEDIA_EXTS, recursive=True)
+
+    def find():
+        finder = DuplicateFinder(library).start()
+        finder._finished.wait()
+        return finder
+
+    seconds, finder = _timed(find)
+    cached_seconds, cached = _timed(find)
+    library.close()
+    return {
+        "files": files + 2 * copies,
+        "groups": len(finder.groups),
+        "seconds": seconds,
+        "bytes_total": finder.bytes_total,
+        "bytes_read": finder.bytes_read,
+        "read_fraction": finder.bytes_read / finder.bytes_total if finder.bytes_total else 0.0,
+        "cached_seconds": cached_seconds,
+        "cached_bytes_read": cached.bytes_read,
+    }
+
+
+# -------------------------------------------------------------
+# Sorting
+# -------------------------------------------------------------
+def bench_sort(size=500000):
+    model = PlaylistModel()
+    model.extend_names("/media/music", [
+        f"Artist {i * 7919 % 500} - Title {i * 104729 % size}.mp3" for i in range(size)
+    ])
+    for i in range(0, size, 3):
+        model.set_duration(i, i % 600)
+
+    def apply(result):
+        # What the UI thread pays: installing the computed order
+        start = time.perf_counter()
+        model.apply_order(**result)
+        return time.perf_counter() - start
+
+    # First sort by name computes and caches the natural keys
+    first_seconds, result = _timed(sort_order, model, "name")
+    apply_ms = apply(result) * 1000
+    # A file turns up: the name keys of the others are reused
+    model.append("/media/music/Artist 1 - Title new.mp3")
+    resort_seconds, result = _timed(sort_order, model, "name")
+    apply(result)
+    flip_seconds, _ = _timed(lambda: model.apply_order(*reverse_order(*model.cached_order("name", False))))
+    duration_seconds, result = _timed(sort_order, model, "duration", True)
+    apply(result)
+
+    return {
+        "entries": size,
+        "first_name_sort_seconds": first_seconds,
+        "resort_cached_keys_seconds": resort_seconds,
+        "flip_direction_ms": flip_seconds * 1000,
+        "duration_sort_seconds": duration_seconds,
+        "apply_ms": apply_ms,
+    }
+
+
+# -------------------------------------------------------------
+# Loudness analysis
+# -------------------------------------------------------------
+def bench_loudness(minutes=60):
+    # The NumPy side of a loudness scan: `minutes` of decoded stereo PCM
+    # (K-weighted + raw channels, as measure_file() reads it from ffmpeg)
+    # fed in the chunks it is read in. Decoding itself is ffmpeg's
+    if numpy is None:
+        return {"skipped": "numpy not installed"}
+    meter = LoudnessMeter([1.0, 1.0])
+    rng = numpy.random.default_rng(0)
+    chunk = (rng.standard_normal(meter.read_size // 4, dtype=numpy.float32) * 0.1).tobytes()
+    seconds_per_chunk = meter.read_size / meter.frame_bytes / 48000
+    chunks = max(1, round(minutes * 60 / seconds_per_chunk))
+
+    def measure():
+        for _ in range(chunks):
+            meter.feed(chunk)
+        return meter.result()
+
+    seconds, (lufs, peak) = _timed(measure)
+    audio_seconds = chunks * seconds_per_chunk
+    return {
+        "audio_minutes": audio_seconds / 60,
+        "seconds": seconds,
+        "realtime_factor": audio_seconds / seconds,
+        "lufs": lufs,
+    }
+
+
+def bench_control_fanout(workdir, subscribers=100, updates=2000):
+    # publish() cost on the UI thread, and how long until every subscriber
+    # has seen the last of a burst of status updates
+    server = ControlServer(os.path.join(workdir, "control.sock")).start()
+    clients = []
+    try:
+        server.publish({"n": 0})
+        for _ in range(subscribers):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(server.address)
+            sock.sendall(b'{"cmd": "subscribe"}\n')
+            reader = sock.makefile("rb")
+            reader.readline()  # the reply
+            reader.readline()  # the current status
+            clients.append((sock, reader))
+
+        received = 0
+        start = time.perf_counter()
+        for n in range(1, updates + 1):
+            server.publish({"n": n, "position": n / 10})
+        publish_seconds = time.perf_counter() - start
+        for _, reader in clients:
+            while True:
+                received += 1
+                if json.loads(reader.readline())["n"] == updates:
+                    break
+        delivered_seconds = time.perf_counter() - start
+    finally:
+        for sock, reader in clients:
+            reader.close()
+            sock.close()
+        server.close()
+
+    return {
+        "subscribers": subscribers,
+        "updates": updates,
+        "publish_us": publish_seconds / updates * 1e6,
+        "all_delivered_ms": delivered_seconds * 1000,
+        "lines_per_subscriber": received / subscribers,  # the rest was coalesced
+    }
+
+
+CASES = {
+    "scan": bench_scan,
+    "m3u_parse": bench_m3u,
+    "list_population": bench_population,
+    "track_switch": bench_track_switch,
+    "next_index": bench_next_index,
+    "search": bench_search,
+    "sort": bench_sort,
+    "duplicates": bench_duplicates,
+    "loudness": bench_loudness,
+    "control_fanout": bench_control_fanout,
+}
+
+
+def run(names=None, quick=False):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="aurorax-bench-")
+    try:
+        for name in names or CASES:
+            case = CASES[name]
+            kwargs = {}
+            if quick:
+                kwargs = QUICK.get(name, {})
+            if name in ("scan", "m3u_parse", "duplicates", "control_fanout"):
+                results[name] = case(workdir, **kwargs)
+            else:
+                results[name] = case(**kwargs)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# Smaller inputs for a fast smoke run
+QUICK = {
+    "scan": {"files": 2000, "repeat": 1},
+    "m3u_parse": {"entries": 10000, "repeat": 1},
+    "list_population": {"sizes": (1000, 100000), "repeat": 1},
+    "track_switch": {"switches": 200},
+    "next_index": {"sizes": (1000, 100000), "calls": 1000},
+    "search": {"size": 50000, "repeat": 1},
+    "sort": {"size": 50000},
+    "duplicates": {"files": 40, "size": 1024 * 1024, "copies": 4},
+    "loudness": {"minutes": 5},
+    "control_fanout": {"subscribers": 20, "updates": 200},
+}
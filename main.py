@@ -1,6 +1,29 @@
-from app.ui.main_app import MainApp
+import locale
+import sys
+from app.services.startup_profiler import profiler
+from app.services.single_instance import InstanceServer, forward_to_running
 
 if __name__ == "__main__":
-    app = MainApp()
+    args = [arg for arg in sys.argv[1:] if arg != "--new-instance"]
+    single = len(args) == len(sys.argv) - 1
+
+    # A player is already running: hand it the files and exit before
+    # paying for Tk, CustomTkinter and mpv
+    if single and forward_to_running(args):
+        sys.exit(0)
+    server = InstanceServer().start() if single else None
+
+    # Name sorting collates by the user's locale
+    try:
+        locale.setlocale(locale.LC_COLLATE, "")
+    except locale.Error:
+        pass
+
+    with profiler.phase("imports"):
+        from app.ui.main_app import MainApp
+
+    app = MainApp(instance_server=server, paths=args)
     app.protocol("WM_DELETE_WINDOW", lambda: app.on_close())
+    # Interactive = window built and the event loop idle for the first time
+    app.after_idle(profiler.interactive)
     app.mainloop()
\ No newline at end of file